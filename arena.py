@@ -0,0 +1,416 @@
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import statement
+from expression import Binary, Common, Grouping, Literal, Reuse, Unary, Value
+from expression import Variable as VariableExpression
+from scanner import PUNCTUATION
+from source import LineMap
+from statement import Statement
+from symbols import SymbolTable
+from tok import Token, TokenType
+
+TOKEN_TYPES = {t.value: t for t in TokenType}
+OPERATOR_LEXEMES = {t: lexeme for lexeme, t in PUNCTUATION.items()}
+
+(
+    BINARY,
+    GROUPING,
+    LITERAL,
+    UNARY,
+    VARIABLE,
+    EXPRESSION_STATEMENT,
+    PRINT_STATEMENT,
+    VARIABLE_STATEMENT,
+    COMMON,
+    REUSE,
+) = range(10)
+NONE = -1
+
+KINDS = {
+    Binary: BINARY,
+    Grouping: GROUPING,
+    Literal: LITERAL,
+    Unary: UNARY,
+    VariableExpression: VARIABLE,
+    statement.Expression: EXPRESSION_STATEMENT,
+    statement.Print: PRINT_STATEMENT,
+    statement.Variable: VARIABLE_STATEMENT,
+    Common: COMMON,
+    Reuse: REUSE,
+}
+FIXED_CONSTANTS = (None, False, True)
+# nodes whose only child is their expression
+WRAPPERS = {GROUPING, UNARY, EXPRESSION_STATEMENT, PRINT_STATEMENT, COMMON}
+
+
+class Arena:
+    # A whole program as parallel typed arrays with one entry per node, in
+    # place of one dataclass (and one Token) per node. Children always come
+    # before their parent, so a pass over the program can be a single loop
+    # over the arrays, and the right operand of a binary is always the node
+    # just before it. Literal values live once each in a constant pool and
+    # names in a symbol table; tokens are rebuilt only when asked for.
+    #
+    # For a node i:
+    #   kinds[i]      BINARY, UNARY, ... PRINT_STATEMENT
+    #   operators[i]  the TokenType value of an operator, otherwise 0
+    #   lefts[i]      the left (or only) child, or NONE; for a reuse, the
+    #                 expression of its common node
+    #   values[i]     an index into constants for a literal, a symbol for a
+    #                 name, or NONE
+    #   positions[i]  the source offset of the operator or name token; a token
+    #                 made without a source keeps its line instead, as ~line
+    #   slots[i]      the frame slot the resolver gave a name, the slot of a
+    #                 common subexpression, or NONE
+    def __init__(
+        self,
+        lines: Optional[LineMap] = None,
+        symbols: Optional[SymbolTable] = None,
+    ):
+        self.lines = lines
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.kinds = array('B')
+        self.operators = array('B')
+        self.lefts = array('i')
+        self.values = array('i')
+        self.positions = array('q')
+        self.slots = array('i')
+        # nil, false and true have fixed places, which leaves only numbers
+        # and strings to look up, keyed by repr as well as type so that 0.0
+        # and -0.0 (which are equal) stay apart
+        self.constants: List[Value] = list(FIXED_CONSTANTS)
+        self._constant_ids: Dict[Tuple[type, str], int] = {}
+        self.roots = array('i')
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def _node(
+        self,
+        kind: int,
+        operator: int = 0,
+        left: int = NONE,
+        value: int = NONE,
+        position: int = 0,
+        slot: Optional[int] = None,
+    ) -> int:
+        self.kinds.append(kind)
+        self.operators.append(operator)
+        self.lefts.append(left)
+        self.values.append(value)
+        self.positions.append(position)
+        self.slots.append(NONE if slot is None else slot)
+        return len(self.kinds) - 1
+
+    def _constant(self, value: Value) -> int:
+        if value is None or value is True or value is False:
+            return FIXED_CONSTANTS.index(value)
+        key = (type(value), repr(value))
+        index = self._constant_ids.get(key)
+        if index is None:
+            index = self._constant_ids[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def _position(self, token: Token) -> int:
+        if token.lines is None:
+            return ~token.line
+        if self.lines is None:
+            self.lines = token.lines
+        return token.offset
+
+    def _symbol(self, token: Token) -> int:
+        return self.symbols.intern(token.lexeme)
+
+    def add(self, root: Statement) -> int:
+        # walked with a stack rather than recursion, so trees from the
+        # explicit-stack parser fit too
+        built: List[int] = []
+        # the expression each common subexpression's slot holds the value of
+        commons: Dict[int, int] = {}
+        stack: List[Tuple[Any, bool]] = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            # dispatched on the exact type: isinstance() against the
+            # Protocol-derived node classes is several times slower
+            kind = KINDS.get(type(node))
+            if kind is None:
+                raise TypeError(f'Cannot store {type(node).__name__}')
+            if not expanded:
+                stack.append((node, True))
+                if kind == BINARY:
+                    stack.append((node.right, False))
+                    stack.append((node.left, False))
+                elif kind in WRAPPERS:
+                    stack.append((node.expression, False))
+                elif kind == VARIABLE_STATEMENT and node.initializer is not None:
+                    stack.append((node.initializer, False))
+                continue
+            if kind == BINARY:
+                built.pop()
+                operator = node.operator
+                index = self._node(
+                    BINARY,
+                    operator.token_type.value,
+                    built.pop(),
+                    position=self._position(operator),
+                )
+            elif kind == UNARY:
+                operator = node.operator
+                index = self._node(
+                    UNARY,
+                    operator.token_type.value,
+                    built.pop(),
+                    position=self._position(operator),
+                )
+            elif kind == LITERAL:
+                index = self._node(LITERAL, value=self._constant(node.value))
+            elif kind == VARIABLE:
+                index = self._node(
+                    VARIABLE,
+                    value=self._symbol(node.name),
+                    position=self._position(node.name),
+                    slot=node.slot,
+                )
+            elif kind == VARIABLE_STATEMENT:
+                initializer = built.pop() if node.initializer is not None else NONE
+                index = self._node(
+                    VARIABLE_STATEMENT,
+                    left=initializer,
+                    value=self._symbol(node.name),
+                    position=self._position(node.name),
+                    slot=node.slot,
+                )
+            elif kind == COMMON:
+                expression = commons[node.slot] = built.pop()
+                index = self._node(COMMON, left=expression, slot=node.slot)
+            elif kind == REUSE:
+                # its Common came first, and its expression was stored there
+                index = self._node(REUSE, left=commons[node.slot], slot=node.slot)
+            else:
+                index = self._node(kind, left=built.pop())
+            built.append(index)
+        self.roots.append(index)
+        return index
+
+    def extend(self, statements: Iterable[Statement]) -> None:
+        # fed from Parser.parse_iter(), only one statement's dataclass tree
+        # is alive at a time
+        for root in statements:
+            self.add(root)
+
+    def statements(self) -> List['ArenaNode']:
+        return [self.view(root) for root in self.roots]
+
+    def view(self, index: int) -> 'ArenaNode':
+        return VIEWS[self.kinds[index]](self, index)
+
+    def token(self, index: int) -> Token:
+        position = self.positions[index]
+        line, offset, lines = None, position, self.lines
+        if position < 0:
+            line, offset, lines = ~position, -1, None
+        if self.kinds[index] in NAMED:
+            symbol = self.values[index]
+            name = self.symbols.names[symbol]
+            return Token(TokenType.IDENTIFIER, name, name, line, symbol, offset, lines)
+        token_type = TOKEN_TYPES[self.operators[index]]
+        lexeme = OPERATOR_LEXEMES[token_type]
+        return Token(token_type, lexeme, None, line, None, offset, lines)
+
+
+# Views put the node interface of expression.py and statement.py over an
+# arena node, so Interpreter, Printer and any other Visitor walk an arena
+# unchanged. They are made as the walk reaches them and hold no state of
+# their own. A view is passed to the visit method written for its dataclass,
+# which a type checker cannot see, so accept() takes any visitor.
+class ArenaNode:
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena: Arena, index: int):
+        self.arena = arena
+        self.index = index
+
+    def accept(self, visitor: Any):
+        raise NotImplementedError
+
+    def _child(self) -> 'ArenaNode':
+        return self.arena.view(self.arena.lefts[self.index])
+
+    def _slot(self) -> Optional[int]:
+        slot = self.arena.slots[self.index]
+        return None if slot == NONE else slot
+
+
+class ArenaBinary(ArenaNode):
+    __slots__ = ()
+
+    @property
+    def left(self) -> ArenaNode:
+        return self._child()
+
+    @property
+    def operator(self) -> Token:
+        return self.arena.token(self.index)
+
+    @property
+    def right(self) -> ArenaNode:
+        return self.arena.view(self.index - 1)
+
+    # type annotations are not kept in an arena, so operands are always checked
+    operands = None
+
+    def accept(self, visitor: Any):
+        return visitor.visit_binary(self)
+
+
+class ArenaUnary(ArenaNode):
+    __slots__ = ()
+
+    @property
+    def operator(self) -> Token:
+        return self.arena.token(self.index)
+
+    @property
+    def expression(self) -> ArenaNode:
+        return self._child()
+
+    operands = None
+
+    def accept(self, visitor: Any):
+        return visitor.visit_unary(self)
+
+
+class ArenaGrouping(ArenaNode):
+    __slots__ = ()
+
+    @property
+    def expression(self) -> ArenaNode:
+        return self._child()
+
+    def accept(self, visitor: Any):
+        return visitor.visit_grouping(self)
+
+
+class ArenaLiteral(ArenaNode):
+    __slots__ = ()
+
+    @property
+    def value(self) -> Value:
+        return self.arena.constants[self.arena.values[self.index]]
+
+    def accept(self, visitor: Any):
+        return visitor.visit_literal(self)
+
+
+class ArenaVariable(ArenaNode):
+    __slots__ = ()
+
+    @property
+    def name(self) -> Token:
+        return self.arena.token(self.index)
+
+    @property
+    def slot(self) -> Optional[int]:
+        return self._slot()
+
+    # the resolver fills it in place, as on the dataclass
+    @slot.setter
+    def slot(self, slot: int) -> None:
+        self.arena.slots[self.index] = slot
+
+    def accept(self, visitor: Any):
+        return visitor.visit_variable_expression(self)
+
+
+class ArenaExpressionStatement(ArenaNode):
+    __slots__ = ()
+
+    @property
+    def expression(self) -> ArenaNode:
+        return self._child()
+
+    def accept(self, visitor: Any):
+        return visitor.visit_expression_statement(self)
+
+
+class ArenaPrint(ArenaNode):
+    __slots__ = ()
+
+    @property
+    def expression(self) -> ArenaNode:
+        return self._child()
+
+    def accept(self, visitor: Any):
+        return visitor.visit_print_statement(self)
+
+
+class ArenaVariableStatement(ArenaNode):
+    __slots__ = ()
+
+    @property
+    def name(self) -> Token:
+        return self.arena.token(self.index)
+
+    @property
+    def initializer(self) -> Optional[ArenaNode]:
+        initializer = self.arena.lefts[self.index]
+        return None if initializer == NONE else self.arena.view(initializer)
+
+    @property
+    def slot(self) -> Optional[int]:
+        return self._slot()
+
+    # the resolver fills it in place, as on the dataclass
+    @slot.setter
+    def slot(self, slot: int) -> None:
+        self.arena.slots[self.index] = slot
+
+    def accept(self, visitor: Any):
+        return visitor.visit_variable_statement(self)
+
+
+class ArenaCommon(ArenaNode):
+    __slots__ = ()
+
+    @property
+    def expression(self) -> ArenaNode:
+        return self._child()
+
+    @property
+    def slot(self) -> Optional[int]:
+        return self._slot()
+
+    def accept(self, visitor: Any):
+        return visitor.visit_common(self)
+
+
+class ArenaReuse(ArenaNode):
+    __slots__ = ()
+
+    @property
+    def expression(self) -> ArenaNode:
+        return self._child()
+
+    @property
+    def slot(self) -> Optional[int]:
+        return self._slot()
+
+    def accept(self, visitor: Any):
+        return visitor.visit_reuse(self)
+
+
+VIEWS = {
+    BINARY: ArenaBinary,
+    GROUPING: ArenaGrouping,
+    LITERAL: ArenaLiteral,
+    UNARY: ArenaUnary,
+    VARIABLE: ArenaVariable,
+    EXPRESSION_STATEMENT: ArenaExpressionStatement,
+    PRINT_STATEMENT: ArenaPrint,
+    VARIABLE_STATEMENT: ArenaVariableStatement,
+    COMMON: ArenaCommon,
+    REUSE: ArenaReuse,
+}
+NAMED = {VARIABLE, VARIABLE_STATEMENT}
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+
+import argparse
+
+from array import array
+
+from arena import Arena, BINARY, LITERAL, NONE
+from bench import deep_size, generate_program, measure, report
+from parser import Parser
+from printer import Printer
+from scanner import Scanner
+
+
+def dataclass_literals(statements) -> int:
+    # the same whole-tree pass as arena_literals, over dataclass nodes
+    count = 0
+    stack = [s.expression for s in statements]
+    while stack:
+        node = stack.pop()
+        if hasattr(node, 'left'):
+            stack.append(node.left)
+            stack.append(node.right)
+        elif hasattr(node, 'expression'):
+            stack.append(node.expression)
+        elif hasattr(node, 'value'):
+            count += 1
+    return count
+
+
+def arena_literals(arena: Arena) -> int:
+    # no pointer chasing: every node is a position in the same arrays
+    return arena.kinds.count(LITERAL)
+
+
+def arena_depths(arena: Arena) -> int:
+    # children come before parents, so one forward loop sees every child
+    # before the node that holds it
+    depths = array('i', bytes(4 * len(arena)))
+    lefts, kinds = arena.lefts, arena.kinds
+    deepest = 0
+    for i in range(len(kinds)):
+        depth = 0
+        left = lefts[i]
+        if left != NONE:
+            depth = depths[left]
+        if kinds[i] == BINARY and depths[i - 1] > depth:
+            depth = depths[i - 1]
+        depths[i] = depth + 1
+        if depth + 1 > deepest:
+            deepest = depth + 1
+    return deepest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--statements', type=int, default=20000)
+    args = parser.parse_args()
+
+    text = generate_program(args.statements, declarations=False)
+    tokens = Scanner(text).tokens()
+    lines = tokens[0].lines
+    statements = Parser(tokens).parse()
+    arena = Arena()
+    arena.extend(statements)
+    nodes = len(arena)
+    print(f'{len(statements):,} statements, {nodes:,} nodes')
+
+    # the source and its line map are shared by both forms
+    shared = [text, lines]
+    tree = deep_size(statements, shared)
+    flat = deep_size(arena, shared)
+    print(f'{"dataclass tree":<24} {tree:14,} bytes {tree / nodes:8.1f} bytes/node')
+    print(f'{"arena":<24} {flat:14,} bytes {flat / nodes:8.1f} bytes/node')
+
+    assert Printer().print(statements) == Printer().print(arena.statements())
+    assert dataclass_literals(statements) == arena_literals(arena)
+    for name, function in [
+        ('print dataclass tree', lambda: Printer().print(statements)),
+        ('print arena views', lambda: Printer().print(arena.statements())),
+        ('count dataclass tree', lambda: dataclass_literals(statements)),
+        ('count arena', lambda: arena_literals(arena)),
+        ('depths arena', lambda: arena_depths(arena)),
+        ('build arena', lambda: Arena().extend(statements)),
+    ]:
+        report(name, measure(function), nodes, 'nodes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import unittest
+
+from arena import Arena, COMMON, LITERAL, REUSE
+from expression import Binary, Literal
+from interpreter import Interpreter, InterpretError
+from optimizer import CommonSubexpressions, ConstantFolder
+from output import TestOutputter
+from printer import Printer
+from resolver import Resolver
+from statement import Print
+from testing import parse
+from tok import Token, TokenType
+
+TEXT = 'print -(1 + 2) * 3 >= 4;\n!nil == "a";\nprint "a" + "b";\nprint 1 - 2 - 1;'
+
+
+class ArenaTest(unittest.TestCase):
+    def test_printer_walks_arena(self):
+        statements = parse(TEXT)
+        arena = Arena()
+        arena.extend(statements)
+        self.assertEqual(
+            Printer().print(statements), Printer().print(arena.statements())
+        )
+
+    def test_interpreter_walks_arena(self):
+        outputter = TestOutputter()
+        arena = Arena()
+        arena.extend(parse(TEXT))
+        Interpreter(outputter).interpret(arena.statements())
+        self.assertEqual(('ab', '-2.0'), (outputter.previous, outputter.message))
+
+    def test_interpreter_walks_arena_variables(self):
+        outputter = TestOutputter()
+        arena = Arena()
+        arena.extend(Resolver().run(parse('var a = 2;\nvar b;\nprint a * a;\nb;')))
+        self.assertEqual([0, 1], [arena.slots[i] for i in arena.roots[:2]])
+        Interpreter(outputter).interpret(arena.statements())
+        self.assertEqual('4.0', outputter.message)
+
+    def test_resolver_walks_arena(self):
+        arena = Arena()
+        arena.extend(parse('var a = 2;\nprint b + a;'))
+        self.assertIsNone(arena.statements()[0].slot)
+        [declaration, output] = Resolver().run(arena.statements())
+        self.assertEqual(0, declaration.slot)
+        operands = [output.expression.left, output.expression.right]
+        self.assertEqual([1, 0], [operand.slot for operand in operands])
+
+    def test_one_entry_per_node(self):
+        arena = Arena()
+        arena.extend(parse(TEXT))
+        self.assertEqual(4, len(arena.roots))
+        self.assertEqual(25, len(arena))
+
+    def test_constants_are_pooled(self):
+        arena = Arena()
+        arena.extend(parse('print 1 + 1 == true;\nprint "a" + "a";\nprint 1;'))
+        self.assertEqual([None, False, True, 1.0, 'a'], arena.constants)
+        literals = [i for i in range(len(arena)) if arena.kinds[i] == LITERAL]
+        self.assertEqual([3, 3, 2, 4, 4, 3], [arena.values[i] for i in literals])
+
+    def test_signed_zeros_are_kept_apart(self):
+        outputter = TestOutputter()
+        arena = Arena()
+        arena.extend(ConstantFolder().run(parse('print -0;\nprint 0;')))
+        Interpreter(outputter).interpret(arena.statements())
+        self.assertEqual(('-0.0', '0.0'), (outputter.previous, outputter.message))
+
+    def test_common_subexpressions(self):
+        text = 'var a = 1;\nprint (2 - a) * (2 - a) + -(2 - a);'
+        statements = CommonSubexpressions().run(Resolver().run(parse(text)))
+        arena = Arena()
+        arena.extend(statements)
+        kinds = [kind for kind in arena.kinds if kind >= COMMON]
+        self.assertEqual([COMMON, REUSE, REUSE], kinds)
+        outputter = TestOutputter()
+        Interpreter(outputter).interpret(arena.statements())
+        self.assertEqual('0.0', outputter.message)
+        self.assertEqual(
+            Printer().print(statements), Printer().print(arena.statements())
+        )
+
+    def test_runtime_error_position(self):
+        arena = Arena()
+        arena.extend(parse('print 1;\n\n  print -"a";'))
+        with self.assertRaises(InterpretError) as context:
+            Interpreter(TestOutputter()).interpret(arena.statements())
+        self.assertEqual((3, 9), (context.exception.line, context.exception.column))
+
+    def test_names(self):
+        arena = Arena()
+        arena.extend(parse('alpha + beta;\nbeta;'))
+        [first, second] = arena.statements()
+        beta = first.expression.right.name
+        self.assertEqual(('beta', 1, 9), (beta.lexeme, beta.line, beta.column))
+        name = second.expression.name
+        self.assertEqual((2, 1), (name.line, name.column))
+        self.assertEqual(['alpha', 'beta'], arena.symbols.names)
+
+    def test_token_without_source(self):
+        operator = Token(TokenType.PLUS, '+', None, 7)
+        arena = Arena()
+        arena.add(Print(Binary(Literal(1.0), operator, Literal(2.0))))
+        [statement] = arena.statements()
+        self.assertEqual(operator, statement.expression.operator)
+
+    def test_deep_tree(self):
+        depth = 100000
+        arena = Arena()
+        arena.extend(parse('-' * depth + '1;', explicit_stack=True))
+        self.assertEqual(depth + 2, len(arena))
@@ -0,0 +1,99 @@
+import enum
+import random
+import sys
+import time
+
+from typing import Callable, Iterable, List
+
+NAMES = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'counter', 'total', 'x']
+STRINGS = ['"key"', '"hello"', '"a longer string literal"', '""']
+
+
+def generate_expression(rng: random.Random, depth: int) -> str:
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice(
+            [
+                str(rng.randint(0, 1000)),
+                f'{rng.randint(0, 100)}.{rng.randint(0, 99)}',
+                'true',
+                'false',
+                'nil',
+            ]
+        )
+    choice = rng.random()
+    if choice < 0.15:
+        return f'-{generate_expression(rng, depth - 1)}'
+    elif choice < 0.3:
+        return f'({generate_expression(rng, depth - 1)})'
+    operator = rng.choice(['+', '-', '*', '/', '<', '<=', '>', '>=', '==', '!='])
+    left = generate_expression(rng, depth - 1)
+    right = generate_expression(rng, depth - 1)
+    return f'{left} {operator} {right}'
+
+
+def generate_arithmetic(rng: random.Random, depth: int) -> str:
+    # only operations that cannot fail at runtime, so the whole script runs
+    if depth == 0 or rng.random() < 0.3:
+        return f'{rng.randint(0, 100)}.{rng.randint(0, 99)}'
+    choice = rng.random()
+    if choice < 0.15:
+        return f'-{generate_arithmetic(rng, depth - 1)}'
+    elif choice < 0.3:
+        return f'({generate_arithmetic(rng, depth - 1)})'
+    operator = rng.choice(['+', '-', '*'])
+    left = generate_arithmetic(rng, depth - 1)
+    right = generate_arithmetic(rng, depth - 1)
+    return f'{left} {operator} {right}'
+
+
+def generate_program(statements: int, seed: int = 0, declarations: bool = True) -> str:
+    # a mix of everything the scanner knows about: comments, strings,
+    # identifiers, keywords, numbers and operators
+    rng = random.Random(seed)
+    lines: List[str] = []
+    for i in range(statements):
+        kind = i % 5
+        if kind == 0:
+            lines.append(f'// statement {i}: {rng.choice(NAMES)}')
+        elif kind == 1 and declarations:
+            lines.append(f'var {rng.choice(NAMES)}{i % 7} = {rng.choice(STRINGS)};')
+        lines.append(f'print {generate_expression(rng, 4)};')
+    return '\n'.join(lines) + '\n'
+
+
+def measure(function: Callable[[], object], repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name: str, seconds: float, units: int, unit: str) -> None:
+    print(f'{name:<24} {seconds * 1000:10.2f} ms {units / seconds:14,.0f} {unit}/s')
+
+
+def deep_size(root: object, shared: Iterable[object] = ()) -> int:
+    # bytes reachable from root, counting every object once and skipping the
+    # objects in shared (e.g. a source text that all the forms refer to)
+    seen = {id(o) for o in shared}
+    total = 0
+    stack = [root]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, (type, enum.Enum)):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        if hasattr(o, '__dict__'):
+            stack.append(o.__dict__)
+        for slot in getattr(type(o), '__slots__', ()):
+            if hasattr(o, slot):
+                stack.append(getattr(o, slot))
+    return total
@@ -0,0 +1,251 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import statement
+from expression import Binary, Common, Grouping, Literal, Reuse, Unary, Value
+from expression import Variable as VariableExpression
+from scanner import PUNCTUATION
+from statement import Node
+from tok import Token, TokenType
+
+# Every instruction is two bytes, an opcode and its argument (wordcode, as in
+# CPython). An argument over 255 is built up by EXTENDED_ARG prefixes, each
+# carrying eight more significant bits.
+(
+    CONSTANT,
+    LOAD,
+    STORE,
+    SET_COMMON,
+    GET_COMMON,
+    NEGATE,
+    NOT,
+    ADD,
+    SUBTRACT,
+    MULTIPLY,
+    DIVIDE,
+    LESS,
+    LESS_EQUAL,
+    GREATER,
+    GREATER_EQUAL,
+    EQUAL,
+    NOT_EQUAL,
+    ILLEGAL_UNARY,
+    ILLEGAL_BINARY,
+    PRINT,
+    POP,
+    EXTENDED_ARG,
+) = range(22)
+
+OPCODE_NAMES = [
+    'CONSTANT',
+    'LOAD',
+    'STORE',
+    'SET_COMMON',
+    'GET_COMMON',
+    'NEGATE',
+    'NOT',
+    'ADD',
+    'SUBTRACT',
+    'MULTIPLY',
+    'DIVIDE',
+    'LESS',
+    'LESS_EQUAL',
+    'GREATER',
+    'GREATER_EQUAL',
+    'EQUAL',
+    'NOT_EQUAL',
+    'ILLEGAL_UNARY',
+    'ILLEGAL_BINARY',
+    'PRINT',
+    'POP',
+    'EXTENDED_ARG',
+]
+
+BINARY_OPCODES = {
+    TokenType.PLUS: ADD,
+    TokenType.MINUS: SUBTRACT,
+    TokenType.STAR: MULTIPLY,
+    TokenType.SLASH: DIVIDE,
+    TokenType.LESS: LESS,
+    TokenType.LESS_EQUAL: LESS_EQUAL,
+    TokenType.GREATER: GREATER,
+    TokenType.GREATER_EQUAL: GREATER_EQUAL,
+    TokenType.EQUAL_EQUAL: EQUAL,
+    TokenType.BANG_EQUAL: NOT_EQUAL,
+}
+# the operator an instruction stands for, to rebuild its token for an error
+OPCODE_TOKEN_TYPES = {opcode: t for t, opcode in BINARY_OPCODES.items()}
+OPCODE_TOKEN_TYPES[NEGATE] = TokenType.MINUS
+OPERATOR_LEXEMES = {t: lexeme for lexeme, t in PUNCTUATION.items()}
+
+# the argument of an operation whose operands were proven to have the right
+# type (see optimizer.TypeAnnotator), telling the machine to skip its checks
+PROVEN = 1
+
+
+class Chunk:
+    # Compiled code for one or more statements: the instructions, the
+    # constants they load by index, and a line table giving the line and
+    # column of the token each instruction came from (0 where there is none),
+    # which is all an error needs. The names of variables read are kept by
+    # slot for the same reason.
+    def __init__(self):
+        self.code = bytearray()
+        self.constants: List[Value] = []
+        self.lines = array('I')
+        self.columns = array('I')
+        self.names: Dict[int, str] = {}
+        # by instruction, the lexemes of operators that are not spelled the
+        # usual way for their type (or are illegal), which only errors report
+        self.lexemes: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.code) // 2
+
+    def position(self, index: int) -> Tuple[int, Optional[int]]:
+        return self.lines[index], self.columns[index] or None
+
+
+class Compiler:
+    # Turns statements into a Chunk: each expression leaves its value on the
+    # machine's stack, and each statement leaves the stack as it found it
+    # (an expression statement's value is popped), except that the last
+    # value of a chunk compiled from an expression is left for its caller.
+    def __init__(self):
+        self.chunk = Chunk()
+        self._code = self.chunk.code
+        self._lines = self.chunk.lines
+        self._columns = self.chunk.columns
+        self._constants: Dict[Tuple[type, str], int] = {}
+
+    def compile(self, nodes: Iterable[Node]) -> Chunk:
+        for node in nodes:
+            node.accept(self)
+        self.chunk.code = bytes(self._code)
+        return self.chunk
+
+    def _emit(self, opcode: int, argument: int = 0, token: Optional[Token] = None):
+        line = column = 0
+        if token is not None:
+            line = token.line
+            column = token.column or 0
+        if argument > 0xFF:
+            for shift in range((argument.bit_length() - 1) // 8 * 8, 0, -8):
+                self._code += bytes((EXTENDED_ARG, argument >> shift & 0xFF))
+                self._lines.append(line)
+                self._columns.append(column)
+        code = self._code
+        code.append(opcode)
+        code.append(argument & 0xFF)
+        self._lines.append(line)
+        self._columns.append(column)
+
+    def _constant(self, value: Value) -> int:
+        # keyed by repr as well as type so that 0.0 and -0.0 stay apart
+        key = (type(value), repr(value))
+        index = self._constants.get(key)
+        if index is None:
+            index = self._constants[key] = len(self.chunk.constants)
+            self.chunk.constants.append(value)
+        return index
+
+    def visit_literal(self, literal: Literal) -> None:
+        value = literal.value
+        if type(value) is int:
+            value = float(value)
+        self._emit(CONSTANT, self._constant(value))
+
+    def visit_grouping(self, grouping: Grouping) -> None:
+        grouping.expression.accept(self)
+
+    def visit_unary(self, unary: Unary) -> None:
+        unary.expression.accept(self)
+        operator = unary.operator
+        if operator.token_type == TokenType.MINUS:
+            argument = PROVEN if unary.operands is not None else 0
+            self._operator(NEGATE, argument, operator)
+        elif operator.token_type == TokenType.BANG:
+            self._emit(NOT)
+        else:
+            self._operator(ILLEGAL_UNARY, 0, operator)
+
+    def visit_binary(self, binary: Binary) -> None:
+        binary.left.accept(self)
+        binary.right.accept(self)
+        operator = binary.operator
+        opcode = BINARY_OPCODES.get(operator.token_type, ILLEGAL_BINARY)
+        argument = PROVEN if binary.operands is not None else 0
+        self._operator(opcode, argument, operator)
+
+    def _operator(self, opcode: int, argument: int, operator: Token) -> None:
+        # kept unless the machine can spell it from the opcode alone
+        usual = OPERATOR_LEXEMES.get(OPCODE_TOKEN_TYPES.get(opcode, TokenType.EOF))
+        if operator.lexeme != usual:
+            self.chunk.lexemes[len(self._lines)] = operator.lexeme
+        self._emit(opcode, argument, operator)
+
+    def visit_variable_expression(self, variable: VariableExpression) -> None:
+        slot = variable.slot
+        assert slot is not None
+        self.chunk.names[slot] = variable.name.lexeme
+        self._emit(LOAD, slot, variable.name)
+
+    def visit_common(self, common: Common) -> None:
+        common.expression.accept(self)
+        self._emit(SET_COMMON, common.slot)
+
+    def visit_reuse(self, reuse: Reuse) -> None:
+        self._emit(GET_COMMON, reuse.slot)
+
+    def visit_expression_statement(self, s: statement.Expression) -> None:
+        s.expression.accept(self)
+        self._emit(POP)
+
+    def visit_print_statement(self, s: statement.Print) -> None:
+        s.expression.accept(self)
+        self._emit(PRINT)
+
+    def visit_variable_statement(self, s: statement.Variable) -> None:
+        if s.initializer is not None:
+            s.initializer.accept(self)
+        else:
+            self._emit(CONSTANT, self._constant(None))
+        slot = s.slot
+        assert slot is not None
+        self.chunk.names[slot] = s.name.lexeme
+        self._emit(STORE, slot, s.name)
+
+
+def compile_chunk(nodes: Iterable[Node]) -> Chunk:
+    return Compiler().compile(nodes)
+
+
+def disassemble(chunk: Chunk) -> List[str]:
+    # one line per instruction: its offset, source line (| for the same line
+    # as the one before, - for none yet), name and argument, with what the
+    # argument stands for in brackets
+    lines: List[str] = []
+    previous = None
+    argument = 0
+    for index in range(len(chunk)):
+        opcode = chunk.code[2 * index]
+        argument = argument << 8 | chunk.code[2 * index + 1]
+        line = chunk.lines[index]
+        if line in (0, previous):
+            where = '   |' if previous is not None else '   -'
+        else:
+            where = f'{line:4}'
+            previous = line
+        text = f'{2 * index:04} {where} {OPCODE_NAMES[opcode]:<16} {argument:4}'
+        if opcode == CONSTANT:
+            text += f' ({chunk.constants[argument]!r})'
+        elif opcode in (LOAD, STORE) and argument in chunk.names:
+            text += f' ({chunk.names[argument]})'
+        elif index in chunk.lexemes:
+            text += f' ({chunk.lexemes[index]})'
+        elif opcode in OPCODE_TOKEN_TYPES and argument == PROVEN:
+            text += ' (proven)'
+        lines.append(text)
+        if opcode != EXTENDED_ARG:
+            argument = 0
+    return lines
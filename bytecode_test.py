@@ -0,0 +1,93 @@
+import unittest
+
+from bytecode import (
+    ADD,
+    CONSTANT,
+    EXTENDED_ARG,
+    LOAD,
+    NEGATE,
+    PRINT,
+    PROVEN,
+    STORE,
+    compile_chunk,
+    disassemble,
+)
+from expression import Literal, Unary
+from expression import Variable as VariableExpression
+from interpreter import InterpretError
+from optimizer import TypeAnnotator
+from output import TestOutputter
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+from testing import resolved
+from tok import Token, TokenType
+from vm import VirtualMachine
+
+
+class CompilerTest(unittest.TestCase):
+    def test_instructions_and_constants(self):
+        chunk = compile_chunk(resolved('var a = 1;\nprint a + 1;'))
+        code = [CONSTANT, 0, STORE, 0, LOAD, 0, CONSTANT, 0, ADD, 0, PRINT, 0]
+        self.assertEqual(bytes(code), chunk.code)
+        self.assertEqual([1.0], chunk.constants)
+        self.assertEqual({0: 'a'}, chunk.names)
+
+    def test_constants_keep_their_type_and_sign(self):
+        values = [0.0, -0.0, False, 0, None]
+        chunk = compile_chunk([Literal(value) for value in values])
+        constants = [repr(value) for value in chunk.constants]
+        self.assertEqual(['0.0', '-0.0', 'False', 'None'], constants)
+
+    def test_line_table(self):
+        chunk = compile_chunk(resolved('print 1 +\n  2 *\n-"a";'))
+        [negate] = [i for i in range(len(chunk)) if chunk.code[2 * i] == NEGATE]
+        self.assertEqual((3, 1), chunk.position(negate))
+        self.assertEqual((1, 9), chunk.position(len(chunk) - 2))
+
+    def test_proven_operands(self):
+        chunk = compile_chunk(TypeAnnotator().run(resolved('print -(1 + 2);')))
+        self.assertEqual([ADD, PROVEN, NEGATE, PROVEN], list(chunk.code[4:8]))
+
+    def test_extended_argument(self):
+        name = Token(TokenType.IDENTIFIER, 'far', 'far', 7)
+        chunk = compile_chunk([VariableExpression(name, 0x12345)])
+        self.assertEqual(
+            bytes([EXTENDED_ARG, 0x01, EXTENDED_ARG, 0x23, LOAD, 0x45]), chunk.code
+        )
+        with self.assertRaisesRegex(InterpretError, 'line 7 Undefined variable "far"'):
+            VirtualMachine().run(chunk)
+
+    def test_disassemble(self):
+        self.assertEqual(
+            [
+                '0000    - CONSTANT            0 (2.0)',
+                '0002    1 STORE               0 (a)',
+                '0004    2 LOAD                0 (a)',
+                '0006    | NEGATE              0',
+                '0008    | PRINT               0',
+            ],
+            disassemble(compile_chunk(resolved('var a = 2;\nprint -a;'))),
+        )
+
+    def test_disassemble_illegal_operator(self):
+        plus = Token(TokenType.PLUS, '+', None, 1)
+        chunk = compile_chunk([Unary(plus, Literal(1.0))])
+        self.assertEqual('0002    1 ILLEGAL_UNARY       0 (+)', disassemble(chunk)[1])
+
+
+class VirtualMachineTest(unittest.TestCase):
+    def test_statements_share_the_frame(self):
+        outputter = TestOutputter()
+        machine = VirtualMachine(outputter)
+        resolver = Resolver()
+        for text in ['var a = "x";', 'var b = a + "y";', 'print b + a;']:
+            statements = resolver.run(Parser(Scanner(text).iter_tokens()).parse())
+            machine.interpret(statements)
+        self.assertEqual('xyx', outputter.message)
+
+    def test_stack_is_left_empty(self):
+        outputter = TestOutputter()
+        machine = VirtualMachine(outputter)
+        self.assertIsNone(machine.run(compile_chunk(resolved('1 + 2;\nprint 3;'))))
+        self.assertEqual('3.0', outputter.message)
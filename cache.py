@@ -0,0 +1,323 @@
+import gc
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+
+from typing import Any, Dict, Generic, List, Optional, Tuple, TypeVar
+
+import statement
+from expression import Binary, Common, Grouping, Literal, Reuse, Unary
+from expression import Variable as VariableExpression
+from scanner import PUNCTUATION
+from source import LineMap, Source
+from statement import Statement
+from symbols import SymbolTable
+from tok import Token, TokenType
+
+# bump whenever the encoding below or the meaning of a tree changes
+VERSION = 4
+MAGIC = b'plox-ast'
+DIRECTORY = '__loxcache__'
+SUFFIX = '.ast'
+MAXIMUM_BYTES = 64 << 20
+
+TOKEN_TYPES = {t.value: t for t in TokenType}
+# operators are stored as their type alone
+OPERATOR_LEXEMES = {t: lexeme for lexeme, t in PUNCTUATION.items()}
+# and the type their operands were proven to have by its index here
+PROVEN = (None, float, str)
+
+T = TypeVar('T')
+
+# a tree is stored as one flat tuple in postfix order: each node's children
+# come before its code and fields, so neither writing nor reading it recurses
+# and marshal never sees nesting deeper than one level
+(
+    BINARY,
+    GROUPING,
+    LITERAL,
+    UNARY,
+    VARIABLE,
+    EXPRESSION_STATEMENT,
+    PRINT_STATEMENT,
+    VARIABLE_STATEMENT,
+    COMMON,
+    REUSE,
+) = range(10)
+
+
+def _children(node: object) -> Tuple[object, ...]:
+    if isinstance(node, Binary):
+        return (node.left, node.right)
+    elif isinstance(
+        node, (Grouping, Unary, Common, statement.Expression, statement.Print)
+    ):
+        return (node.expression,)
+    elif isinstance(node, statement.Variable) and node.initializer is not None:
+        return (node.initializer,)
+    return ()
+
+
+def _fields(node: object) -> Tuple[object, ...]:
+    if isinstance(node, Binary):
+        operator = node.operator
+        proven = PROVEN.index(node.operands)
+        return (BINARY, operator.token_type.value, operator.offset, proven)
+    elif isinstance(node, Grouping):
+        return (GROUPING,)
+    elif isinstance(node, Literal):
+        return (LITERAL, node.value)
+    elif isinstance(node, Unary):
+        operator = node.operator
+        proven = PROVEN.index(node.operands)
+        return (UNARY, operator.token_type.value, operator.offset, proven)
+    elif isinstance(node, VariableExpression):
+        return (VARIABLE, node.name.lexeme, node.name.offset, node.slot)
+    elif isinstance(node, statement.Expression):
+        return (EXPRESSION_STATEMENT,)
+    elif isinstance(node, statement.Print):
+        return (PRINT_STATEMENT,)
+    elif isinstance(node, statement.Variable):
+        initialized = node.initializer is not None
+        name = node.name
+        return (VARIABLE_STATEMENT, name.lexeme, name.offset, initialized, node.slot)
+    elif isinstance(node, Common):
+        return (COMMON, node.slot)
+    elif isinstance(node, Reuse):
+        # the repeated subexpression is written once, with its Common
+        return (REUSE, node.slot)
+    raise TypeError(f'Cannot encode {type(node).__name__}')
+
+
+def encode(statements: List[Statement]) -> Tuple[object, ...]:
+    flat: List[object] = []
+    for root in statements:
+        stack: List[Tuple[object, bool]] = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                flat.extend(_fields(node))
+                continue
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(_children(node)))
+    return tuple(flat)
+
+
+def decode(
+    flat: Tuple[Any, ...],
+    lines: LineMap,
+    symbols: Optional[SymbolTable] = None,
+    start: int = 0,
+) -> List[Statement]:
+    # decoding only builds acyclic nodes, so there is nothing for the
+    # collector to find; left on, it rescans the growing tree
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _decode(flat, lines, symbols, start)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _decode(
+    flat: Tuple[Any, ...],
+    lines: LineMap,
+    symbols: Optional[SymbolTable],
+    start: int,
+) -> List[Statement]:
+    # operator tokens keep their offset (moved on by start when the tree was
+    # encoded from a slice of the source), so errors still report a line and
+    # column from the (lazily indexed) source they came from
+    def operator(code: int, offset: int) -> Token:
+        token_type = TOKEN_TYPES[code]
+        lexeme = OPERATOR_LEXEMES[token_type]
+        return Token(token_type, lexeme, None, None, None, start + offset, lines)
+
+    def name(lexeme: str, offset: int) -> Token:
+        symbol = None
+        if symbols is not None:
+            symbol = symbols.intern(lexeme)
+            lexeme = symbols.names[symbol]
+        offset += start
+        return Token(TokenType.IDENTIFIER, lexeme, lexeme, None, symbol, offset, lines)
+
+    stack: List[Any] = []
+    # a statement's Common nodes come before its Reuses in postfix order
+    common: Dict[int, Any] = {}
+    i = 0
+    while i < len(flat):
+        code = flat[i]
+        if code == BINARY:
+            right = stack.pop()
+            left = stack.pop()
+            token = operator(flat[i + 1], flat[i + 2])
+            stack.append(Binary(left, token, right, PROVEN[flat[i + 3]]))
+            i += 4
+        elif code == GROUPING:
+            stack.append(Grouping(stack.pop()))
+            i += 1
+        elif code == LITERAL:
+            stack.append(Literal(flat[i + 1]))
+            i += 2
+        elif code == UNARY:
+            token = operator(flat[i + 1], flat[i + 2])
+            stack.append(Unary(token, stack.pop(), PROVEN[flat[i + 3]]))
+            i += 4
+        elif code == VARIABLE:
+            variable = name(flat[i + 1], flat[i + 2])
+            stack.append(VariableExpression(variable, flat[i + 3]))
+            i += 4
+        elif code == EXPRESSION_STATEMENT:
+            stack.append(statement.Expression(stack.pop()))
+            i += 1
+        elif code == PRINT_STATEMENT:
+            stack.append(statement.Print(stack.pop()))
+            i += 1
+        elif code == VARIABLE_STATEMENT:
+            initializer = stack.pop() if flat[i + 3] else None
+            variable = name(flat[i + 1], flat[i + 2])
+            stack.append(statement.Variable(variable, initializer, flat[i + 4]))
+            i += 5
+        elif code == COMMON:
+            expression = common[flat[i + 1]] = stack.pop()
+            stack.append(Common(expression, flat[i + 1]))
+            i += 2
+        elif code == REUSE:
+            stack.append(Reuse(common[flat[i + 1]], flat[i + 1]))
+            i += 2
+        else:
+            raise ValueError(f'Unknown node code {code!r}')
+    return stack
+
+
+class SourceCache(Generic[T]):
+    # What was made from a source, on disk, one file per distinct source,
+    # named by a hash of the source, its encoding and the interpreter and
+    # Python versions. A file that does not match exactly is a miss. Least
+    # recently used files are evicted once the directory grows past
+    # maximum_bytes. Subclasses choose their suffix and how what they keep
+    # is encoded.
+    suffix: str
+
+    def __init__(
+        self, directory: str, maximum_bytes: int = MAXIMUM_BYTES, variant: str = ''
+    ):
+        self.directory = directory
+        self.maximum_bytes = maximum_bytes
+        # names the passes that ran over stored trees, so that differently
+        # optimized trees for one source never mix
+        self.variant = variant
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, source: Source) -> str:
+        digest = hashlib.sha256()
+        tag = sys.implementation.cache_tag
+        digest.update(f'{VERSION} {tag} {self.variant} '.encode())
+        # offsets count characters in text and bytes in binary sources
+        if isinstance(source, str):
+            digest.update(b'text ')
+            digest.update(source.encode('utf-8', 'surrogatepass'))
+        else:
+            digest.update(b'bytes ')
+            digest.update(source)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def load(
+        self, source: Source, symbols: Optional[SymbolTable] = None
+    ) -> Optional[T]:
+        key = self.key(source)
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                magic, version, stored, flat = marshal.load(f)
+            if (magic, version, stored) != (MAGIC, VERSION, key):
+                raise ValueError('Stale cache entry')
+            value = self._decode(flat, source, symbols)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, EOFError, ValueError, TypeError, IndexError, KeyError):
+            # truncated, corrupt or foreign: drop it and parse from source
+            self.misses += 1
+            self._remove(path)
+            return None
+        self.hits += 1
+        # the modification time doubles as the last use for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def store(self, source: Source, value: T) -> None:
+        key = self.key(source)
+        data = marshal.dumps((MAGIC, VERSION, key, self._encode(value)))
+        os.makedirs(self.directory, exist_ok=True)
+        # written aside and renamed so a concurrent reader never sees half a file
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, self._path(key))
+        except OSError:
+            self._remove(temporary)
+            return
+        self.evict()
+
+    def _encode(self, value: T) -> Any:
+        raise NotImplementedError
+
+    def _decode(self, flat: Any, source: Source, symbols: Optional[SymbolTable]) -> T:
+        raise NotImplementedError
+
+    def evict(self) -> None:
+        entries: Dict[str, os.stat_result] = {}
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith(self.suffix):
+                        entries[entry.path] = entry.stat()
+        except OSError:
+            return
+        total = sum(s.st_size for s in entries.values())
+        for path in sorted(entries, key=lambda p: entries[p].st_mtime_ns):
+            if total <= self.maximum_bytes:
+                break
+            total -= entries[path].st_size
+            self._remove(path)
+            self.evictions += 1
+
+    def report(self) -> List[str]:
+        counts = [
+            ('cache hits', self.hits),
+            ('cache misses', self.misses),
+            ('cache evictions', self.evictions),
+        ]
+        return [f'{name:<16} {count:12,}' for name, count in counts]
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class AstCache(SourceCache[List[Statement]]):
+    # parsed programs, resolved and optimized
+    suffix = SUFFIX
+
+    def _encode(self, statements: List[Statement]) -> Any:
+        return encode(statements)
+
+    def _decode(
+        self, flat: Any, source: Source, symbols: Optional[SymbolTable]
+    ) -> List[Statement]:
+        return decode(flat, LineMap(source), symbols)
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench import generate_arithmetic, measure, report
+from cache import AstCache
+from parser import Parser
+from scanner import Scanner
+from symbols import SymbolTable
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+
+def generate_script(statements: int) -> str:
+    rng = random.Random(0)
+    lines = [f'print {generate_arithmetic(rng, 4)};' for _ in range(statements)]
+    return '\n'.join(lines) + '\n'
+
+
+def run(filename: str, directory: str) -> float:
+    # a whole process, start to exit, as a user would see it
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, MAIN, '-f', filename, '--cache', directory],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--statements', type=int, default=20000)
+    args = parser.parse_args()
+
+    text = generate_script(args.statements)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'bench.lox')
+        with open(filename, 'w') as f:
+            f.write(text)
+        cache = AstCache(os.path.join(directory, 'cache'))
+
+        statements = Parser(Scanner(text, SymbolTable()).iter_tokens()).parse()
+        cache.store(text, statements)
+        size = sum(e.stat().st_size for e in os.scandir(cache.directory))
+        print(f'{len(text):,} characters, {len(statements):,} statements')
+        print(f'{size:,} bytes cached')
+
+        def parse() -> None:
+            Parser(Scanner(text, SymbolTable()).iter_tokens()).parse()
+
+        def load() -> None:
+            cache.load(text, SymbolTable())
+
+        report('scan and parse', measure(parse), len(statements), 'statements')
+        report('cache load', measure(load), len(statements), 'statements')
+
+        cold = min(
+            run(filename, os.path.join(directory, f'cold{i}')) for i in range(3)
+        )
+        run(filename, cache.directory)
+        warm = min(run(filename, cache.directory) for _ in range(3))
+        report('cold start', cold, len(statements), 'statements')
+        report('warm start', warm, len(statements), 'statements')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import marshal
+import os
+import tempfile
+import unittest
+
+from cache import AstCache, SUFFIX, decode, encode
+from input import TestInputter
+from main import Application as Main
+from optimizer import CommonSubexpressions, TypeAnnotator
+from output import TestOutputter
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+from source import LineMap
+from symbols import SymbolTable
+
+TEXT = 'print -(1 + 2) * 3 >= !nil;\n"a" == "b";\nprint 1 - 2 - 3;'
+
+
+class EncodingTest(unittest.TestCase):
+    def test_round_trip(self):
+        statements = Parser(Scanner(TEXT).iter_tokens()).parse()
+        self.assertEqual(statements, decode(encode(statements), LineMap(TEXT)))
+
+    def test_round_trip_keeps_positions(self):
+        statements = Parser(Scanner(TEXT).iter_tokens()).parse()
+        decoded = decode(encode(statements), LineMap(TEXT))
+        operator = decoded[2].expression.operator
+        self.assertEqual((3, 13), (operator.line, operator.column))
+
+    def test_round_trip_interns_names(self):
+        text = 'alpha + beta * alpha;'
+        statements = Parser(Scanner(text).iter_tokens()).parse()
+        symbols = SymbolTable()
+        [decoded] = decode(encode(statements), LineMap(text), symbols)
+        self.assertEqual(['alpha', 'beta'], symbols.names)
+        self.assertEqual(0, decoded.expression.right.right.name.symbol)
+
+    def test_round_trip_keeps_proven_types(self):
+        statements = TypeAnnotator().run(Parser(Scanner(TEXT).iter_tokens()).parse())
+        decoded = decode(encode(statements), LineMap(TEXT))
+        left = decoded[0].expression.left
+        self.assertEqual((float, float), (left.operands, left.left.operands))
+        self.assertIsNone(decoded[0].expression.operands)
+
+    def test_round_trip_keeps_common_subexpressions(self):
+        text = 'print (1 - a) * (1 - a) + -b;\nprint -b + -b;'
+        statements = Parser(Scanner(text).iter_tokens()).parse()
+        statements = CommonSubexpressions().run(statements)
+        decoded = decode(encode(statements), LineMap(text))
+        self.assertEqual(statements, decoded)
+        product = decoded[0].expression.left
+        common, reuse = product.left, product.right
+        self.assertIs(common.expression, reuse.expression)
+
+    def test_round_trip_keeps_slots(self):
+        text = 'var a = 1;\nvar b;\nprint b + a;'
+        statements = Resolver().run(Parser(Scanner(text).iter_tokens()).parse())
+        decoded = decode(encode(statements), LineMap(text))
+        self.assertEqual([0, 1], [decoded[0].slot, decoded[1].slot])
+        expression = decoded[2].expression
+        self.assertEqual([1, 0], [expression.left.slot, expression.right.slot])
+
+    def test_deep_tree_is_flat(self):
+        depth = 10000
+        text = '(' * depth + '1' + ')' * depth + ';'
+        statements = Parser(Scanner(text).iter_tokens(), explicit_stack=True).parse()
+        flat = encode(statements)
+        decoded = decode(marshal.loads(marshal.dumps(flat)), LineMap(text))
+        self.assertEqual(flat, encode(decoded))
+
+
+class AstCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = AstCache(self.directory.name)
+        self.statements = Parser(Scanner(TEXT).iter_tokens()).parse()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def entries(self):
+        return sorted(n for n in os.listdir(self.directory.name) if n.endswith(SUFFIX))
+
+    def test_miss_then_hit(self):
+        self.assertIsNone(self.cache.load(TEXT))
+        self.cache.store(TEXT, self.statements)
+        self.assertEqual(self.statements, self.cache.load(TEXT))
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_changed_source_misses(self):
+        self.cache.store(TEXT, self.statements)
+        self.assertIsNone(self.cache.load(TEXT + ' '))
+
+    def test_variants_are_kept_apart(self):
+        self.cache.store(TEXT, self.statements)
+        folded = AstCache(self.directory.name, variant='folded')
+        self.assertIsNone(folded.load(TEXT))
+
+    def test_text_and_bytes_are_kept_apart(self):
+        # offsets count characters in one and bytes in the other
+        self.cache.store(TEXT, self.statements)
+        self.assertIsNone(self.cache.load(TEXT.encode()))
+
+    def test_corrupt_entry_misses_and_is_removed(self):
+        self.cache.store(TEXT, self.statements)
+        [name] = self.entries()
+        with open(os.path.join(self.directory.name, name), 'r+b') as f:
+            f.truncate(10)
+        self.assertIsNone(self.cache.load(TEXT))
+        self.assertEqual([], self.entries())
+
+    def test_stale_entry_misses(self):
+        self.cache.store(TEXT, self.statements)
+        [name] = self.entries()
+        with open(os.path.join(self.directory.name, name), 'wb') as f:
+            marshal.dump((b'plox-ast', 0, name[: -len(SUFFIX)], ()), f)
+        self.assertIsNone(self.cache.load(TEXT))
+
+    def test_evicts_least_recently_used(self):
+        sources = [f'print {i};' for i in range(3)]
+        for i, text in enumerate(sources):
+            self.cache.store(text, Parser(Scanner(text).iter_tokens()).parse())
+            path = os.path.join(self.directory.name, self.cache.key(text) + SUFFIX)
+            os.utime(path, ns=(i * 10**9, i * 10**9))
+        size = os.path.getsize(path)
+        self.cache.maximum_bytes = 2 * size
+        self.cache.load(sources[0])
+        self.cache.evict()
+        self.assertEqual(1, self.cache.evictions)
+        self.assertIsNone(self.cache.load(sources[1]))
+        self.assertIsNotNone(self.cache.load(sources[0]))
+
+
+class MainCacheTest(unittest.TestCase):
+    def run_file(self, directory: str, filename: str) -> TestOutputter:
+        outputter = TestOutputter()
+        main = Main(
+            do_printing=False,
+            inputter=TestInputter([]),
+            outputter=outputter,
+            cache_directory=directory,
+        )
+        main.run_file(filename)
+        self.main = main
+        return outputter
+
+    def test_second_run_hits(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'script.lox')
+            with open(filename, 'w') as f:
+                f.write('print 1;\nprint 2 + 3;')
+            cold = self.run_file('', filename)
+            self.assertEqual((0, 1), (self.main.cache.hits, self.main.cache.misses))
+            warm = self.run_file('', filename)
+            self.assertEqual((1, 0), (self.main.cache.hits, self.main.cache.misses))
+            self.assertEqual(
+                (cold.previous, cold.message), (warm.previous, warm.message)
+            )
+            self.assertTrue(os.listdir(os.path.join(directory, '__loxcache__')))
+
+    def test_runtime_errors_are_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'script.lox')
+            with open(filename, 'w') as f:
+                f.write('print 1;\nprint -"a";\nprint 2;')
+            cold = self.run_file(directory, filename)
+            warm = self.run_file(directory, filename)
+            self.assertEqual((1, 0), (self.main.cache.hits, self.main.cache.misses))
+            self.assertEqual(
+                (cold.previous, cold.message), (warm.previous, warm.message)
+            )
+            self.assertEqual('line 2 illegal operand', warm.message[:22])
+
+    def test_syntax_errors_after_a_runtime_error_are_not_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'script.lox')
+            with open(filename, 'w') as f:
+                f.write('print -"a";\nprint (2;')
+            self.run_file(directory, filename)
+            entries = [n for n in os.listdir(directory) if n.endswith(SUFFIX)]
+            self.assertEqual([], entries)
+
+    def test_errors_are_not_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'script.lox')
+            with open(filename, 'w') as f:
+                f.write('print 1;\nprint (2;')
+            self.run_file(directory, filename)
+            entries = [n for n in os.listdir(directory) if n.endswith(SUFFIX)]
+            self.assertEqual([], entries)
+
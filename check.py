@@ -0,0 +1,60 @@
+import concurrent.futures
+import functools
+
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Sequence
+
+from error import LoxError
+from parser import Parser, ParseError
+from scanner import Scanner, ScanError
+from source import load_source
+
+
+@dataclass
+class Diagnostic:
+    filename: str
+    stage: str
+    line: Optional[int]
+    column: Optional[int]
+    message: str
+
+
+def _diagnostic(filename: str, error: LoxError) -> Diagnostic:
+    stage = 'scan' if isinstance(error, ScanError) else 'parse'
+    return Diagnostic(filename, stage, error.line, error.column, error.message)
+
+
+def diagnose(
+    scan_errors: Sequence[ScanError], parse_errors: Sequence[ParseError]
+) -> List[LoxError]:
+    # both stages run over the whole source, so merge them in source order
+    errors: List[LoxError] = [*scan_errors, *parse_errors]
+    return sorted(errors, key=lambda e: (e.line or 0, e.column or 0))
+
+
+def check_file(filename: str, use_mmap: bool = False) -> List[Diagnostic]:
+    # scans and parses without running anything
+    try:
+        source = load_source(filename, use_mmap)
+    except (OSError, UnicodeError) as e:
+        return [Diagnostic(filename, 'io', None, None, str(e))]
+    scan_errors: List[ScanError] = []
+    tokens = Scanner(source, errors=scan_errors).iter_tokens()
+    # nothing walks the tree afterwards, so any nesting depth can be checked
+    _, parse_errors = Parser(tokens, explicit_stack=True).parse_with_errors()
+    return [_diagnostic(filename, e) for e in diagnose(scan_errors, parse_errors)]
+
+
+def check_files(
+    filenames: Sequence[str], jobs: int, use_mmap: bool = False
+) -> Iterator[Diagnostic]:
+    # diagnostics come out grouped by file, in the order the files were given
+    check = functools.partial(check_file, use_mmap=use_mmap)
+    if jobs <= 1 or len(filenames) <= 1:
+        for filename in filenames:
+            yield from check(filename)
+        return
+    chunksize = max(1, len(filenames) // (jobs * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        for diagnostics in executor.map(check, filenames, chunksize=chunksize):
+            yield from diagnostics
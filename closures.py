@@ -0,0 +1,241 @@
+from typing import Any, Callable, Iterable, List
+
+import statement
+from expression import (
+    Binary,
+    Common,
+    Expression,
+    Grouping,
+    Literal,
+    Reuse,
+    Unary,
+    Value,
+    Variable,
+)
+from interpreter import UNCHECKED, UNDEFINED, Interpreter, to_bool
+from output import Outputter, StdoutOutputter
+from statement import Node, Statement
+from tok import Token, TokenType
+
+Closure = Callable[[], Value]
+
+
+class ClosureInterpreter(Interpreter):
+    # A second engine: each statement is compiled once into a tree of Python
+    # closures, one per node, each specialized for its operator, and then
+    # called. Running a closure costs one call per node, in place of
+    # accept(), visit_*() and a walk down the operator chain.
+    #
+    # It shares its frame, outputter and, whenever an operation fails, the
+    # code that raises with Interpreter, so it fails exactly as that does.
+    def __init__(self, outputter: Outputter = StdoutOutputter()):
+        super().__init__(outputter)
+        self._compiler = ClosureCompiler(self)
+
+    def compile(self, node: Node) -> Closure:
+        return node.accept(self._compiler)
+
+    def interpret(self, statements: Iterable[Statement]) -> None:
+        for s in statements:
+            self.compile(s)()
+
+    def evaluate(self, expression: Expression) -> Value:
+        return self.compile(expression)()
+
+
+# One factory per binary operator, each making closures that run only it.
+# Values that fail a guard go to the tree walker's checked operation, which
+# raises the error it would have raised for them.
+def _plus(left: Closure, right: Closure, operator: Token, engine: Interpreter):
+    def plus() -> Value:
+        a = left()
+        b = right()
+        if type(a) is float and type(b) is float:
+            return a + b
+        elif type(a) is str and type(b) is str:
+            return a + b
+        return engine._binary(operator, a, b)
+
+    return plus
+
+
+def _minus(left: Closure, right: Closure, operator: Token, engine: Interpreter):
+    def minus() -> Value:
+        a = left()
+        b = right()
+        if type(a) is float and type(b) is float:
+            return a - b
+        return engine._binary(operator, a, b)
+
+    return minus
+
+
+def _star(left: Closure, right: Closure, operator: Token, engine: Interpreter):
+    def star() -> Value:
+        a = left()
+        b = right()
+        if type(a) is float and type(b) is float:
+            return a * b
+        return engine._binary(operator, a, b)
+
+    return star
+
+
+def _slash(left: Closure, right: Closure, operator: Token, engine: Interpreter):
+    def slash() -> Value:
+        a = left()
+        b = right()
+        if type(a) is float and type(b) is float and b != 0:
+            return a / b
+        return engine._binary(operator, a, b)
+
+    return slash
+
+
+def _comparison(left: Closure, right: Closure, operator: Token, engine: Interpreter):
+    function = UNCHECKED[operator.token_type]
+
+    def compare() -> Value:
+        a = left()
+        b = right()
+        if type(a) is float and type(b) is float:
+            return function(a, b)
+        return engine._binary(operator, a, b)
+
+    return compare
+
+
+def _equal(left: Closure, right: Closure, operator: Token, engine: Interpreter):
+    return lambda: left() == right()
+
+
+def _not_equal(left: Closure, right: Closure, operator: Token, engine: Interpreter):
+    return lambda: left() != right()
+
+
+def _illegal(left: Closure, right: Closure, operator: Token, engine: Interpreter):
+    return lambda: engine._binary(operator, left(), right())
+
+
+BINARY = {
+    TokenType.PLUS: _plus,
+    TokenType.MINUS: _minus,
+    TokenType.STAR: _star,
+    TokenType.SLASH: _slash,
+    TokenType.LESS: _comparison,
+    TokenType.LESS_EQUAL: _comparison,
+    TokenType.GREATER: _comparison,
+    TokenType.GREATER_EQUAL: _comparison,
+    TokenType.EQUAL_EQUAL: _equal,
+    TokenType.BANG_EQUAL: _not_equal,
+}
+
+
+class ClosureCompiler:
+    def __init__(self, engine: ClosureInterpreter):
+        self._engine = engine
+
+    def visit_literal(self, literal: Literal) -> Closure:
+        value = literal.value
+        if type(value) is int:
+            value = float(value)
+        return lambda: value
+
+    def visit_grouping(self, grouping: Grouping) -> Closure:
+        return grouping.expression.accept(self)
+
+    def visit_unary(self, unary: Unary) -> Closure:
+        operand = unary.expression.accept(self)
+        operator = unary.operator
+        engine = self._engine
+        if operator.token_type == TokenType.BANG:
+            return lambda: not to_bool(operand())
+        elif operator.token_type != TokenType.MINUS:
+            return lambda: engine._unary(operator, operand())
+        elif unary.operands is not None:
+            return lambda: -operand()
+
+        def minus() -> Value:
+            value = operand()
+            if type(value) is float:
+                return -value
+            return engine._unary(operator, value)
+
+        return minus
+
+    def visit_binary(self, binary: Binary) -> Closure:
+        left = binary.left.accept(self)
+        right = binary.right.accept(self)
+        operator = binary.operator
+        if binary.operands is not None and operator.token_type != TokenType.SLASH:
+            function = UNCHECKED[operator.token_type]
+            return lambda: function(left(), right())
+        factory = BINARY.get(operator.token_type, _illegal)
+        return factory(left, right, operator, self._engine)
+
+    def visit_variable_expression(self, variable: Variable) -> Closure:
+        # holds UNDEFINED as well as values
+        frame: List[Any] = self._engine._frame
+        slot = variable.slot
+        assert slot is not None
+        engine = self._engine
+
+        def read() -> Value:
+            try:
+                value = frame[slot]
+            except IndexError:
+                value = UNDEFINED
+            if value is UNDEFINED:
+                return Interpreter.visit_variable_expression(engine, variable)
+            return value
+
+        return read
+
+    def visit_common(self, common: Common) -> Closure:
+        expression = common.expression.accept(self)
+        values = self._engine._common
+        slot = common.slot
+
+        def store() -> Value:
+            value = values[slot] = expression()
+            return value
+
+        return store
+
+    def visit_reuse(self, reuse: Reuse) -> Closure:
+        values = self._engine._common
+        slot = reuse.slot
+        return lambda: values[slot]
+
+    def visit_expression_statement(self, s: statement.Expression) -> Closure:
+        expression = s.expression.accept(self)
+
+        def run() -> None:
+            expression()
+
+        return run
+
+    def visit_print_statement(self, s: statement.Print) -> Closure:
+        expression = s.expression.accept(self)
+        engine = self._engine
+
+        def run() -> None:
+            engine.outputter.out(str(expression()))
+
+        return run
+
+    def visit_variable_statement(self, s: statement.Variable) -> Closure:
+        initializer = None
+        if s.initializer is not None:
+            initializer = s.initializer.accept(self)
+        frame = self._engine._frame
+        slot = s.slot
+        assert slot is not None
+
+        def run() -> None:
+            value = None if initializer is None else initializer()
+            if slot >= len(frame):
+                frame.extend([UNDEFINED] * (slot + 1 - len(frame)))
+            frame[slot] = value
+
+        return run
@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+
+import argparse
+import random
+
+from bench import generate_arithmetic, measure, report
+from closures import ClosureInterpreter
+from interpreter import Interpreter
+from optimizer import TypeAnnotator
+from output import TestOutputter
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+from variables_bench import generate_script
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--statements', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    arithmetic = ''.join(
+        f'print {generate_arithmetic(rng, 5)};\n' for _ in range(args.statements)
+    )
+    # left unfolded, as if the operands were not constants, so that every
+    # operation runs
+    checked = Parser(Scanner(arithmetic).iter_tokens()).parse()
+    variables = generate_script(args.statements)
+    scripts = [
+        ('checked', checked),
+        ('proven types', TypeAnnotator().run(checked)),
+        ('variables', Resolver().run(Parser(Scanner(variables).iter_tokens()).parse())),
+    ]
+    print(f'{len(checked):,} statements per script')
+
+    for name, statements in scripts:
+        tree = Interpreter(TestOutputter())
+        seconds = measure(lambda: tree.interpret(statements))
+        report(f'{name}, tree', seconds, len(statements), 'statements')
+        closures = ClosureInterpreter(TestOutputter())
+        seconds = measure(lambda: closures.interpret(statements))
+        report(f'{name}, closures', seconds, len(statements), 'statements')
+        # what a statement run many times over (a loop body) pays per run
+        compiled = [closures.compile(s) for s in statements]
+
+        def run() -> None:
+            for function in compiled:
+                function()
+
+        report(f'{name}, compiled', measure(run), len(statements), 'statements')
+
+
+if __name__ == '__main__':
+    main()
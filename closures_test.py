@@ -0,0 +1,44 @@
+import unittest
+
+from closures import ClosureInterpreter
+from interpreter import Interpreter, InterpretError
+from optimizer import CommonSubexpressions, TypeAnnotator
+from output import TestOutputter
+from testing import resolved
+
+
+class ClosureInterpreterTest(unittest.TestCase):
+    def test_compiled_statement_reads_current_values(self):
+        declaration, show = resolved('var a = 1;\nprint a * 2;')
+        outputter = TestOutputter()
+        interpreter = ClosureInterpreter(outputter)
+        run = interpreter.compile(show)
+        interpreter.interpret([declaration])
+        run()
+        self.assertEqual('2.0', outputter.message)
+        interpreter.interpret(resolved('var a = 5;'))
+        run()
+        self.assertEqual('10.0', outputter.message)
+
+    def test_failed_guard_raises_as_the_tree_walker_does(self):
+        for text in [
+            'print 1 +\n "a";',
+            'print -"a";',
+            'print 2 / (1 - 1);',
+            'print "a" < 1;',
+            'print b;',
+        ]:
+            errors = []
+            for engine in [Interpreter, ClosureInterpreter]:
+                with self.assertRaises(InterpretError) as context:
+                    engine(TestOutputter()).interpret(resolved(text))
+                error = context.exception
+                errors.append((str(error), error.line, error.column))
+            self.assertEqual(errors[0], errors[1], text)
+
+    def test_optimized_trees(self):
+        text = 'var a = 3;\nprint (a - 1) * (a - 1) + -(a - 1);\nprint "x" + "y";'
+        statements = CommonSubexpressions().run(TypeAnnotator().run(resolved(text)))
+        outputter = TestOutputter()
+        ClosureInterpreter(outputter).interpret(statements)
+        self.assertEqual(('2.0', 'xy'), (outputter.previous, outputter.message))
@@ -0,0 +1,23 @@
+from typing import Optional
+
+
+class LoxError(Exception):
+    # an error at a position in a Lox source; str() puts the line in front
+    # of the message, the way every stage has always reported errors
+    prefix = ''
+
+    def __init__(
+        self, message: str, line: Optional[int] = None, column: Optional[int] = None
+    ):
+        super().__init__(message)
+        self.message = message
+        self.line = line
+        self.column = column
+
+    def __str__(self) -> str:
+        if self.line is None:
+            return self.message
+        return f'{self.prefix}{self.line} {self.message}'
+
+    def __reduce__(self):
+        return (self.__class__, (self.message, self.line, self.column))
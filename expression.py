@@ -1,11 +1,31 @@
-from dataclasses import dataclass
-from typing import TYPE_CHECKING, Union
-from typing_extensions import Protocol
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional, Type, TypeVar, Union
+from typing_extensions import Protocol, dataclass_transform
 
 from tok import Token
 from visitor import Visitor
 
 Value = Union[bool, None, float, str]
+T = TypeVar('T')
+
+
+@dataclass_transform(frozen_default=True, field_specifiers=(field,))
+def node(cls: Type[T]) -> Type[T]:
+    # Immutable, so identical subtrees can be shared (see hashcons.py), with
+    # the hash worked out once per node instead of over the whole subtree on
+    # every lookup. The cached value sits outside the fields and so plays no
+    # part in equality.
+    cls = dataclass(frozen=True)(cls)
+    field_hash = cls.__hash__
+
+    def __hash__(self) -> int:
+        cached = self.__dict__.get('_hash')
+        if cached is None:
+            cached = self.__dict__['_hash'] = field_hash(self)
+        return cached
+
+    setattr(cls, '__hash__', __hash__)
+    return cls
 
 
 class Expression(Protocol):
@@ -13,26 +33,31 @@ class Expression(Protocol):
         ...
 
 
-@dataclass
+@node
 class Unary(Expression):
     operator: Token
     expression: Expression
+    # the type the operand is proven to have (see optimizer.TypeAnnotator),
+    # letting the interpreter skip checking it; not part of equality
+    operands: Optional[type] = field(default=None, compare=False)
 
     def accept(self, visitor: Visitor):
         return visitor.visit_unary(self)
 
 
-@dataclass
+@node
 class Binary(Expression):
     left: Expression
     operator: Token
     right: Expression
+    # the type both operands are proven to have, as for Unary
+    operands: Optional[type] = field(default=None, compare=False)
 
     def accept(self, visitor: Visitor):
         return visitor.visit_binary(self)
 
 
-@dataclass
+@node
 class Grouping(Expression):
     expression: Expression
 
@@ -40,7 +65,7 @@ class Grouping(Expression):
         return visitor.visit_grouping(self)
 
 
-@dataclass
+@node
 class Literal(Expression):
     value: Value
 
@@ -48,9 +73,34 @@ class Literal(Expression):
         return visitor.visit_literal(self)
 
 
-@dataclass
+@node
 class Variable(Expression):
-    name: str
+    name: Token
+    # the frame slot the resolver gave name (see resolver.py)
+    slot: Optional[int] = field(default=None, compare=False)
 
     def accept(self, visitor: Visitor):
         return visitor.visit_variable_expression(self)
+
+
+@node
+class Common(Expression):
+    # the first evaluation of a subexpression that is repeated later in the
+    # same statement (see optimizer.CommonSubexpressions); its value is kept
+    # in slot for the Reuse nodes that follow it
+    expression: Expression
+    slot: int
+
+    def accept(self, visitor: Visitor):
+        return visitor.visit_common(self)
+
+
+@node
+class Reuse(Expression):
+    # a repeat of the Common expression with the same slot, evaluated before
+    # it; expression is the Common's own, kept only for reading
+    expression: Expression
+    slot: int
+
+    def accept(self, visitor: Visitor):
+        return visitor.visit_reuse(self)
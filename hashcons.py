@@ -0,0 +1,75 @@
+import math
+
+from typing import Callable, Dict, Optional, Tuple
+
+from expression import Binary, Expression, Grouping, Literal, Unary, Value
+from expression import Variable as VariableExpression
+from tok import Token
+
+BINARY, GROUPING, LITERAL, UNARY, VARIABLE = range(5)
+
+
+class NodeFactory:
+    # what Parser builds expression nodes with; this one makes a new node
+    # every time
+    binary: Callable[..., Binary] = Binary
+    grouping: Callable[..., Grouping] = Grouping
+    literal: Callable[..., Literal] = Literal
+    unary: Callable[..., Unary] = Unary
+    variable: Callable[..., VariableExpression] = VariableExpression
+
+
+class HashCons(NodeFactory):
+    # Hands out one shared node per distinct subtree. Children are shared
+    # already by the time their parent is asked for, so a node is known by
+    # its children's identities and never needs a deep comparison or hash.
+    #
+    # Operator and name tokens count by their offset, so every occurrence
+    # keeps its own and an error raised by a node reports where it is.
+    # Literals, which never raise, are shared across the whole program, as
+    # is anything built from the same tokens again (as optimizer passes do).
+    def __init__(self):
+        self._nodes: Dict[Tuple[object, ...], Expression] = {}
+        self.requests = 0
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _share(self, key: Tuple[object, ...], node: type, *fields: object):
+        self.requests += 1
+        shared = self._nodes.get(key)
+        if shared is None:
+            shared = self._nodes[key] = node(*fields)
+        return shared
+
+    def binary(
+        self,
+        left: Expression,
+        operator: Token,
+        right: Expression,
+        operands: Optional[type] = None,
+    ) -> Binary:
+        key: Tuple[object, ...]
+        key = (BINARY, id(left), operator.token_type, operator.offset, id(right))
+        key += (operands,)
+        return self._share(key, Binary, left, operator, right, operands)
+
+    def grouping(self, expression: Expression) -> Grouping:
+        return self._share((GROUPING, id(expression)), Grouping, expression)
+
+    def literal(self, value: Value) -> Literal:
+        # typed, since true == 1.0, and signed, since 0.0 == -0.0
+        key: Tuple[object, ...] = (LITERAL, type(value), value)
+        if value == 0 and isinstance(value, float):
+            key += (math.copysign(1.0, value),)
+        return self._share(key, Literal, value)
+
+    def unary(
+        self, operator: Token, expression: Expression, operands: Optional[type] = None
+    ) -> Unary:
+        key = (UNARY, operator.token_type, operator.offset, id(expression), operands)
+        return self._share(key, Unary, operator, expression, operands)
+
+    def variable(self, name: Token) -> VariableExpression:
+        key = (VARIABLE, name.lexeme, name.offset)
+        return self._share(key, VariableExpression, name)
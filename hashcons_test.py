@@ -0,0 +1,79 @@
+import dataclasses
+import unittest
+
+from expression import Literal
+from hashcons import HashCons
+from interpreter import Interpreter
+from output import TestOutputter
+from parser import Parser
+from printer import Printer
+from scanner import Scanner
+from testing import parse
+
+
+class HashConsTest(unittest.TestCase):
+    def test_literals_are_shared(self):
+        nodes = HashCons()
+        first, second = parse('print nil;\nprint nil == "key" + "key";', nodes)
+        self.assertIs(first.expression, second.expression.left)
+        key = second.expression.right
+        self.assertIs(key.left, key.right)
+
+    def test_literals_keep_their_type(self):
+        nodes = HashCons()
+        self.assertIsNot(nodes.literal(True), nodes.literal(1.0))
+        self.assertIsNot(nodes.literal(0.0), nodes.literal(-0.0))
+        self.assertIs(nodes.literal(-0.0), nodes.literal(-0.0))
+
+    def test_repeats_keep_their_column(self):
+        nodes = HashCons()
+        [statement] = parse('print (a + 1) * (a + 1);', nodes)
+        left, right = statement.expression.left, statement.expression.right
+        self.assertIsNot(left, right)
+        self.assertIs(left.expression.right, right.expression.right)
+        operator = right.expression.operator
+        self.assertEqual((1, 20), (operator.line, operator.column))
+
+    def test_same_tokens_are_shared(self):
+        nodes = HashCons()
+        [statement] = parse('print -(a + 1);', nodes)
+        unary = statement.expression
+        self.assertIs(unary, nodes.unary(unary.operator, unary.expression))
+
+    def test_proven_types_are_kept_apart(self):
+        nodes = HashCons()
+        [statement] = parse('print 1 + 2;', nodes)
+        plain = statement.expression
+        proven = nodes.binary(plain.left, plain.operator, plain.right, float)
+        self.assertIsNot(plain, proven)
+        self.assertIs(float, proven.operands)
+
+    def test_subtrees_keep_their_line(self):
+        nodes = HashCons()
+        first, second = parse('print -(a + 1);\nprint -(a + 1);', nodes)
+        self.assertIsNot(first.expression, second.expression)
+        self.assertEqual(2, second.expression.operator.line)
+        self.assertEqual(2, second.expression.expression.expression.operator.line)
+
+    def test_same_tree(self):
+        text = 'print -(1 + 2) * (1 + 2) >= !nil;\n"a" + "a" == "a" + "a";'
+        for explicit_stack in (False, True):
+            with self.subTest(explicit_stack=explicit_stack):
+                statements = parse(text, HashCons(), explicit_stack)
+                plain = Parser(Scanner(text).iter_tokens()).parse()
+                self.assertEqual(plain, statements)
+                self.assertEqual(Printer().print(plain), Printer().print(statements))
+
+    def test_interprets_shared_tree(self):
+        outputter = TestOutputter()
+        text = 'print (1 + 2) * (1 + 2);\nprint (1 + 2) * (1 + 2);'
+        statements = parse(text, HashCons())
+        Interpreter(outputter).interpret(statements)
+        self.assertEqual(('9.0', '9.0'), (outputter.previous, outputter.message))
+
+    def test_nodes_are_frozen_and_hash_once(self):
+        literal = Literal(1.0)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            literal.value = 2.0
+        self.assertEqual(hash(literal), hash(Literal(1.0)))
+        self.assertEqual(hash(literal), literal.__dict__['_hash'])
@@ -1,26 +1,61 @@
-from typing import List, Union
+import operator
 
-from expression import Binary, Expression, Grouping, Literal, Unary, Value
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
+
+from error import LoxError
+from expression import (
+    Binary,
+    Common,
+    Expression,
+    Grouping,
+    Literal,
+    Reuse,
+    Unary,
+    Value,
+    Variable,
+)
 from output import Outputter, StdoutOutputter
 from statement import Print, Statement
 from statement import Expression as ExpressionStatement
+from statement import Variable as VariableStatement
 from tok import Token, TokenType
 
 
+# operations on operands already proven to be of the right type
+UNCHECKED: Dict[TokenType, Callable[[Any, Any], Value]] = {
+    TokenType.MINUS: operator.sub,
+    TokenType.PLUS: operator.add,
+    TokenType.STAR: operator.mul,
+    TokenType.SLASH: operator.truediv,
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+}
+
+
+# what a slot holds before its variable is declared
+UNDEFINED = object()
+
+
 def to_bool(value: Value) -> bool:
     # everything but None and False is considered True
     return value != None and value != False
 
 
-class InterpretError(Exception):
-    pass
+class InterpretError(LoxError):
+    prefix = 'line '
 
 
 class Interpreter:
     def __init__(self, outputter: Outputter = StdoutOutputter()):
         self.outputter = outputter
+        # values of the Common subexpressions in the current statement
+        self._common: Dict[int, Value] = {}
+        # every variable's value, at the slot the resolver gave its name
+        self._frame: List[object] = []
 
-    def interpret(self, statements: List[Statement]) -> None:
+    def interpret(self, statements: Iterable[Statement]) -> None:
         for statement in statements:
             self._execute(statement)
 
@@ -30,96 +65,268 @@ class Interpreter:
     def _execute(self, statement: Statement) -> None:
         statement.accept(self)
 
-    def _error(self, line: int, message: str) -> InterpretError:
-        m = f'line {line} {message}'
-        return InterpretError(m)
+    def _error(self, token: Token, message: str) -> InterpretError:
+        return InterpretError(message, token.line, token.column)
 
     def _checkNumberOperand(self, operation: Token, operand: Value) -> None:
         if not isinstance(operand, float):
             raise self._error(
-                operation.line,
+                operation,
                 f'illegal operand for "{operation.lexeme}": must be a number',
             )
 
     def visit_unary(self, unary: Unary) -> Value:
         value = self.evaluate(unary.expression)
-        if unary.operator.token_type == TokenType.MINUS:
-            self._checkNumberOperand(unary.operator, value)
+        if unary.operands is not None:
             return -value
-        elif unary.operator.token_type == TokenType.BANG:
+        return self._unary(unary.operator, value)
+
+    def _unary(self, operator: Token, value: Value) -> Value:
+        # the operation with every check, on an operand already evaluated
+        if operator.token_type == TokenType.MINUS:
+            self._checkNumberOperand(operator, value)
+            return -value
+        elif operator.token_type == TokenType.BANG:
             return not to_bool(value)
-        raise self._error(
-            unary.operator.line, f'Illegal unary operator "{unary.operator.lexeme}"'
-        )
+        raise self._error(operator, f'Illegal unary operator "{operator.lexeme}"')
 
     def visit_binary(self, binary: Binary) -> Value:
         left = self.evaluate(binary.left)
         right = self.evaluate(binary.right)
+        if binary.operands is not None:
+            token_type = binary.operator.token_type
+            if token_type == TokenType.SLASH and right == 0:
+                raise self._error(binary.operator, 'Division by zero')
+            return UNCHECKED[token_type](left, right)
+        return self._binary(binary.operator, left, right)
 
+    def _binary(self, operator: Token, left: Value, right: Value) -> Value:
+        token_type = operator.token_type
         # arithmetic
-        if binary.operator.token_type == TokenType.MINUS:
-            self._checkNumberOperand(binary.operator, left)
-            self._checkNumberOperand(binary.operator, right)
+        if token_type == TokenType.MINUS:
+            self._checkNumberOperand(operator, left)
+            self._checkNumberOperand(operator, right)
             return left - right
-        elif binary.operator.token_type == TokenType.PLUS:
+        elif token_type == TokenType.PLUS:
             if (isinstance(left, float) and isinstance(right, float)) or (
                 isinstance(left, str) and isinstance(right, str)
             ):
                 return left + right
             else:
                 raise self._error(
-                    binary.operator.line,
+                    operator,
                     f'illegal operands "{left}" and "{right}" to "+": both operands must be float or str',
                 )
-        elif binary.operator.token_type == TokenType.STAR:
-            self._checkNumberOperand(binary.operator, left)
-            self._checkNumberOperand(binary.operator, right)
+        elif token_type == TokenType.STAR:
+            self._checkNumberOperand(operator, left)
+            self._checkNumberOperand(operator, right)
             return left * right
-        elif binary.operator.token_type == TokenType.SLASH:
-            self._checkNumberOperand(binary.operator, left)
-            self._checkNumberOperand(binary.operator, right)
+        elif token_type == TokenType.SLASH:
+            self._checkNumberOperand(operator, left)
+            self._checkNumberOperand(operator, right)
             if right == 0:
-                raise self._error(binary.operator.line, 'Division by zero')
+                raise self._error(operator, 'Division by zero')
             return left / right
         # comparison
-        elif binary.operator.token_type == TokenType.LESS:
-            self._checkNumberOperand(binary.operator, left)
-            self._checkNumberOperand(binary.operator, right)
+        elif token_type == TokenType.LESS:
+            self._checkNumberOperand(operator, left)
+            self._checkNumberOperand(operator, right)
             return left < right
-        elif binary.operator.token_type == TokenType.LESS_EQUAL:
-            self._checkNumberOperand(binary.operator, left)
-            self._checkNumberOperand(binary.operator, right)
+        elif token_type == TokenType.LESS_EQUAL:
+            self._checkNumberOperand(operator, left)
+            self._checkNumberOperand(operator, right)
             return left <= right
-        elif binary.operator.token_type == TokenType.GREATER:
-            self._checkNumberOperand(binary.operator, left)
-            self._checkNumberOperand(binary.operator, right)
+        elif token_type == TokenType.GREATER:
+            self._checkNumberOperand(operator, left)
+            self._checkNumberOperand(operator, right)
             return left > right
-        elif binary.operator.token_type == TokenType.GREATER_EQUAL:
-            self._checkNumberOperand(binary.operator, left)
-            self._checkNumberOperand(binary.operator, right)
+        elif token_type == TokenType.GREATER_EQUAL:
+            self._checkNumberOperand(operator, left)
+            self._checkNumberOperand(operator, right)
             return left >= right
         # equality
-        elif binary.operator.token_type == TokenType.BANG_EQUAL:
+        elif token_type == TokenType.BANG_EQUAL:
             return left != right
-        elif binary.operator.token_type == TokenType.EQUAL_EQUAL:
+        elif token_type == TokenType.EQUAL_EQUAL:
             return left == right
 
-        raise self._error(
-            binary.operator.line, f'Illegal binary operator "{binary.operator.lexeme}"'
-        )
+        raise self._error(operator, f'Illegal binary operator "{operator.lexeme}"')
 
     def visit_grouping(self, grouping: Grouping) -> Value:
         return self.evaluate(grouping.expression)
 
     def visit_literal(self, literal: Literal) -> Value:
         value = literal.value
-        # force all numeric values to float type
-        if type(value) in [int, float]:
+        # force all numeric values to float type; the parser and the constant
+        # folder only make floats, so this is rarely taken
+        if type(value) is int:
             return float(value)
         return value
 
+    def visit_variable_expression(self, variable: Variable) -> Value:
+        try:
+            value = self._frame[variable.slot]
+        except IndexError:
+            value = UNDEFINED
+        if value is UNDEFINED:
+            raise self._error(
+                variable.name, f'Undefined variable "{variable.name.lexeme}"'
+            )
+        return value
+
+    def visit_common(self, common: Common) -> Value:
+        value = self.evaluate(common.expression)
+        self._common[common.slot] = value
+        return value
+
+    def visit_reuse(self, reuse: Reuse) -> Value:
+        return self._common[reuse.slot]
+
     def visit_expression_statement(self, statement: ExpressionStatement) -> None:
         return self.evaluate(statement.expression)
 
     def visit_print_statement(self, statement: Print) -> None:
         self.outputter.out(str(self.evaluate(statement.expression)))
+
+    def visit_variable_statement(self, statement: VariableStatement) -> None:
+        value = None
+        if statement.initializer is not None:
+            value = self.evaluate(statement.initializer)
+        frame = self._frame
+        if statement.slot >= len(frame):
+            frame.extend([UNDEFINED] * (statement.slot + 1 - len(frame)))
+        frame[statement.slot] = value
+
+
+class CountingInterpreter(Interpreter):
+    # Counts what a run did with variables and shared subexpressions, for
+    # main.py --stats. Kept apart from Interpreter so that an ordinary run
+    # pays nothing for the counting.
+    def __init__(self, outputter: Outputter = StdoutOutputter()):
+        super().__init__(outputter)
+        # reads answered from their slot; one that is not declared yet ends
+        # the run instead
+        self.hits = 0
+        self.declarations = 0
+        self.reuses = 0
+
+    def visit_variable_expression(self, variable: Variable) -> Value:
+        value = super().visit_variable_expression(variable)
+        self.hits += 1
+        return value
+
+    def visit_variable_statement(self, statement: VariableStatement) -> None:
+        super().visit_variable_statement(statement)
+        self.declarations += 1
+
+    def visit_reuse(self, reuse: Reuse) -> Value:
+        self.reuses += 1
+        return super().visit_reuse(reuse)
+
+    def report(self) -> List[str]:
+        defined = sum(value is not UNDEFINED for value in self._frame)
+        counts = [
+            ('variables', defined),
+            ('declarations', self.declarations),
+            ('variable hits', self.hits),
+            ('reused values', self.reuses),
+        ]
+        return [f'{name:<16} {count:12,}' for name, count in counts]
+
+
+# executions in a row with one operand type before a node specializes, and
+# how often it may fall back to the generic node before it stays there
+WARMUP = 3
+MAXIMUM_DEOPTS = 4
+
+# the operations a node can specialize to, by operator and operand type
+SPECIALIZED: Dict[Tuple[TokenType, type], Callable[[Any, Any], Value]] = {
+    (TokenType.PLUS, float): operator.add,
+    (TokenType.PLUS, str): operator.add,
+    (TokenType.MINUS, float): operator.sub,
+    (TokenType.STAR, float): operator.mul,
+    (TokenType.SLASH, float): operator.truediv,
+    (TokenType.LESS, float): operator.lt,
+    (TokenType.LESS_EQUAL, float): operator.le,
+    (TokenType.GREATER, float): operator.gt,
+    (TokenType.GREATER_EQUAL, float): operator.ge,
+}
+
+
+class QuickeningInterpreter(Interpreter):
+    # A tree walker whose operator nodes specialize themselves to the operand
+    # type they keep seeing (quickening): after WARMUP runs with, say, two
+    # numbers, a "+" becomes a number add behind a guard on both operand
+    # types. A value of another type fails the guard, and the node goes back
+    # to the generic, fully checked operation, which raises the usual error
+    # if there is one. A node that keeps failing its guard stops specializing.
+    #
+    # Nodes are frozen and may be shared, so, like the cached hash, the state
+    # sits in the node's __dict__ outside its fields: '_quick' holds the
+    # specialization, '_warm' what has been seen so far and '_deopts' how
+    # often the guard failed. Sharing it is safe because the guard is always
+    # checked.
+    def __init__(self, outputter: Outputter = StdoutOutputter()):
+        super().__init__(outputter)
+        self.specializations = 0
+        self.deopts = 0
+
+    def visit_unary(self, unary: Unary) -> Value:
+        if unary.operands is not None:
+            return super().visit_unary(unary)
+        value = self.evaluate(unary.expression)
+        state = unary.__dict__
+        if '_quick' in state:
+            if type(value) is float:
+                return -value
+            self._deopt(state)
+        elif unary.operator.token_type == TokenType.MINUS and type(value) is float:
+            self._observe(state, float, operator.neg)
+        return self._unary(unary.operator, value)
+
+    def visit_binary(self, binary: Binary) -> Value:
+        if binary.operands is not None:
+            return super().visit_binary(binary)
+        left = self.evaluate(binary.left)
+        right = self.evaluate(binary.right)
+        state = binary.__dict__
+        quick = state.get('_quick')
+        if quick is not None:
+            kind, function = quick
+            if type(left) is kind and type(right) is kind:
+                try:
+                    return function(left, right)
+                except ZeroDivisionError:
+                    raise self._error(binary.operator, 'Division by zero')
+            self._deopt(state)
+        elif type(left) is type(right):
+            function = SPECIALIZED.get((binary.operator.token_type, type(left)))
+            if function is not None:
+                self._observe(state, type(left), function)
+        return self._binary(binary.operator, left, right)
+
+    def _observe(
+        self, state: Dict[str, Any], kind: type, function: Callable[..., Value]
+    ) -> None:
+        if state.get('_deopts', 0) >= MAXIMUM_DEOPTS:
+            return
+        seen, count = state.get('_warm', (None, 0))
+        count = count + 1 if seen is kind else 1
+        if count < WARMUP:
+            state['_warm'] = (kind, count)
+            return
+        state.pop('_warm', None)
+        state['_quick'] = (kind, function)
+        self.specializations += 1
+
+    def _deopt(self, state: Dict[str, Any]) -> None:
+        del state['_quick']
+        state['_deopts'] = state.get('_deopts', 0) + 1
+        self.deopts += 1
+
+    def report(self) -> List[str]:
+        counts = [
+            ('specializations', self.specializations),
+            ('deopts', self.deopts),
+        ]
+        return [f'{name:<16} {count:12,}' for name, count in counts]
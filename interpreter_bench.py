@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+
+import argparse
+import random
+
+from bench import generate_arithmetic, measure, report
+from interpreter import WARMUP, Interpreter, QuickeningInterpreter
+from optimizer import CommonSubexpressions, TypeAnnotator
+from output import TestOutputter
+from parser import Parser
+from scanner import Scanner
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--statements', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    text = ''.join(
+        f'print {generate_arithmetic(rng, 5)};\n' for _ in range(args.statements)
+    )
+    # each statement repeats one subexpression three times, as generated
+    # scripts often do
+    repeated = ''
+    for _ in range(args.statements):
+        common = generate_arithmetic(rng, 4)
+        repeated += f'print ({common}) * ({common}) - ({common});\n'
+    # left unfolded, as if the operands were not constants, so that every
+    # operation runs
+    checked = Parser(Scanner(text).iter_tokens()).parse()
+    proven = TypeAnnotator().run(checked)
+    plain = Parser(Scanner(repeated).iter_tokens()).parse()
+    shared = CommonSubexpressions().run(plain)
+    print(f'{len(text):,} characters, {len(checked):,} statements')
+
+    for name, statements in [
+        ('checked', checked),
+        ('proven types', proven),
+        ('repeated', plain),
+        ('repeated, cse', shared),
+    ]:
+        interpreter = Interpreter(TestOutputter())
+        seconds = measure(lambda: interpreter.interpret(statements))
+        report(name, seconds, len(statements), 'statements')
+
+    # nodes specialize as they run, so the first runs over a fresh tree pay
+    # for the observing and only later ones run specialized
+    for name, text in [('checked', text), ('repeated', repeated)]:
+        statements = Parser(Scanner(text).iter_tokens()).parse()
+        interpreter = QuickeningInterpreter(TestOutputter())
+        seconds = measure(lambda: interpreter.interpret(statements), repeat=1)
+        report(f'{name}, warming up', seconds, len(statements), 'statements')
+        for _ in range(WARMUP):
+            interpreter.interpret(statements)
+        seconds = measure(lambda: interpreter.interpret(statements))
+        report(f'{name}, quickened', seconds, len(statements), 'statements')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,57 @@
+import operator
 import unittest
 
 from typing import Any
 
+from closures import ClosureInterpreter
 from expression import Binary, Grouping, Literal, Unary
-from interpreter import InterpretError, Interpreter
+from interpreter import (
+    MAXIMUM_DEOPTS,
+    WARMUP,
+    CountingInterpreter,
+    InterpretError,
+    Interpreter,
+    QuickeningInterpreter,
+)
 from output import TestOutputter
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+from expression import Variable
 from statement import Print
+from statement import Variable as VariableStatement
 from tok import Token, TokenType
+from transpiler import PythonInterpreter
+from vm import VirtualMachine
 
 
-class ExecuteTest(unittest.TestCase):
+class EngineTestCase(unittest.TestCase):
+    # the engine under test; every engine must pass the same cases
+    engine = Interpreter
+
+
+class ExecuteTest(EngineTestCase):
     def test_execute_print(self):
         outputter = TestOutputter()
         message = 'hello'
         statement = Print(Literal(value=message))
-        Interpreter(outputter).evaluate(statement)
+        self.engine(outputter).evaluate(statement)
         self.assertEqual(message, outputter.message)
 
     # expression statement execution not tested because it has no observable side effects
 
 
-class EvaluateTest(unittest.TestCase):
+class EvaluateTest(EngineTestCase):
     def test_literals(self):
-        self.assertEqual(False, Interpreter().evaluate(Literal(value=False)))
-        self.assertEqual(True, Interpreter().evaluate(Literal(value=True)))
-        self.assertEqual(None, Interpreter().evaluate(Literal(value=None)))
-        self.assertEqual(5, Interpreter().evaluate(Literal(value=5)))
-        self.assertEqual('string', Interpreter().evaluate(Literal(value='string')))
+        self.assertEqual(False, self.engine().evaluate(Literal(value=False)))
+        self.assertEqual(True, self.engine().evaluate(Literal(value=True)))
+        self.assertEqual(None, self.engine().evaluate(Literal(value=None)))
+        self.assertEqual(5, self.engine().evaluate(Literal(value=5)))
+        self.assertEqual('string', self.engine().evaluate(Literal(value='string')))
 
     def test_grouping(self):
         self.assertEqual(
-            5, Interpreter().evaluate(Grouping(expression=Literal(value=5)))
+            5, self.engine().evaluate(Grouping(expression=Literal(value=5)))
         )
 
     #  _   _ _ __   __ _ _ __ _   _
@@ -44,7 +65,7 @@ class EvaluateTest(unittest.TestCase):
     def test_unary(self):
         self.assertEqual(
             -5,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Unary(
                     operator=Token(TokenType.MINUS, '-', None, 1),
                     expression=Literal(value=5.0),
@@ -54,7 +75,7 @@ class EvaluateTest(unittest.TestCase):
 
         self.assertEqual(
             False,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Unary(
                     operator=Token(TokenType.BANG, '!', None, 1),
                     expression=Literal(value=True),
@@ -64,7 +85,7 @@ class EvaluateTest(unittest.TestCase):
 
     def test_illegal_unary_op(self):
         with self.assertRaisesRegex(InterpretError, 'Illegal unary operator'):
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Unary(
                     operator=Token(TokenType.PLUS, '+', None, 1),
                     expression=Literal(value=False),
@@ -82,7 +103,7 @@ class EvaluateTest(unittest.TestCase):
     def test_false_is_false(self):
         self.assertEqual(
             True,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Unary(
                     operator=Token(TokenType.BANG, '!', None, 1),
                     expression=Literal(value=False),
@@ -93,7 +114,7 @@ class EvaluateTest(unittest.TestCase):
     def test_none_is_false(self):
         self.assertEqual(
             True,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Unary(
                     operator=Token(TokenType.BANG, '!', None, 1),
                     expression=Literal(value=None),
@@ -104,7 +125,7 @@ class EvaluateTest(unittest.TestCase):
     def test_string_is_true(self):
         self.assertEqual(
             False,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Unary(
                     operator=Token(TokenType.BANG, '!', None, 1),
                     expression=Literal(value='foo'),
@@ -114,7 +135,7 @@ class EvaluateTest(unittest.TestCase):
         # empty strings are true too
         self.assertEqual(
             False,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Unary(
                     operator=Token(TokenType.BANG, '!', None, 1),
                     expression=Literal(value=''),
@@ -125,7 +146,7 @@ class EvaluateTest(unittest.TestCase):
     def test_zero_is_false(self):
         self.assertEqual(
             True,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Unary(
                     operator=Token(TokenType.BANG, '!', None, 1),
                     expression=Literal(value=0),
@@ -136,7 +157,7 @@ class EvaluateTest(unittest.TestCase):
     def test_nonzero_number_is_true(self):
         self.assertEqual(
             False,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Unary(
                     operator=Token(TokenType.BANG, '!', None, 1),
                     expression=Literal(value=5),
@@ -157,7 +178,7 @@ class EvaluateTest(unittest.TestCase):
         with self.assertRaisesRegex(
             InterpretError, 'both operands must be float or str'
         ):
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=5),
                     operator=Token(TokenType.PLUS, '+', None, 1),
@@ -168,7 +189,7 @@ class EvaluateTest(unittest.TestCase):
     def test_binary_plus(self):
         self.assertEqual(
             5,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=2),
                     operator=Token(TokenType.PLUS, '+', None, 1),
@@ -180,7 +201,7 @@ class EvaluateTest(unittest.TestCase):
     def test_binary_minus(self):
         self.assertEqual(
             5,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=7),
                     operator=Token(TokenType.MINUS, '-', None, 1),
@@ -192,7 +213,7 @@ class EvaluateTest(unittest.TestCase):
     def test_binary_multiply(self):
         self.assertEqual(
             35,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=7),
                     operator=Token(TokenType.STAR, '*', None, 1),
@@ -204,7 +225,7 @@ class EvaluateTest(unittest.TestCase):
     def test_binary_divide(self):
         self.assertEqual(
             5,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=35),
                     operator=Token(TokenType.SLASH, '/', None, 1),
@@ -215,7 +236,7 @@ class EvaluateTest(unittest.TestCase):
 
     def test_binary_divide_by_zero(self):
         with self.assertRaisesRegex(InterpretError, 'Division by zero'):
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=5),
                     operator=Token(TokenType.SLASH, '/', None, 1),
@@ -226,7 +247,7 @@ class EvaluateTest(unittest.TestCase):
     def test_chained_binary_ops(self):
         self.assertEqual(
             420,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Binary(
                         left=Literal(4),
@@ -246,7 +267,7 @@ class EvaluateTest(unittest.TestCase):
     def test_string_concatenation_with_plus(self):
         self.assertEqual(
             'helloWorld',
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value='hello'),
                     operator=Token(TokenType.PLUS, '+', None, 1),
@@ -258,7 +279,7 @@ class EvaluateTest(unittest.TestCase):
     def test_less(self):
         self.assertEqual(
             True,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=4),
                     operator=Token(TokenType.LESS, '<', None, 1),
@@ -268,7 +289,7 @@ class EvaluateTest(unittest.TestCase):
         )
         self.assertEqual(
             False,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=5),
                     operator=Token(TokenType.LESS, '<', None, 1),
@@ -280,7 +301,7 @@ class EvaluateTest(unittest.TestCase):
     def test_less_equal(self):
         self.assertEqual(
             True,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=5),
                     operator=Token(TokenType.LESS_EQUAL, '<=', None, 1),
@@ -290,7 +311,7 @@ class EvaluateTest(unittest.TestCase):
         )
         self.assertEqual(
             False,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=6),
                     operator=Token(TokenType.LESS_EQUAL, '<=', None, 1),
@@ -302,7 +323,7 @@ class EvaluateTest(unittest.TestCase):
     def test_greater(self):
         self.assertEqual(
             True,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=5),
                     operator=Token(TokenType.GREATER, '>', None, 1),
@@ -312,7 +333,7 @@ class EvaluateTest(unittest.TestCase):
         )
         self.assertEqual(
             False,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=4),
                     operator=Token(TokenType.GREATER, '>', None, 1),
@@ -324,7 +345,7 @@ class EvaluateTest(unittest.TestCase):
     def test_greater_equal(self):
         self.assertEqual(
             True,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=6),
                     operator=Token(TokenType.GREATER_EQUAL, '>=', None, 1),
@@ -334,7 +355,7 @@ class EvaluateTest(unittest.TestCase):
         )
         self.assertEqual(
             False,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=4),
                     operator=Token(TokenType.GREATER_EQUAL, '>=', None, 1),
@@ -346,7 +367,7 @@ class EvaluateTest(unittest.TestCase):
     def test_bang_equal(self):
         self.assertEqual(
             True,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=4),
                     operator=Token(TokenType.BANG_EQUAL, '!=', None, 1),
@@ -357,7 +378,7 @@ class EvaluateTest(unittest.TestCase):
 
         self.assertEqual(
             False,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=5),
                     operator=Token(TokenType.BANG_EQUAL, '!=', None, 1),
@@ -367,11 +388,11 @@ class EvaluateTest(unittest.TestCase):
         )
 
 
-class EvaluateEqualityTest(unittest.TestCase):
+class EvaluateEqualityTest(EngineTestCase):
     def do_test(self, expected: bool, left: Any, right: Any) -> None:
         self.assertEqual(
             expected,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=left),
                     operator=Token(TokenType.EQUAL_EQUAL, '==', None, 1),
@@ -408,11 +429,11 @@ class EvaluateEqualityTest(unittest.TestCase):
         self.expect_not_equal(None, 'foo')
 
 
-class EvaluateInequalityTest(unittest.TestCase):
+class EvaluateInequalityTest(EngineTestCase):
     def do_test(self, expected: bool, left: Any, right: Any) -> None:
         self.assertEqual(
             expected,
-            Interpreter().evaluate(
+            self.engine().evaluate(
                 Binary(
                     left=Literal(value=left),
                     operator=Token(TokenType.BANG_EQUAL, '!=', None, 1),
@@ -447,3 +468,231 @@ class EvaluateInequalityTest(unittest.TestCase):
         self.expect_not_equal(True, None)
         self.expect_not_equal(None, 1)
         self.expect_not_equal(None, 'foo')
+
+
+class ErrorTest(EngineTestCase):
+    def test_error_position(self):
+        tokens = Scanner('print 1;\n print 1 +\n "a";').iter_tokens()
+        statements = Parser(tokens).parse()
+        with self.assertRaises(InterpretError) as context:
+            self.engine(TestOutputter()).interpret(statements)
+        self.assertRegex(str(context.exception), '^line 2 illegal operands')
+        self.assertEqual(2, context.exception.line)
+        self.assertEqual(10, context.exception.column)
+
+
+class ProvenOperandsTest(EngineTestCase):
+    def binary(self, left: Any, token_type: TokenType, right: Any) -> Binary:
+        operator = Token(token_type, token_type.name, None, 1)
+        return Binary(Literal(left), operator, Literal(right), type(left))
+
+    def test_unchecked_operations(self):
+        evaluate = self.engine().evaluate
+        self.assertEqual(5.0, evaluate(self.binary(7.0, TokenType.MINUS, 2.0)))
+        self.assertEqual('ab', evaluate(self.binary('a', TokenType.PLUS, 'b')))
+        self.assertEqual(3.5, evaluate(self.binary(7.0, TokenType.SLASH, 2.0)))
+        self.assertTrue(evaluate(self.binary(1.0, TokenType.LESS, 2.0)))
+        minus = Token(TokenType.MINUS, '-', None, 1)
+        self.assertEqual(-2.0, evaluate(Unary(minus, Literal(2.0), float)))
+
+    def test_division_by_zero_is_still_checked(self):
+        with self.assertRaisesRegex(InterpretError, 'Division by zero'):
+            self.engine().evaluate(self.binary(1.0, TokenType.SLASH, 0.0))
+
+
+class VariableTest(EngineTestCase):
+    def test_declare_and_read(self):
+        name = Token(TokenType.IDENTIFIER, 'a', 'a', 1)
+        interpreter = self.engine()
+        interpreter.interpret([VariableStatement(name, Literal(2.0), 3)])
+        self.assertEqual(2.0, interpreter.evaluate(Variable(name, 3)))
+        interpreter.interpret([VariableStatement(name, None, 3)])
+        self.assertIsNone(interpreter.evaluate(Variable(name, 3)))
+
+    def test_undefined(self):
+        name = Token(TokenType.IDENTIFIER, 'b', 'b', 4)
+        interpreter = self.engine()
+        for slot in [0, 5]:
+            with self.assertRaisesRegex(InterpretError, 'Undefined variable "b"'):
+                interpreter.evaluate(Variable(name, slot))
+            interpreter.interpret([VariableStatement(name, None, 1)])
+
+
+class CountingInterpreterTest(unittest.TestCase):
+    def test_counts(self):
+        name = Token(TokenType.IDENTIFIER, 'a', 'a', 1)
+        interpreter = CountingInterpreter(TestOutputter())
+        interpreter.interpret([VariableStatement(name, Literal(2.0), 1)])
+        for _ in range(3):
+            interpreter.evaluate(Variable(name, 1))
+        with self.assertRaises(InterpretError):
+            interpreter.evaluate(Variable(name, 0))
+        self.assertEqual((1, 3), (interpreter.declarations, interpreter.hits))
+        self.assertIn('variable hits               3', interpreter.report())
+
+
+class QuickeningInterpreterTest(unittest.TestCase):
+    def setUp(self):
+        self.resolver = Resolver()
+        self.interpreter = QuickeningInterpreter(TestOutputter())
+
+    def run_lox(self, text: str) -> Any:
+        statements = self.resolver.run(Parser(Scanner(text).iter_tokens()).parse())
+        self.interpreter.interpret(statements)
+        return statements
+
+    def test_specializes_then_deopts(self):
+        self.run_lox('var a = 1; var b = 2;')
+        [show] = self.run_lox('print a + b;')
+        expression = show.expression
+        for _ in range(WARMUP):
+            self.interpreter.interpret([show])
+        self.assertEqual((float, operator.add), expression.__dict__['_quick'])
+        self.assertEqual('3.0', self.interpreter.outputter.message)
+        self.run_lox('var a = "a"; var b = "b";')
+        self.interpreter.interpret([show])
+        self.assertEqual('ab', self.interpreter.outputter.message)
+        self.assertNotIn('_quick', expression.__dict__)
+        counts = (self.interpreter.specializations, self.interpreter.deopts)
+        self.assertEqual((1, 1), counts)
+        self.assertEqual(
+            ['specializations             1', 'deopts                      1'],
+            self.interpreter.report(),
+        )
+
+    def test_errors_after_specializing(self):
+        self.run_lox('var a = 2;')
+        division, negation = self.run_lox('6 / a;\n-a;')
+        for _ in range(WARMUP):
+            self.interpreter.interpret([division, negation])
+        self.assertEqual(2, self.interpreter.specializations)
+        self.run_lox('var a = 0;')
+        # a number passes the guard, so this is caught without a deopt
+        with self.assertRaisesRegex(InterpretError, 'Division by zero'):
+            self.interpreter.interpret([division])
+        self.run_lox('var a = "a";')
+        with self.assertRaisesRegex(InterpretError, '^line 2 illegal operand for "-"'):
+            self.interpreter.interpret([negation])
+        self.assertEqual(1, self.interpreter.deopts)
+
+    def test_stops_specializing(self):
+        self.run_lox('var a = 1;')
+        [addition] = self.run_lox('a + a;')
+        for _ in range(10):
+            for value in ['1'] * WARMUP + ['"s"']:
+                self.run_lox(f'var a = {value};')
+                self.interpreter.interpret([addition])
+        counts = (self.interpreter.specializations, self.interpreter.deopts)
+        self.assertEqual((MAXIMUM_DEOPTS, MAXIMUM_DEOPTS), counts)
+
+
+class QuickeningExecuteTest(ExecuteTest):
+    engine = QuickeningInterpreter
+
+
+class QuickeningEvaluateTest(EvaluateTest):
+    engine = QuickeningInterpreter
+
+
+class QuickeningEvaluateEqualityTest(EvaluateEqualityTest):
+    engine = QuickeningInterpreter
+
+
+class QuickeningEvaluateInequalityTest(EvaluateInequalityTest):
+    engine = QuickeningInterpreter
+
+
+class QuickeningErrorTest(ErrorTest):
+    engine = QuickeningInterpreter
+
+
+class QuickeningProvenOperandsTest(ProvenOperandsTest):
+    engine = QuickeningInterpreter
+
+
+class QuickeningVariableTest(VariableTest):
+    engine = QuickeningInterpreter
+
+
+class ClosureExecuteTest(ExecuteTest):
+    engine = ClosureInterpreter
+
+
+class ClosureEvaluateTest(EvaluateTest):
+    engine = ClosureInterpreter
+
+
+class ClosureEvaluateEqualityTest(EvaluateEqualityTest):
+    engine = ClosureInterpreter
+
+
+class ClosureEvaluateInequalityTest(EvaluateInequalityTest):
+    engine = ClosureInterpreter
+
+
+class ClosureErrorTest(ErrorTest):
+    engine = ClosureInterpreter
+
+
+class ClosureProvenOperandsTest(ProvenOperandsTest):
+    engine = ClosureInterpreter
+
+
+class ClosureVariableTest(VariableTest):
+    engine = ClosureInterpreter
+
+
+class VirtualMachineExecuteTest(ExecuteTest):
+    engine = VirtualMachine
+
+
+class VirtualMachineEvaluateTest(EvaluateTest):
+    engine = VirtualMachine
+
+
+class VirtualMachineEvaluateEqualityTest(EvaluateEqualityTest):
+    engine = VirtualMachine
+
+
+class VirtualMachineEvaluateInequalityTest(EvaluateInequalityTest):
+    engine = VirtualMachine
+
+
+class VirtualMachineErrorTest(ErrorTest):
+    engine = VirtualMachine
+
+
+class VirtualMachineProvenOperandsTest(ProvenOperandsTest):
+    engine = VirtualMachine
+
+
+class VirtualMachineVariableTest(VariableTest):
+    engine = VirtualMachine
+
+
+class PythonExecuteTest(ExecuteTest):
+    engine = PythonInterpreter
+
+
+class PythonEvaluateTest(EvaluateTest):
+    engine = PythonInterpreter
+
+
+class PythonEvaluateEqualityTest(EvaluateEqualityTest):
+    engine = PythonInterpreter
+
+
+class PythonEvaluateInequalityTest(EvaluateInequalityTest):
+    engine = PythonInterpreter
+
+
+class PythonErrorTest(ErrorTest):
+    engine = PythonInterpreter
+
+
+class PythonProvenOperandsTest(ProvenOperandsTest):
+    engine = PythonInterpreter
+
+
+class PythonVariableTest(VariableTest):
+    engine = PythonInterpreter
@@ -1,13 +1,50 @@
 #!/usr/bin/python3
 
 import argparse
+import json
+import os
+import sys
 
+from dataclasses import asdict
+from typing import Iterable, List, Optional, Sequence, Union
+
+from bytecode import compile_chunk, disassemble
+from cache import AstCache, DIRECTORY
+from check import check_files, diagnose
+from closures import ClosureInterpreter
 from input import Inputter, StdinInputter
-from interpreter import Interpreter, InterpretError
-from parser import Parser, ParseError
+from interpreter import (
+    CountingInterpreter,
+    Interpreter,
+    InterpretError,
+    QuickeningInterpreter,
+)
+from parser import Parser, ParseError, parse_parallel
 from printer import Printer
+from resolver import Resolver
+from optimizer import LEVELS, passes
 from output import Outputter, StdoutOutputter
 from scanner import Scanner, ScanError
+from source import load_source
+from statement import Statement
+from symbols import SymbolTable
+from transpiler import ModuleCache, Program, PythonInterpreter, compile_program
+from vm import VirtualMachine
+
+# what --engine can choose to run programs
+ENGINES = {
+    'tree': Interpreter,
+    'quick': QuickeningInterpreter,
+    'closure': ClosureInterpreter,
+    'vm': VirtualMachine,
+    'python': PythonInterpreter,
+}
+# the engines --stats can count the work of; the tree walker counts in a
+# subclass, so that an ordinary run pays nothing for it
+STATS_ENGINES = {
+    'tree': CountingInterpreter,
+    'quick': QuickeningInterpreter,
+}
 
 
 class Application:
@@ -16,23 +53,52 @@ class Application:
         do_printing: bool,
         inputter: Inputter = StdinInputter(),
         outputter: Outputter = StdoutOutputter(),
+        use_mmap: bool = False,
+        jobs: Optional[int] = None,
+        cache_directory: Optional[str] = None,
+        optimization_level: int = 1,
+        time_passes: bool = False,
+        stats: bool = False,
+        engine: str = 'tree',
+        do_disassembly: bool = False,
     ):
         self.do_printing = do_printing
+        self.use_mmap = use_mmap
+        self.jobs = jobs
+        # None disables the AST cache; '' keeps it beside each source file
+        self.cache_directory = cache_directory
+        self.cache: Optional[Union[AstCache, ModuleCache]] = None
+        self.optimization_level = optimization_level
+        self.time_passes = time_passes
+        self.stats = stats
+        self.engine = engine
+        self.do_disassembly = do_disassembly
         self.inputter = inputter
         self.outputter = outputter
 
     def run_prompt(self) -> None:
         # TODO: support some amount of history / up key
-        interpreter = Interpreter(self.outputter)
+        interpreter = self._interpreter()
         printer = Printer()
+        symbols = SymbolTable()
+        resolver = Resolver()
         while True:
             try:
                 self.outputter.out('> ', end='')
                 line = self.inputter.input()
-                tokens = Scanner(line).tokens()
-                statements = Parser(tokens).parse()
+                tokens = Scanner(line, symbols).iter_tokens()
+                parser = Parser(tokens)
+                statements = parser.parse()
+                if parser.errors:
+                    # nothing on a line with a syntax error runs, and as with
+                    # any other error the session ends
+                    for error in diagnose([], parser.errors):
+                        self.outputter.out(str(error))
+                    break
+                statements = resolver.run(statements)
                 if self.do_printing:
                     self.outputter.out(printer.print(statements))
+                self._disassemble(statements)
                 interpreter.interpret(statements)
 
             except (ScanError, ParseError, InterpretError) as e:
@@ -40,22 +106,170 @@ class Application:
                 break
             except EOFError:
                 break
+        if self.stats:
+            for line in self._stats(interpreter):
+                self.outputter.out(line)
 
-    def run_file(self, filename: str) -> None:
-        # TODO: running a file with syntax errors should report all errors
+    def run_file(self, filename: str) -> int:
         # TODO add a flag to control whether redefining a variable is an error
         #      enable it for this path, not for the prompt
-        with open(filename) as f:
-            text = f.read()
-            try:
-                tokens = Scanner(text).tokens()
-                statements = Parser(tokens).parse()
-                interpreter = Interpreter(self.outputter)
+        # Statements run as soon as they are parsed and are dropped afterwards.
+        # Everything before the first scan or parse error runs; nothing after
+        # it does, but parsing carries on so that every error is reported.
+        # The python engine instead compiles everything before the first
+        # error into one program once parsing is done, and caches that.
+        text = load_source(filename, self.use_mmap)
+        symbols = SymbolTable()
+        interpreter = self._interpreter()
+        python = interpreter if isinstance(interpreter, PythonInterpreter) else None
+        compiling = python is not None
+        cache = self._cache(filename, compiling)
+        cached = cache.load(text, symbols) if cache is not None else None
+        if isinstance(cached, Program):
+            assert python is not None
+            return self._run_program(python, cached)
+        scan_errors: List[ScanError] = []
+        parse_errors: List[ParseError] = []
+        statements: Iterable[Statement]
+        if cached is not None:
+            statements = cached
+        else:
+            if self.jobs is not None and self.jobs > 1:
+                # Scanned and parsed in worker processes before anything
+                # runs, so here a program with any error produces no output;
+                # the errors reported are those of a serial run.
+                scanner = Scanner(text, symbols, errors=scan_errors)
+                scanned = scanner.parallel_tokens(self.jobs)
+                statements, parse_errors = parse_parallel(
+                    text, scanned, self.jobs, symbols
+                )
+            else:
+                tokens = Scanner(text, symbols, errors=scan_errors).iter_tokens()
+                parser = Parser(tokens)
+                parse_errors = parser.errors
+                statements = parser.parse_iter()
+        # a tree that came from source is kept whole only to be written out
+        parsed: Optional[List[Statement]] = None
+        if isinstance(cache, AstCache) and cached is None:
+            parsed = []
+        batch: List[Statement] = []
+        resolver = Resolver()
+        optimizer = passes(self.optimization_level)
+        printer = Printer()
+        # one iterator, so that a failed run can carry on where it stopped
+        remaining = iter(statements)
+        try:
+            for statement in remaining:
+                if scan_errors or parse_errors:
+                    continue
+                # cached trees were resolved and optimized before they were
+                # stored, so a repeated run does not pay for the passes again
+                if cached is None:
+                    optimized = optimizer.optimize(resolver.resolve(statement))
+                    if optimized is None:
+                        continue
+                    statement = optimized
+                if parsed is not None:
+                    parsed.append(statement)
                 if self.do_printing:
-                    self.outputter.out(printer.print(statements))
-                interpreter.interpret(statements)
-            except (ScanError, ParseError, InterpretError) as e:
-                self.outputter.out(e)
+                    self.outputter.out(printer.print([statement])[0])
+                self._disassemble([statement])
+                if compiling:
+                    batch.append(statement)
+                else:
+                    interpreter.interpret([statement])
+            if python is not None:
+                program = compile_program(batch)
+                # stored before it runs, since how the run ends does not matter
+                if isinstance(cache, ModuleCache) and not (scan_errors or parse_errors):
+                    cache.store(text, program)
+                python.run(program)
+        except InterpretError as e:
+            self.outputter.out(str(e))
+            # whether a tree can be cached depends only on the source, not on
+            # how running it ends: the rest is resolved and optimized unrun
+            if isinstance(cache, AstCache) and parsed is not None:
+                for statement in remaining:
+                    if scan_errors or parse_errors:
+                        continue
+                    optimized = optimizer.optimize(resolver.resolve(statement))
+                    if optimized is not None:
+                        parsed.append(optimized)
+                if not (scan_errors or parse_errors):
+                    cache.store(text, parsed)
+            return 70
+        finally:
+            if self.time_passes:
+                for line in optimizer.report():
+                    self.outputter.out(line)
+            if self.stats:
+                for line in self._stats(interpreter):
+                    self.outputter.out(line)
+                if cache is not None:
+                    for line in cache.report():
+                        self.outputter.out(line)
+        errors = diagnose(scan_errors, parse_errors)
+        for error in errors:
+            self.outputter.out(str(error))
+        if errors:
+            return 65
+        if isinstance(cache, AstCache) and parsed is not None:
+            cache.store(text, parsed)
+        return 0
+
+    def _run_program(self, interpreter: PythonInterpreter, program: Program) -> int:
+        try:
+            interpreter.run(program)
+        except InterpretError as e:
+            self.outputter.out(str(e))
+            return 70
+        return 0
+
+    def _interpreter(self) -> Interpreter:
+        if not self.stats:
+            return ENGINES[self.engine](self.outputter)
+        if self.engine not in STATS_ENGINES:
+            raise ValueError(f'The {self.engine} engine keeps no stats')
+        return STATS_ENGINES[self.engine](self.outputter)
+
+    def _stats(self, interpreter: Interpreter) -> List[str]:
+        # --stats only ever makes the engines in STATS_ENGINES
+        assert isinstance(interpreter, (CountingInterpreter, QuickeningInterpreter))
+        return interpreter.report()
+
+    def _disassemble(self, statements: List[Statement]) -> None:
+        if self.do_disassembly:
+            for line in disassemble(compile_chunk(statements)):
+                self.outputter.out(line)
+
+    def _cache(
+        self, filename: str, compiling: bool = False
+    ) -> Optional[Union[AstCache, ModuleCache]]:
+        # compiled programs are cached in place of trees when there are some
+        if self.cache_directory is None:
+            return None
+        directory = self.cache_directory or os.path.join(
+            os.path.dirname(os.path.abspath(filename)), DIRECTORY
+        )
+        variant = passes(self.optimization_level).variant
+        kind = ModuleCache if compiling else AstCache
+        cache = self.cache
+        if (
+            cache is None
+            or type(cache) is not kind
+            or (cache.directory, cache.variant) != (directory, variant)
+        ):
+            self.cache = kind(directory, variant=variant)
+        return self.cache
+
+    def check(self, filenames: Sequence[str]) -> int:
+        # one JSON object per diagnostic; nothing is executed
+        jobs = self.jobs if self.jobs is not None else os.cpu_count() or 1
+        status = 0
+        for diagnostic in check_files(filenames, jobs, self.use_mmap):
+            self.outputter.out(json.dumps(asdict(diagnostic)))
+            status = 65
+        return status
 
 
 def parse_args() -> argparse.Namespace:
@@ -67,17 +281,96 @@ def parse_args() -> argparse.Namespace:
         help='print polish notation for statements',
         action='store_true',
     )
-    return parser.parse_args()
+    parser.add_argument(
+        '--mmap',
+        help='scan the file as memory-mapped bytes instead of decoded text',
+        action='store_true',
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        help='scan and parse large files, or check files, in this many processes',
+        type=int,
+    )
+    parser.add_argument(
+        '--cache',
+        help=(
+            'reuse parsed programs from DIR, or from a __loxcache__ directory'
+            ' beside the file'
+        ),
+        nargs='?',
+        const='',
+        metavar='DIR',
+        dest='cache_directory',
+    )
+    parser.add_argument(
+        '-O',
+        help='optimization level: 0 runs no passes, 1 folds constants (default),'
+        ' 2 also simplifies and drops dead code',
+        type=int,
+        choices=sorted(LEVELS),
+        default=1,
+        dest='optimization_level',
+    )
+    parser.add_argument(
+        '--time-passes',
+        help='print the time spent in each optimization pass',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--stats',
+        help='print counts of variable reads and other work done by the run, or'
+        ' of specializations with --engine quick, and AST cache hits with --cache;'
+        ' other engines keep no counts',
+        action='store_true',
+    )
+    parser.add_argument(
+        '--engine',
+        help='run programs by walking the tree (default), by walking it with'
+        ' operators that specialize to the types they see, by compiling each'
+        ' statement to closures, by running it as bytecode on a stack machine, or'
+        ' by translating the whole program to Python',
+        choices=sorted(ENGINES),
+        default='tree',
+    )
+    parser.add_argument(
+        '--disassemble',
+        help='print the bytecode each statement compiles to before running it',
+        action='store_true',
+        dest='do_disassembly',
+    )
+    parser.add_argument(
+        '--check',
+        help='report every scan and parse error in these files without running them',
+        nargs='+',
+        metavar='FILE',
+    )
+    args = parser.parse_args()
+    if args.stats and args.engine not in STATS_ENGINES:
+        parser.error(f'--stats cannot be used with --engine {args.engine}')
+    return args
 
 
-def main(args: argparse.Namespace) -> None:
-    application = Application(do_printing=args.print)
+def main(args: argparse.Namespace) -> int:
+    application = Application(
+        do_printing=args.print,
+        use_mmap=args.mmap,
+        jobs=args.jobs,
+        cache_directory=args.cache_directory,
+        optimization_level=args.optimization_level,
+        time_passes=args.time_passes,
+        stats=args.stats,
+        engine=args.engine,
+        do_disassembly=args.do_disassembly,
+    )
 
-    if args.filename:
-        application.run_file(args.filename)
-    else:
-        application.run_prompt()
+    if args.check:
+        return application.check(args.check)
+    elif args.filename:
+        return application.run_file(args.filename)
+    application.run_prompt()
+    return 0
 
 
 if __name__ == '__main__':
-    main(parse_args())
+    sys.exit(main(parse_args()))
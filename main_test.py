@@ -1,9 +1,20 @@
+import contextlib
+import functools
+import io
+import json
+import os
 import tempfile
 import unittest
 
+from typing import List
+from unittest import mock
+
+import main
 from input import TestInputter
 from main import Application as Main
 from output import TestOutputter
+from scanner import Scanner
+from tok import Token
 
 
 class MainTest(unittest.TestCase):
@@ -13,6 +24,13 @@ class MainTest(unittest.TestCase):
         Main(do_printing=False, inputter=inputter, outputter=outputter).run_prompt()
         self.assertEqual(outputter.previous, '5.0')
 
+    def test_prompt_syntax_errors(self) -> None:
+        inputter = TestInputter(['print 1; print (2; print 3 +;', 'print 4;'])
+        outputter = TestOutputter()
+        Main(do_printing=False, inputter=inputter, outputter=outputter).run_prompt()
+        self.assertEqual('1 Expected ")" after "("', outputter.previous)
+        self.assertEqual('1 Expected expression', outputter.message)
+
     def test_file(self) -> None:
         with tempfile.NamedTemporaryFile() as f:
             f.write('print 5;'.encode())
@@ -21,3 +39,303 @@ class MainTest(unittest.TestCase):
             Main(do_printing=False, outputter=outputter).run_file(filename=f.name)
 
             self.assertEqual(outputter.message, '5.0')
+
+    def test_file_mmap(self) -> None:
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('print "café";'.encode())
+            f.seek(0)
+            outputter = TestOutputter()
+            Main(do_printing=False, outputter=outputter, use_mmap=True).run_file(
+                filename=f.name
+            )
+
+            self.assertEqual(outputter.message, 'café')
+
+    def test_empty_file_mmap(self) -> None:
+        with tempfile.NamedTemporaryFile() as f:
+            outputter = TestOutputter()
+            Main(do_printing=False, outputter=outputter, use_mmap=True).run_file(
+                filename=f.name
+            )
+
+            self.assertEqual(outputter.message, None)
+
+    def test_file_reports_every_error(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('print 1;\nprint (2;\nprint 3 ^;\nprint 4;'.encode())
+            f.seek(0)
+            outputter = TestOutputter()
+            status = Main(do_printing=False, outputter=outputter).run_file(
+                filename=f.name
+            )
+
+            self.assertEqual(65, status)
+            self.assertEqual(outputter.previous, '2 Expected ")" after "("')
+            self.assertEqual(outputter.message, '3 Unexpected character "^"')
+
+    def test_check(self):
+        good = tempfile.NamedTemporaryFile()
+        bad = tempfile.NamedTemporaryFile()
+        with good, bad:
+            good.write('print 1;'.encode())
+            good.seek(0)
+            bad.write('print 1\n"a'.encode())
+            bad.seek(0)
+            outputter = TestOutputter()
+            status = Main(do_printing=False, outputter=outputter, jobs=2).check(
+                [good.name, bad.name]
+            )
+
+            self.assertEqual(65, status)
+            self.assertEqual(
+                json.loads(outputter.previous),
+                {
+                    'filename': bad.name,
+                    'stage': 'scan',
+                    'line': 2,
+                    'column': 1,
+                    'message': 'Unterminated string',
+                },
+            )
+            self.assertEqual('parse', json.loads(outputter.message)['stage'])
+
+    def test_file_runs_statements_before_an_error(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('print 1;\nprint (2;\nprint 3;'.encode())
+            f.seek(0)
+            outputter = TestOutputter()
+            status = Main(do_printing=False, outputter=outputter).run_file(
+                filename=f.name
+            )
+
+            self.assertEqual(65, status)
+            self.assertEqual(outputter.previous, '1.0')
+            self.assertEqual(outputter.message, '2 Expected ")" after "("')
+
+    def test_file_jobs(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('print 1;\nprint 2 + 3;'.encode())
+            f.seek(0)
+            outputter = TestOutputter()
+            status = Main(do_printing=False, outputter=outputter, jobs=2).run_file(
+                filename=f.name
+            )
+
+            self.assertEqual(0, status)
+            self.assertEqual(('1.0', '5.0'), (outputter.previous, outputter.message))
+
+    def test_file_jobs_report_every_error(self):
+        text = 'print @;\n' + 'print 1;\n' * 20 + 'print (1;\nprint $;'
+        scan, parse = Scanner.parallel_tokens, main.parse_parallel
+
+        def parallel_tokens(scanner: Scanner, jobs: int) -> List[Token]:
+            return scan(scanner, jobs, minimum_chunk=1)
+
+        with tempfile.NamedTemporaryFile() as f, mock.patch.object(
+            Scanner, 'parallel_tokens', parallel_tokens
+        ), mock.patch('main.parse_parallel', functools.partial(parse, minimum_chunk=1)):
+            f.write(text.encode())
+            f.seek(0)
+            outputs = []
+            for jobs in [None, 4]:
+                outputter = TestOutputter()
+                application = Main(do_printing=False, outputter=outputter, jobs=jobs)
+                status = application.run_file(filename=f.name)
+                outputs.append((status, outputter.previous, outputter.message))
+
+        self.assertEqual(
+            (65, '23 Unexpected character "$"', '23 Expected expression'), outputs[0]
+        )
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_file_folds_constants_keeping_error_lines(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('print 1 + 2;\n\nprint 2 / (1 - 1);'.encode())
+            f.seek(0)
+            for level in [0, 1, 2]:
+                outputter = TestOutputter()
+                status = Main(
+                    do_printing=False,
+                    outputter=outputter,
+                    optimization_level=level,
+                ).run_file(filename=f.name)
+
+                self.assertEqual(70, status)
+                self.assertEqual(outputter.previous, '3.0')
+                self.assertEqual(outputter.message, 'line 3 Division by zero')
+
+    def test_file_time_passes(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('print 1;\n1 + 2;'.encode())
+            f.seek(0)
+            outputter = TestOutputter()
+            status = Main(
+                do_printing=True,
+                outputter=outputter,
+                optimization_level=2,
+                time_passes=True,
+            ).run_file(filename=f.name)
+
+            self.assertEqual(0, status)
+            self.assertTrue(outputter.previous.startswith('types '))
+            self.assertTrue(outputter.message.startswith('cse '))
+            self.assertTrue(outputter.message.endswith(' ms'))
+
+    def test_file_variables(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('var a = 2;\nvar b = a * 3;\nprint a + b;\nprint c;'.encode())
+            f.seek(0)
+            for level in [0, 1, 2]:
+                outputter = TestOutputter()
+                status = Main(
+                    do_printing=False, outputter=outputter, optimization_level=level
+                ).run_file(filename=f.name)
+
+                self.assertEqual(70, status)
+                self.assertEqual('8.0', outputter.previous)
+                self.assertEqual('line 4 Undefined variable "c"', outputter.message)
+
+    def test_file_closure_engine(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('var a = 2;\nprint a * 3;\nprint a + "b";'.encode())
+            f.seek(0)
+            outputter = TestOutputter()
+            status = Main(
+                do_printing=False, outputter=outputter, engine='closure'
+            ).run_file(filename=f.name)
+
+            self.assertEqual(70, status)
+            self.assertEqual('6.0', outputter.previous)
+            self.assertRegex(outputter.message, '^line 3 illegal operands')
+
+    def test_file_quickening_stats(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('var a = 2;\nprint a * a;'.encode())
+            f.seek(0)
+            outputter = TestOutputter()
+            status = Main(
+                do_printing=False, outputter=outputter, engine='quick', stats=True
+            ).run_file(filename=f.name)
+
+            self.assertEqual(0, status)
+            self.assertEqual('specializations             0', outputter.previous)
+            self.assertEqual('deopts                      0', outputter.message)
+
+    def test_file_vm_engine(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('var a = 2;\nprint a * 3;\nprint a +\n "b";'.encode())
+            f.seek(0)
+            outputs = []
+            for engine in ['tree', 'vm']:
+                outputter = TestOutputter()
+                status = Main(
+                    do_printing=False, outputter=outputter, engine=engine
+                ).run_file(filename=f.name)
+                outputs.append((status, outputter.previous, outputter.message))
+
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual('line 3 illegal operands', outputs[1][2][:23])
+
+    def test_file_python_engine(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('var a = 2;\nprint a * 3;\nprint a +\n "b";'.encode())
+            f.seek(0)
+            outputs = []
+            for engine in ['tree', 'python']:
+                outputter = TestOutputter()
+                status = Main(
+                    do_printing=False, outputter=outputter, engine=engine
+                ).run_file(filename=f.name)
+                outputs.append((status, outputter.previous, outputter.message))
+
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual('line 3 illegal operands', outputs[1][2][:23])
+
+    def test_file_python_engine_caches_failing_programs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'script.lox')
+            with open(filename, 'w') as f:
+                f.write('print 1;\nprint -"a";')
+            outputs = []
+            for _ in range(2):
+                outputter = TestOutputter()
+                main = Main(
+                    do_printing=False,
+                    outputter=outputter,
+                    cache_directory=directory,
+                    engine='python',
+                )
+                status = main.run_file(filename)
+                outputs.append((status, outputter.previous, outputter.message))
+            self.assertEqual((1, 0), (main.cache.hits, main.cache.misses))
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(70, outputs[1][0])
+        self.assertEqual('line 2 illegal operand', outputs[1][2][:22])
+
+    def test_file_cache_stats(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'script.lox')
+            with open(filename, 'w') as f:
+                f.write('print 1;')
+            outputs = []
+            for _ in range(2):
+                outputter = TestOutputter()
+                application = Main(
+                    do_printing=False,
+                    outputter=outputter,
+                    cache_directory=directory,
+                    stats=True,
+                )
+                with mock.patch.object(outputter, 'out', wraps=outputter.out) as out:
+                    application.run_file(filename)
+                outputs.append([call.args[0] for call in out.call_args_list[-3:]])
+        self.assertEqual(
+            [
+                'cache hits                  0',
+                'cache misses                1',
+                'cache evictions             0',
+            ],
+            outputs[0],
+        )
+        self.assertEqual('cache hits                  1', outputs[1][0])
+
+    def test_file_disassemble(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('print 1;'.encode())
+            f.seek(0)
+            outputter = TestOutputter()
+            Main(
+                do_printing=False, outputter=outputter, do_disassembly=True
+            ).run_file(filename=f.name)
+
+            self.assertEqual('0002    - PRINT               0', outputter.previous)
+            self.assertEqual('1.0', outputter.message)
+
+    def test_prompt_variables(self):
+        inputter = TestInputter(['var a = 5;', 'var b = a + 1;', 'print a * b;'])
+        outputter = TestOutputter()
+        Main(do_printing=False, inputter=inputter, outputter=outputter).run_prompt()
+        self.assertEqual(outputter.previous, '30.0')
+
+    def test_stats_need_a_counting_engine(self):
+        argv = ['main.py', '-f', 'script.lox', '--stats', '--engine', 'vm']
+        stderr = io.StringIO()
+        with mock.patch('sys.argv', argv), contextlib.redirect_stderr(stderr):
+            with self.assertRaises(SystemExit):
+                main.parse_args()
+        self.assertIn('--stats cannot be used with --engine vm', stderr.getvalue())
+        with self.assertRaisesRegex(ValueError, 'vm engine keeps no stats'):
+            Main(do_printing=False, stats=True, engine='vm').run_prompt()
+
+    def test_file_stats(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('var a = 2;\nprint a * a;'.encode())
+            f.seek(0)
+            outputter = TestOutputter()
+            status = Main(do_printing=False, outputter=outputter, stats=True).run_file(
+                filename=f.name
+            )
+
+            self.assertEqual(0, status)
+            self.assertEqual('variable hits               2', outputter.previous)
+            self.assertEqual('reused values               0', outputter.message)
@@ -0,0 +1,547 @@
+import time
+
+from math import copysign
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import statement
+from expression import (
+    Binary,
+    Common,
+    Expression,
+    Grouping,
+    Literal,
+    Reuse,
+    Unary,
+    Value,
+)
+from expression import Variable as VariableExpression
+from hashcons import NodeFactory
+from interpreter import Interpreter, InterpretError
+from statement import Statement
+from tok import TokenType
+
+NUMBER_OPERATORS = {
+    TokenType.MINUS,
+    TokenType.STAR,
+    TokenType.SLASH,
+}
+COMPARISONS = {
+    TokenType.LESS,
+    TokenType.LESS_EQUAL,
+    TokenType.GREATER,
+    TokenType.GREATER_EQUAL,
+}
+EQUALITIES = {TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL}
+# the nodes with subexpressions
+COMPOUND = (Binary, Unary, Grouping)
+
+# the type an expression's value has whenever evaluating it does not raise,
+# or None when that is not known before running it
+Kind = Optional[type]
+
+
+class Pass:
+    # An AST-to-AST rewrite, one statement at a time. By default a node is
+    # rebuilt only when one of its children changed, so a pass overrides just
+    # the nodes it rewrites. A statement visit may return None to drop it.
+    name = ''
+
+    def __init__(self, nodes: NodeFactory = NodeFactory()):
+        self._nodes = nodes
+
+    def run(self, statements: Iterable[Statement]) -> List[Statement]:
+        return list(self.iter_run(statements))
+
+    def iter_run(self, statements: Iterable[Statement]) -> Iterator[Statement]:
+        for s in statements:
+            s = s.accept(self)
+            if s is not None:
+                yield s
+
+    def visit_unary(self, unary: Unary) -> Expression:
+        operand = unary.expression.accept(self)
+        if operand is unary.expression:
+            return unary
+        return self._nodes.unary(unary.operator, operand)
+
+    def visit_binary(self, binary: Binary) -> Expression:
+        left = binary.left.accept(self)
+        right = binary.right.accept(self)
+        if left is binary.left and right is binary.right:
+            return binary
+        return self._nodes.binary(left, binary.operator, right)
+
+    def visit_grouping(self, grouping: Grouping) -> Expression:
+        expression = grouping.expression.accept(self)
+        if expression is grouping.expression:
+            return grouping
+        return self._nodes.grouping(expression)
+
+    def visit_literal(self, literal: Literal) -> Expression:
+        return literal
+
+    def visit_variable_expression(self, variable: VariableExpression) -> Expression:
+        return variable
+
+    def visit_common(self, common: Common) -> Expression:
+        return common
+
+    def visit_reuse(self, reuse: Reuse) -> Expression:
+        return reuse
+
+    def visit_expression_statement(
+        self, s: statement.Expression
+    ) -> Optional[Statement]:
+        expression = s.expression.accept(self)
+        if expression is s.expression:
+            return s
+        return statement.Expression(expression)
+
+    def visit_print_statement(self, s: statement.Print) -> Statement:
+        expression = s.expression.accept(self)
+        if expression is s.expression:
+            return s
+        return statement.Print(expression)
+
+    def visit_variable_statement(self, s: statement.Variable) -> Statement:
+        if s.initializer is None:
+            return s
+        initializer = s.initializer.accept(self)
+        if initializer is s.initializer:
+            return s
+        return statement.Variable(s.name, initializer, s.slot)
+
+
+class ConstantFolder(Pass):
+    # Replaces every operator whose operands are all literals with the literal
+    # it evaluates to, and drops Grouping nodes, which only record where the
+    # source had parentheses. The interpreter itself works out each folded
+    # value, so folding cannot drift from what running the program would do;
+    # an operation that would raise (1 / 0, -"a") is left in place to raise
+    # at runtime, at its original line.
+    name = 'fold'
+
+    def __init__(self, nodes: NodeFactory = NodeFactory()):
+        super().__init__(nodes)
+        self._interpreter = Interpreter()
+
+    fold = Pass.run
+    iter_fold = Pass.iter_run
+
+    def visit_unary(self, unary: Unary) -> Expression:
+        folded = super().visit_unary(unary)
+        if type(folded) is Unary and type(folded.expression) is Literal:
+            try:
+                return self._nodes.literal(self._interpreter.visit_unary(folded))
+            except InterpretError:
+                pass
+        return folded
+
+    def visit_binary(self, binary: Binary) -> Expression:
+        folded = super().visit_binary(binary)
+        if (
+            type(folded) is Binary
+            and type(folded.left) is Literal
+            and type(folded.right) is Literal
+        ):
+            try:
+                return self._nodes.literal(self._interpreter.visit_binary(folded))
+            except InterpretError:
+                pass
+        return folded
+
+    def visit_grouping(self, grouping: Grouping) -> Expression:
+        return grouping.expression.accept(self)
+
+    def visit_literal(self, literal: Literal) -> Expression:
+        # numbers are coerced to float here once rather than on every run
+        if type(literal.value) is int:
+            return self._nodes.literal(float(literal.value))
+        return literal
+
+
+def _literal_kind(literal: Literal) -> type:
+    return float if type(literal.value) is int else type(literal.value)
+
+
+def _is_literal(expression: Expression, value: Value) -> bool:
+    # exact: True == 1.0 and -0.0 == 0.0, and neither may stand in for the other
+    if type(expression) is not Literal:
+        return False
+    literal = expression.value
+    if type(literal) is float and type(value) is float:
+        return copysign(1.0, literal) == copysign(1.0, value) and literal == value
+    return type(literal) is type(value) and literal == value
+
+
+def _binary_kind(operator: TokenType, left: Kind, right: Kind) -> Kind:
+    if operator in NUMBER_OPERATORS:
+        return float
+    elif operator in COMPARISONS or operator in EQUALITIES:
+        return bool
+    elif operator == TokenType.PLUS:
+        # adding anything to a number gives a number or raises; likewise strings
+        if left is float or right is float:
+            return float
+        elif left is str or right is str:
+            return str
+    return None
+
+
+def describe(expression: Expression) -> Tuple[Kind, bool]:
+    # (kind, pure): pure when evaluating the expression can neither raise nor
+    # do anything else observable, so whether it runs at all makes no difference
+    if type(expression) is Literal:
+        return _literal_kind(expression), True
+    elif (
+        type(expression) is Grouping
+        or type(expression) is Common
+        or type(expression) is Reuse
+    ):
+        return describe(expression.expression)
+    elif type(expression) is Unary:
+        operand, pure = describe(expression.expression)
+        if expression.operator.token_type == TokenType.BANG:
+            return bool, pure
+        return float, pure and operand is float
+    elif type(expression) is Binary:
+        operator = expression.operator.token_type
+        left, left_pure = describe(expression.left)
+        right, right_pure = describe(expression.right)
+        pure = left_pure and right_pure
+        if operator in NUMBER_OPERATORS or operator in COMPARISONS:
+            pure = pure and left is float and right is float
+        elif operator == TokenType.PLUS:
+            pure = pure and left is right and left in (float, str)
+        if operator == TokenType.SLASH:
+            right_value = expression.right
+            pure = pure and type(right_value) is Literal and right_value.value != 0
+        return _binary_kind(operator, left, right), pure
+    # a variable may not be defined
+    return None, False
+
+
+class Simplifier(Pass):
+    # Algebraic identities that hold for every value the operand can have, so
+    # they are applied only where the operand's kind is known: x * 1, x / 1,
+    # x - 0, x + -0 and --x for numbers, x + "" for strings and !!x for
+    # booleans. x + 0 is not among them, since -0 + 0 is 0. Only operators
+    # that cannot raise on such operands are dropped; an operand that raises
+    # still does, with its own token.
+    name = 'simplify'
+
+    def _simplify(self, expression: Expression) -> Tuple[Expression, Kind]:
+        if type(expression) is Unary:
+            return self._unary(expression)
+        elif type(expression) is Binary:
+            return self._binary(expression)
+        elif type(expression) is Grouping:
+            inner, inner_kind = self._simplify(expression.expression)
+            if inner is not expression.expression:
+                return self._nodes.grouping(inner), inner_kind
+            return expression, inner_kind
+        elif type(expression) is Literal:
+            return expression, _literal_kind(expression)
+        return expression, None
+
+    def _unary(self, unary: Unary) -> Tuple[Expression, Kind]:
+        operator = unary.operator.token_type
+        kind = float if operator == TokenType.MINUS else bool
+        operand = unary.expression
+        if type(operand) is Unary and operand.operator.token_type == operator:
+            inner, inner_kind = self._simplify(operand.expression)
+            if inner_kind is kind:
+                return inner, kind
+            if inner is not operand.expression:
+                operand = self._nodes.unary(operand.operator, inner)
+        else:
+            operand = self._simplify(operand)[0]
+        if operand is not unary.expression:
+            unary = self._nodes.unary(unary.operator, operand)
+        return unary, kind
+
+    def _binary(self, binary: Binary) -> Tuple[Expression, Kind]:
+        left, left_kind = self._simplify(binary.left)
+        right, right_kind = self._simplify(binary.right)
+        operator = binary.operator.token_type
+        kind = _binary_kind(operator, left_kind, right_kind)
+        if operator == TokenType.STAR:
+            if left_kind is float and _is_literal(right, 1.0):
+                return left, kind
+            if right_kind is float and _is_literal(left, 1.0):
+                return right, kind
+        elif operator == TokenType.SLASH:
+            if left_kind is float and _is_literal(right, 1.0):
+                return left, kind
+        elif operator == TokenType.MINUS:
+            if left_kind is float and _is_literal(right, 0.0):
+                return left, kind
+        elif operator == TokenType.PLUS:
+            if left_kind is float and _is_literal(right, -0.0):
+                return left, kind
+            if right_kind is float and _is_literal(left, -0.0):
+                return right, kind
+            if left_kind is str and _is_literal(right, ''):
+                return left, kind
+            if right_kind is str and _is_literal(left, ''):
+                return right, kind
+        if left is not binary.left or right is not binary.right:
+            binary = self._nodes.binary(left, binary.operator, right)
+        return binary, kind
+
+    def visit_unary(self, unary: Unary) -> Expression:
+        return self._unary(unary)[0]
+
+    def visit_binary(self, binary: Binary) -> Expression:
+        return self._binary(binary)[0]
+
+    def visit_grouping(self, grouping: Grouping) -> Expression:
+        return self._simplify(grouping)[0]
+
+
+class DeadCodeEliminator(Pass):
+    # Drops expression statements whose value is thrown away and whose
+    # evaluation cannot raise: after folding, these are the leftovers of
+    # arithmetic such as `1 + 2;`. Anything that might raise stays, so a
+    # program fails where and how it did before.
+    name = 'dce'
+
+    def visit_expression_statement(
+        self, s: statement.Expression
+    ) -> Optional[Statement]:
+        if describe(s.expression)[1]:
+            return None
+        return s
+
+    def visit_print_statement(self, s: statement.Print) -> Statement:
+        return s
+
+    def visit_variable_statement(self, s: statement.Variable) -> Statement:
+        return s
+
+
+class TypeAnnotator(Pass):
+    # Marks each operator whose operands are proven to have the type it
+    # needs (numbers for arithmetic and comparisons, two numbers or two
+    # strings for +), so that the interpreter skips checking them. Where a
+    # type is not proven the checks stay, and with them every error message.
+    name = 'types'
+
+    def _annotate(self, expression: Expression) -> Tuple[Expression, Kind]:
+        if type(expression) is Binary:
+            return self._binary(expression)
+        elif type(expression) is Unary:
+            return self._unary(expression)
+        elif type(expression) is Grouping:
+            inner, kind = self._annotate(expression.expression)
+            if inner is not expression.expression:
+                return self._nodes.grouping(inner), kind
+            return expression, kind
+        elif type(expression) is Literal:
+            return expression, _literal_kind(expression)
+        return expression, None
+
+    def _unary(self, unary: Unary) -> Tuple[Expression, Kind]:
+        operand, kind = self._annotate(unary.expression)
+        if unary.operator.token_type == TokenType.BANG:
+            if operand is not unary.expression:
+                unary = self._nodes.unary(unary.operator, operand)
+            return unary, bool
+        proven = float if kind is float else None
+        if operand is not unary.expression or proven is not unary.operands:
+            unary = self._nodes.unary(unary.operator, operand, proven)
+        return unary, float
+
+    def _binary(self, binary: Binary) -> Tuple[Expression, Kind]:
+        left, left_kind = self._annotate(binary.left)
+        right, right_kind = self._annotate(binary.right)
+        operator = binary.operator.token_type
+        proven: Kind = None
+        if left_kind is right_kind:
+            if operator in NUMBER_OPERATORS or operator in COMPARISONS:
+                proven = float if left_kind is float else None
+            elif operator == TokenType.PLUS and left_kind in (float, str):
+                proven = left_kind
+        if (
+            left is not binary.left
+            or right is not binary.right
+            or proven is not binary.operands
+        ):
+            binary = self._nodes.binary(left, binary.operator, right, proven)
+        return binary, _binary_kind(operator, left_kind, right_kind)
+
+    def visit_unary(self, unary: Unary) -> Expression:
+        return self._unary(unary)[0]
+
+    def visit_binary(self, binary: Binary) -> Expression:
+        return self._binary(binary)[0]
+
+    def visit_grouping(self, grouping: Grouping) -> Expression:
+        return self._annotate(grouping)[0]
+
+
+class CommonSubexpressions(Pass):
+    # Evaluates a subexpression that is repeated within one statement only
+    # once: its first occurrence becomes a Common node that keeps its value,
+    # and each later one a Reuse of that value. No expression has a side
+    # effect, and operands are evaluated left to right, so the first
+    # occurrence always runs before any Reuse of it and raises first, with
+    # the same token, if it raises at all. Names and literals are left
+    # alone, as reading one costs no more than reusing it.
+    name = 'cse'
+
+    def _number(
+        self,
+        expression: Expression,
+        numbers: Dict[int, int],
+        keys: Dict[Tuple[object, ...], int],
+    ) -> int:
+        # value numbering: structurally identical subtrees get the same number
+        key: Tuple[object, ...]
+        if type(expression) is Binary:
+            left = self._number(expression.left, numbers, keys)
+            right = self._number(expression.right, numbers, keys)
+            key = (Binary, left, expression.operator.token_type, right)
+        elif type(expression) is Unary:
+            operand = self._number(expression.expression, numbers, keys)
+            key = (Unary, expression.operator.token_type, operand)
+        elif type(expression) is Grouping:
+            key = (Grouping, self._number(expression.expression, numbers, keys))
+        elif type(expression) is Literal:
+            value = expression.value
+            # typed, since true == 1.0, and signed, since 0.0 == -0.0
+            key = (Literal, type(value), value)
+            if type(value) is float:
+                key += (copysign(1.0, value),)
+        elif type(expression) is VariableExpression:
+            key = (VariableExpression, expression.name.lexeme)
+        else:
+            key = (id(expression),)
+        number = numbers[id(expression)] = keys.setdefault(key, len(keys))
+        return number
+
+    def _count(
+        self, expression: Expression, numbers: Dict[int, int], counts: Dict[int, int]
+    ) -> None:
+        # occurrences that will be evaluated: nothing inside a repeat is
+        if type(expression) not in COMPOUND:
+            return
+        number = numbers[id(expression)]
+        counts[number] = counts.get(number, 0) + 1
+        if counts[number] > 1:
+            return
+        if type(expression) is Binary:
+            self._count(expression.left, numbers, counts)
+            self._count(expression.right, numbers, counts)
+        elif type(expression) is Unary or type(expression) is Grouping:
+            self._count(expression.expression, numbers, counts)
+
+    def _rebuild(
+        self,
+        expression: Expression,
+        numbers: Dict[int, int],
+        counts: Dict[int, int],
+        commons: Dict[int, Common],
+    ) -> Expression:
+        if type(expression) not in COMPOUND:
+            return expression
+        number = numbers[id(expression)]
+        common = commons.get(number)
+        if common is not None:
+            return Reuse(common.expression, common.slot)
+        if type(expression) is Binary:
+            left = self._rebuild(expression.left, numbers, counts, commons)
+            right = self._rebuild(expression.right, numbers, counts, commons)
+            if left is not expression.left or right is not expression.right:
+                operator, operands = expression.operator, expression.operands
+                expression = self._nodes.binary(left, operator, right, operands)
+        elif type(expression) is Unary:
+            inner = self._rebuild(expression.expression, numbers, counts, commons)
+            if inner is not expression.expression:
+                operator, operands = expression.operator, expression.operands
+                expression = self._nodes.unary(operator, inner, operands)
+        elif type(expression) is Grouping:
+            inner = self._rebuild(expression.expression, numbers, counts, commons)
+            if inner is not expression.expression:
+                expression = self._nodes.grouping(inner)
+        if counts[number] > 1:
+            common = commons[number] = Common(expression, len(commons))
+            return common
+        return expression
+
+    def eliminate(self, expression: Expression) -> Expression:
+        numbers: Dict[int, int] = {}
+        counts: Dict[int, int] = {}
+        self._number(expression, numbers, {})
+        self._count(expression, numbers, counts)
+        if all(count == 1 for count in counts.values()):
+            return expression
+        return self._rebuild(expression, numbers, counts, {})
+
+    def visit_unary(self, unary: Unary) -> Expression:
+        return self.eliminate(unary)
+
+    def visit_binary(self, binary: Binary) -> Expression:
+        return self.eliminate(binary)
+
+    def visit_grouping(self, grouping: Grouping) -> Expression:
+        return self.eliminate(grouping)
+
+
+# other passes rebuild nodes without their annotations, so types comes last
+# but for cse, which keeps them
+LEVELS: Dict[int, Tuple[type, ...]] = {
+    0: (),
+    1: (ConstantFolder, TypeAnnotator),
+    2: (
+        ConstantFolder,
+        Simplifier,
+        DeadCodeEliminator,
+        TypeAnnotator,
+        CommonSubexpressions,
+    ),
+}
+
+
+class PassManager:
+    # Runs an ordered list of passes over each statement in turn, so it can
+    # sit between Parser.parse_iter() and the interpreter without holding the
+    # whole program, and adds up the time spent in each pass.
+    def __init__(self, passes: Sequence[Pass]):
+        self.passes = list(passes)
+        self.timings: Dict[str, float] = {p.name: 0.0 for p in self.passes}
+
+    @property
+    def variant(self) -> str:
+        # names what was run over a tree, for the AST cache
+        return '-'.join(p.name for p in self.passes)
+
+    def optimize(self, s: Statement) -> Optional[Statement]:
+        for p in self.passes:
+            start = time.perf_counter()
+            s = s.accept(p)
+            self.timings[p.name] += time.perf_counter() - start
+            if s is None:
+                break
+        return s
+
+    def run(self, statements: Iterable[Statement]) -> List[Statement]:
+        return list(self.iter_run(statements))
+
+    def iter_run(self, statements: Iterable[Statement]) -> Iterator[Statement]:
+        for s in statements:
+            optimized = self.optimize(s)
+            if optimized is not None:
+                yield optimized
+
+    def report(self) -> List[str]:
+        return [
+            f'{name:<10} {seconds * 1000:10.3f} ms'
+            for name, seconds in self.timings.items()
+        ]
+
+
+def passes(level: int, nodes: NodeFactory = NodeFactory()) -> PassManager:
+    if level not in LEVELS:
+        raise ValueError(f'Unknown optimization level {level}')
+    return PassManager([p(nodes) for p in LEVELS[level]])
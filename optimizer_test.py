@@ -0,0 +1,333 @@
+import unittest
+
+from typing import List, Optional, Union
+
+from expression import Binary, Common, Expression, Literal, Reuse, Unary
+from expression import Variable as VariableExpression
+from interpreter import Interpreter, InterpretError
+from optimizer import (
+    CommonSubexpressions,
+    ConstantFolder,
+    DeadCodeEliminator,
+    Pass,
+    PassManager,
+    Simplifier,
+    TypeAnnotator,
+    passes,
+)
+from output import TestOutputter
+from printer import Printer
+from resolver import Resolver
+from statement import Print, Statement
+from testing import parse
+
+
+def run(statements: List[Statement]) -> List[Optional[str]]:
+    # everything printed, then the error if there was one
+    printed: List[Optional[str]] = []
+    try:
+        interpreter = Interpreter()
+        for s in statements:
+            interpreter.outputter = TestOutputter()
+            interpreter.interpret([s])
+            if interpreter.outputter.message is not None:
+                printed.append(interpreter.outputter.message)
+    except InterpretError as e:
+        printed.append(f'{e} @ {e.column}')
+    return printed
+
+
+# a single pass, or several run by a PassManager
+Optimizer = Union[Pass, PassManager]
+
+
+class PassTestCase(unittest.TestCase):
+    def optimize(self, text: str, optimizer: Optimizer) -> List[str]:
+        return Printer().print(optimizer.run(parse(text)))
+
+    def assertEquivalent(self, text: str, optimizer: Optimizer) -> None:
+        statements = parse(text)
+        self.assertEqual(run(statements), run(optimizer.run(statements)))
+
+
+class ConstantFolderTest(PassTestCase):
+    def fold(self, text: str) -> List[str]:
+        return self.optimize(text, ConstantFolder())
+
+    def test_folds_literal_subtrees(self):
+        self.assertEqual(['10.0'], self.fold('print 2 * 3 + 4;'))
+        self.assertEqual(['-5.0'], self.fold('print -(5);'))
+        self.assertEqual(['False'], self.fold('print !true;'))
+        self.assertEqual(['ab'], self.fold('print "a" + "b";'))
+        self.assertEqual(['True'], self.fold('print nil == nil != (1 < 2 == false);'))
+
+    def test_removes_groupings(self):
+        self.assertEqual(['(* a 3.0)'], self.fold('print ((a) * ((1 + 2)));'))
+        self.assertEqual(['(- (- a))'], self.fold('print -(-(a));'))
+
+    def test_keeps_operations_that_fail(self):
+        self.assertEqual(['(/ 1.0 0.0)'], self.fold('print 1 / 0;'))
+        self.assertEqual(['(- a)'], self.fold('print -"a";'))
+        self.assertEqual(['(+ 1.0 (* 2.0 a))'], self.fold('print 1 + 2 * "a";'))
+
+    def test_same_errors(self):
+        for text in [
+            'print 1;\n\nprint 2 / (1 - 1);',
+            'print 1 + 2;\nprint 3 +\n (4 * "a");',
+            'print "a" + "b" == "ab";\nprint -"ab";',
+            'print !nil;\nprint 1 < (2 < 3);',
+        ]:
+            with self.subTest(text=text):
+                self.assertEquivalent(text, ConstantFolder())
+
+    def test_same_values(self):
+        self.assertEquivalent(
+            'print 1 == true;\nprint nil != false;\nprint "a" == "a";\n'
+            'print 1 / 3 * 3;\nprint -0;\nprint 10 - 2 - 3 >= 5;\nprint !!"";',
+            ConstantFolder(),
+        )
+
+    def test_folded_node_types(self):
+        [statement] = ConstantFolder().fold(parse('print -(1 + 2) * a;'))
+        self.assertEqual(Literal(-3.0), statement.expression.left)
+        self.assertIsInstance(statement.expression.right, VariableExpression)
+
+    def test_integer_literals_become_floats(self):
+        [statement] = ConstantFolder().fold([Print(Literal(5))])
+        self.assertIs(float, type(statement.expression.value))
+
+
+class SimplifierTest(PassTestCase):
+    def simplify(self, text: str) -> List[str]:
+        # folded first, as at -O2, so that groupings are gone and -0 is a literal
+        return self.optimize(text, PassManager([ConstantFolder(), Simplifier()]))
+
+    def test_numeric_identities(self):
+        self.assertEqual(['(- a 3.0)'], self.simplify('print (a - 3) * 1;'))
+        self.assertEqual(['(- a)'], self.simplify('print 1 * -a;'))
+        self.assertEqual(['(* a 2.0)'], self.simplify('print a * 2 / 1;'))
+        self.assertEqual(['(* a 2.0)'], self.simplify('print a * 2 - 0;'))
+        self.assertEqual(['(- a)'], self.simplify('print -0 + -a;'))
+        self.assertEqual(['(- a)'], self.simplify('print ---a;'))
+
+    def test_string_and_boolean_identities(self):
+        self.assertEqual(['(+ a b)'], self.simplify('print (a + "b") + "";'))
+        self.assertEqual(['(< a 1.0)'], self.simplify('print !!(a < 1);'))
+
+    def test_keeps_identities_for_unknown_kinds(self):
+        for text in [
+            'print a * 1;',
+            'print a + "";',
+            'print --a;',
+            'print !!a;',
+            'print 1 * true;',
+        ]:
+            with self.subTest(text=text):
+                folded = Printer().print(ConstantFolder().fold(parse(text)))
+                self.assertEqual(folded, self.simplify(text))
+
+    def test_keeps_identities_that_change_values(self):
+        # -0 + 0 is 0, and -0 - -0 is 0
+        self.assertEqual(['(+ (- a) 0.0)'], self.simplify('print -a + 0;'))
+        self.assertEqual(['(- (- a) -0.0)'], self.simplify('print -a - -0;'))
+
+    def test_same_results(self):
+        self.assertEquivalent(
+            'print (2 - 3) * 1;\nprint -0 + -(0);\nprint --(1 / 3);\n'
+            'print ("a" + "b") + "";\nprint !!(1 < 2);\nprint (0 - 0) - 0;',
+            Simplifier(),
+        )
+
+    def test_same_errors(self):
+        for text in [
+            'print ("a" - 1) * 1;',
+            'print 1;\nprint --"a";',
+            'print "" + (1 + "a");',
+        ]:
+            with self.subTest(text=text):
+                self.assertEquivalent(text, Simplifier())
+
+
+class DeadCodeEliminatorTest(PassTestCase):
+    def eliminate(self, text: str) -> List[str]:
+        return self.optimize(text, DeadCodeEliminator())
+
+    def test_drops_pure_expression_statements(self):
+        text = '1;\n1 + 2 * 3;\n"a" + "b";\n!nil == 1;\n1 / 2;\nprint 1;'
+        self.assertEqual(['1.0'], self.eliminate(text))
+
+    def test_keeps_statements_that_may_fail(self):
+        for text in ['1 / 0;', '1 / (2 - 1);', '-"a";', '1 + "a";', '1 < nil;', 'a;']:
+            with self.subTest(text=text):
+                self.assertEqual(Printer().print(parse(text)), self.eliminate(text))
+
+    def test_keeps_prints(self):
+        self.assertEqual(['1.0'], self.eliminate('print 1;'))
+
+    def test_same_results(self):
+        for text in [
+            'print 1;\n2 * 3;\nprint 4;',
+            '1 + 2;\n"a" - 1;\nprint 3;',
+            '1 / 0;',
+        ]:
+            with self.subTest(text=text):
+                self.assertEquivalent(text, DeadCodeEliminator())
+
+
+class TypeAnnotatorTest(PassTestCase):
+    def annotate(self, text: str) -> Expression:
+        [statement] = TypeAnnotator().run(parse(text))
+        assert isinstance(statement, Print)
+        return statement.expression
+
+    def test_proves_numbers(self):
+        expression = self.annotate('print -(1 + 2) * 3 < 4;')
+        self.assertIs(float, expression.operands)
+        self.assertIs(float, expression.left.operands)
+        self.assertIs(float, expression.left.left.operands)
+        self.assertIs(float, expression.left.left.expression.expression.operands)
+
+    def test_proves_strings(self):
+        expression = self.annotate('print ("a" + "b") + "c";')
+        self.assertIs(str, expression.operands)
+        self.assertIs(str, expression.left.expression.operands)
+
+    def test_leaves_unproven_operands_checked(self):
+        for text in [
+            'print a * 2;',
+            'print 1 + "a";',
+            'print "a" < "b";',
+            'print -nil;',
+            'print (1 < 2) + 1;',
+            'print 1 == 1;',
+        ]:
+            with self.subTest(text=text):
+                self.assertIsNone(self.annotate(text).operands)
+
+    def test_kind_survives_failing_operands(self):
+        # -"a" raises, so whenever it returns it is a number
+        expression = self.annotate('print -"a" * 2;')
+        self.assertIs(float, expression.operands)
+        self.assertIsNone(expression.left.operands)
+
+    def test_same_results(self):
+        self.assertEquivalent(
+            'print 1 + 2 * 3;\nprint -(4 - 5);\nprint "a" + "b";\n'
+            'print 1 < 2 == 2 >= 3;\nprint 7 / 2;\nprint -0 + -0;',
+            TypeAnnotator(),
+        )
+
+    def test_same_errors(self):
+        for text in [
+            'print 1 / (1 - 1);',
+            'print -"a" * 2;',
+            'print (1 + "a") - 2;',
+            'print "a" < "b";',
+            'print 1;\nprint 2 *\n -nil;',
+        ]:
+            with self.subTest(text=text):
+                self.assertEquivalent(text, TypeAnnotator())
+
+
+class CommonSubexpressionsTest(PassTestCase):
+    def eliminate(self, text: str) -> List[str]:
+        # folded first, as at -O2, so that groupings are gone
+        optimizer = PassManager([ConstantFolder(), CommonSubexpressions()])
+        return self.optimize(text, optimizer)
+
+    def test_reuses_repeats(self):
+        self.assertEqual(
+            ['(- (* ($0 = (+ (* a b) c)) $0) $0)'],
+            self.eliminate('print (a * b + c) * (a * b + c) - (a * b + c);'),
+        )
+
+    def test_numbers_slots_per_statement(self):
+        self.assertEqual(
+            ['(+ ($0 = (- a)) (* ($1 = (* b b)) (+ $1 $0)))', '(+ ($0 = (- c)) $0)'],
+            self.eliminate('print -a + b * b * (b * b + -a);\n-c + -c;'),
+        )
+
+    def test_keeps_distinct_and_trivial_subexpressions(self):
+        for text in [
+            'print a + a;',
+            'print 1 * 1;',
+            'print a * b + b * a;',
+            'print -0 + 0;',
+            'print !true == !1;',
+        ]:
+            with self.subTest(text=text):
+                folded = Printer().print(ConstantFolder().fold(parse(text)))
+                self.assertEqual(folded, self.eliminate(text))
+
+    def test_reused_subtree_is_evaluated_once(self):
+        [statement] = CommonSubexpressions().run(parse('print (a - 1) * (a - 1);'))
+        common, reuse = statement.expression.left, statement.expression.right
+        self.assertIs(Common, type(common))
+        self.assertIs(Reuse, type(reuse))
+        self.assertEqual(common.expression, reuse.expression)
+
+    def test_keeps_proven_types(self):
+        optimizer = [ConstantFolder(), TypeAnnotator(), CommonSubexpressions()]
+        [statement] = PassManager(optimizer).run(parse('print (-a - 2) * (-a - 2);'))
+        self.assertIs(float, statement.expression.operands)
+        self.assertIs(float, statement.expression.left.expression.operands)
+
+    def test_same_results(self):
+        self.assertEquivalent(
+            'print (1 + 2) * (1 + 2) - (1 + 2);\nprint -(3 / 4) < -(3 / 4);\n'
+            'print ("a" + "b") + ("a" + "b");\nprint (1 - 1) * 2 == (1 - 1) * 2;',
+            CommonSubexpressions(),
+        )
+
+    def test_same_errors(self):
+        for text in [
+            'print (1 / 0) + (1 / 0);',
+            'print 1 + (2 * "a") + (2 * "a");',
+            'print (1 - 2) +\n ((1 - 2) + "a");',
+            'print -nil * -nil;',
+        ]:
+            with self.subTest(text=text):
+                self.assertEquivalent(text, CommonSubexpressions())
+
+
+class PassManagerTest(unittest.TestCase):
+    def test_levels(self):
+        self.assertEqual([], passes(0).passes)
+        self.assertEqual('fold-types', passes(1).variant)
+        self.assertEqual('fold-simplify-dce-types-cse', passes(2).variant)
+        with self.assertRaises(ValueError):
+            passes(3)
+
+    def test_runs_passes_in_order(self):
+        # folding leaves a literal for dead-code elimination to drop
+        optimizer = passes(2)
+        statements = optimizer.run(parse('(1 + 2) * 3;\nprint 2 * (3 - 4) * 1;'))
+        self.assertEqual(['-2.0'], Printer().print(statements))
+
+    def test_times_each_pass(self):
+        optimizer = PassManager([ConstantFolder(), DeadCodeEliminator()])
+        optimizer.run(parse('1 + 2;'))
+        self.assertEqual(['fold', 'dce'], list(optimizer.timings))
+        self.assertTrue(all(t > 0 for t in optimizer.timings.values()))
+        self.assertEqual(2, len(optimizer.report()))
+
+    def test_same_results(self):
+        text = (
+            'print 1 + 2;\n3 * 4;\nprint (1 - 1) * 1 + "a" + "";\n'
+            'print -(-(2 / 3)) * 1;\nprint 1 / (1 - 1);'
+        )
+        for level in [0, 1, 2]:
+            with self.subTest(level=level):
+                statements = parse(text)
+                self.assertEqual(run(statements), run(passes(level).run(statements)))
+
+    def test_same_results_with_variables(self):
+        text = (
+            'var a = 2;\nvar b = a * 1 + 0;\nprint (a - b) * (a - b) + -(-a);\n'
+            'a * a;\nvar s = "x" + "";\nprint s + s == s + s;\nprint (b + s) + (b + s);'
+        )
+        for level in [0, 1, 2]:
+            with self.subTest(level=level):
+                statements = Resolver().run(parse(text))
+                optimized = passes(level).run(statements)
+                self.assertEqual(run(statements), run(optimized))
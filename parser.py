@@ -1,31 +1,170 @@
-from typing import List, Optional, Sequence, Union
+import concurrent.futures
+
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 import statement
-from expression import Binary, Expression, Grouping, Literal, Unary
-from expression import Variable as VariableExpression
+from cache import decode, encode
+from error import LoxError
+from expression import Expression
+from hashcons import NodeFactory
+from scanner import Scanner
+from source import Source
 from statement import Statement
+from symbols import SymbolTable
 from tok import Token, TokenType
+from tokenbuffer import TOKEN_TYPES, TokenBuffer
+
+
+# binding powers, lowest to highest, from the precedence table in `language`;
+# unary operators bind tighter than all of them
+EQUALITY, COMPARISON, ADDITIVE, MULTIPLICATIVE = range(1, 5)
+
+BINARY_PRECEDENCE = {
+    TokenType.BANG_EQUAL: EQUALITY,
+    TokenType.EQUAL_EQUAL: EQUALITY,
+    TokenType.GREATER: COMPARISON,
+    TokenType.GREATER_EQUAL: COMPARISON,
+    TokenType.LESS: COMPARISON,
+    TokenType.LESS_EQUAL: COMPARISON,
+    TokenType.MINUS: ADDITIVE,
+    TokenType.PLUS: ADDITIVE,
+    TokenType.SLASH: MULTIPLICATIVE,
+    TokenType.STAR: MULTIPLICATIVE,
+}
+UNARY_OPERATORS = {TokenType.BANG, TokenType.MINUS}
+LITERALS = {TokenType.FALSE: False, TokenType.TRUE: True, TokenType.NIL: None}
+
+# what an explicit-stack entry is waiting on an operand for
+PENDING_UNARY, PENDING_GROUP, PENDING_BINARY = range(3)
+
+OPENING = {TokenType.LEFT_PAREN, TokenType.LEFT_BRACE}
+CLOSING = {TokenType.RIGHT_PAREN, TokenType.RIGHT_BRACE}
+# tokens, not characters
+MINIMUM_CHUNK = 1 << 16
+
+
+class ParseError(LoxError):
+    pass
 
 
-class ParseError(Exception):
-    pass
+def split_statements(
+    source: Source, tokens: Sequence[Token], chunks: int
+) -> List[int]:
+    # Indices of tokens that start a new declaration: the first token after
+    # a ";" outside any brackets, on a later line than it, so every chunk of
+    # source starts at the beginning of a line. The parser resynchronizes
+    # after an error at each such ";" too, so chunks parse exactly as they
+    # would as part of the whole. At most chunks - 1 points, evenly spaced.
+    newline: Any = '\n' if isinstance(source, str) else b'\n'
+    size = len(tokens) // max(chunks, 1)
+    points: List[int] = []
+    depth = 0
+    for index in range(len(tokens) - 1):
+        token_type = tokens[index].token_type
+        if token_type in OPENING:
+            depth += 1
+        elif token_type in CLOSING:
+            depth -= 1
+        elif (
+            token_type == TokenType.SEMICOLON
+            and depth == 0
+            and index + 1 - (points[-1] if points else 0) >= size
+        ):
+            following = tokens[index + 1]
+            if following.token_type == TokenType.EOF:
+                break
+            if source.rfind(newline, tokens[index].offset, following.offset) >= 0:
+                points.append(index + 1)
+                if len(points) == chunks - 1:
+                    break
+    return points
+
+
+def _parseChunk(
+    arguments: Tuple[Source, int]
+) -> Tuple[Tuple[object, ...], List[ParseError]]:
+    # The chunk is scanned again here rather than shipped as tokens, and the
+    # tree goes back in the flat encoding of the AST cache: both pickle far
+    # faster than objects. Scan errors were the parent's to report.
+    text, line = arguments
+    parser = Parser(Scanner(text, line=line, errors=[]).iter_tokens())
+    statements = parser.parse()
+    return encode(statements), parser.errors
+
+
+def parse_parallel(
+    source: Source,
+    tokens: Sequence[Token],
+    jobs: int,
+    symbols: Optional[SymbolTable] = None,
+    minimum_chunk: int = MINIMUM_CHUNK,
+) -> Tuple[List[Statement], List[ParseError]]:
+    # Parses runs of declarations in worker processes, giving the same
+    # statements and errors, in the same order, as parse_with_errors() on
+    # tokens scanned from source.
+    chunks = min(jobs, len(tokens) // max(minimum_chunk, 1))
+    points = split_statements(source, tokens, chunks) if chunks > 1 else []
+    if not points or tokens[0].lines is None:
+        return Parser(tokens).parse_with_errors()
+    lines = tokens[0].lines
+    newline: Any = '\n' if isinstance(source, str) else b'\n'
+    starts = [0] + [source.rfind(newline, 0, tokens[p].offset) + 1 for p in points]
+    first_lines = [lines.first_line] + [tokens[p].line for p in points]
+    ends = starts[1:] + [len(source)]
+    work = [(source[s:e], line) for s, e, line in zip(starts, ends, first_lines)]
+
+    statements: List[Statement] = []
+    errors: List[ParseError] = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        for start, (flat, chunk_errors) in zip(starts, executor.map(_parseChunk, work)):
+            statements.extend(decode(flat, lines, symbols, start))
+            errors.extend(chunk_errors)
+    return statements, errors
 
 
 class Parser:
     def __init__(
         self,
-        tokens: Sequence[Token],
+        tokens: Iterable[Token],
+        explicit_stack: bool = False,
+        nodes: Optional[NodeFactory] = None,
     ):
-        self._tokens = tokens
-        self._current = 0
+        # tokens are pulled from the iterator one at a time, so a lazy
+        # Scanner.iter_tokens() stream is never materialized as a list. A
+        # TokenBuffer is read in place instead, by kind, and Tokens are built
+        # only for what the tree keeps (names, literals and operators) and for
+        # errors.
+        self._buffer = tokens if isinstance(tokens, TokenBuffer) else None
+        self._kinds = self._buffer.kinds if self._buffer is not None else None
+        self._end = len(self._kinds) if self._kinds is not None else 0
+        self._index = 0
+        self._tokens = iter(tokens) if self._buffer is None else iter(())
+        self._next: Optional[Token] = None
+        self._last: Optional[Token] = None
+        self.errors: List[ParseError] = []
+        # a hashcons.HashCons here shares identical subtrees
+        self._nodes = nodes if nodes is not None else NodeFactory()
+        if explicit_stack:
+            # nesting depth is bounded by memory rather than the recursion limit
+            self._expression = self._stackExpression  # type: ignore
 
     def parse(self) -> List[Statement]:
-        statements = []
+        return list(self.parse_iter())
+
+    def parse_iter(self) -> Iterator[Statement]:
+        # each declaration is yielded as soon as its closing token is consumed,
+        # before any token of the next one is read; declarations with syntax
+        # errors are skipped and recorded in errors
         while not self._isAtEnd():
             statement = self._declaration()
             if statement:
-                statements.append(statement)
-        return statements
+                yield statement
+
+    def parse_with_errors(self) -> Tuple[List[Statement], List[ParseError]]:
+        # every syntax error in the input, found in one pass by resuming at
+        # the next statement after each one
+        statements = self.parse()
+        return statements, self.errors
 
     #      _        _                         _
     #  ___| |_ __ _| |_ ___    __ _ _ __   __| |
@@ -41,24 +180,52 @@ class Parser:
     #
 
     def _isAtEnd(self) -> bool:
-        return self._peek().token_type == TokenType.EOF
+        return self._peekType() == TokenType.EOF
 
-    def _advance(self) -> Optional[Token]:
+    def _advance(self) -> None:
         if self._isAtEnd():
-            return None
-        self._current += 1
-        return self._previous()
+            return
+        if self._buffer is not None:
+            self._index += 1
+            return
+        self._last = self._next
+        self._next = None
+
+    def _peekType(self) -> TokenType:
+        if self._index < self._end:
+            return TOKEN_TYPES[self._kinds[self._index]]  # type: ignore[index]
+        return self._peek().token_type
 
     def _peek(self) -> Token:
-        if self._current == 0 and len(self._tokens) == 0:
-            artificialToken = Token(TokenType.NIL, 'nil', None, -1)
-            raise self._error(artificialToken, 'No tokens to parse')
-        return self._tokens[self._current]
+        buffer = self._buffer
+        if self._index < self._end:
+            return buffer[self._index]  # type: ignore[index]
+        elif buffer is not None and self._index:
+            # a buffer that stops without an EOF token ends here anyway
+            return Token(TokenType.EOF, '', None, self._previous().line)
+        if self._next is None:
+            self._next = next(self._tokens, None)
+            if self._next is None:
+                if self._last is None:
+                    artificialToken = Token(TokenType.NIL, 'nil', None, -1)
+                    raise self._error(artificialToken, 'No tokens to parse')
+                # a stream that stops without an EOF token ends here anyway
+                self._next = Token(TokenType.EOF, '', None, self._last.line)
+        return self._next
+
+    def _previousType(self) -> TokenType:
+        buffer = self._buffer
+        if buffer is not None and self._index:
+            return TOKEN_TYPES[buffer.kinds[self._index - 1]]
+        return self._previous().token_type
 
     def _previous(self) -> Token:
-        if self._current == 0:
+        buffer = self._buffer
+        if buffer is not None and self._index:
+            return buffer[self._index - 1]
+        if self._last is None:
             raise ParseError('Cannot fetch previous to first token')
-        return self._tokens[self._current - 1]
+        return self._last
 
     #                             _                     _ _ _
     #   ___ _ __ _ __ ___  _ __  | |__   __ _ _ __   __| | (_)_ __   __ _
@@ -69,8 +236,7 @@ class Parser:
     #  FIGLET: error handling
     #
     def _error(self, token: Token, message: str) -> ParseError:
-        m = f'{token.line} {message}'
-        return ParseError(m)
+        return ParseError(message, token.line, token.column)
 
     #                       _               _          _
     #  _ __   __ _ _ __ ___(_)_ __   __ _  | |__   ___| |_ __   ___ _ __ ___
@@ -82,9 +248,8 @@ class Parser:
     #
 
     def _check(self, token_type: TokenType) -> bool:
-        if self._isAtEnd():
-            return False
-        return self._peek().token_type == token_type
+        next_type = self._peekType()
+        return next_type != TokenType.EOF and next_type == token_type
 
     def _match(self, token_types: Union[TokenType, Sequence[TokenType]]) -> bool:
         if not isinstance(token_types, list):
@@ -95,18 +260,24 @@ class Parser:
                 return True
         return False
 
-    def _consume(self, token_type: TokenType, message: str) -> None:
+    def _consume(self, token_type: TokenType, message: str) -> Token:
         if self._check(token_type):
             self._advance()
-            return
+            return self._previous()
         raise self._error(self._peek(), message)
 
+    def _expect(self, token_type: TokenType, message: str) -> None:
+        # _consume() for a token the tree does not keep
+        if not self._check(token_type):
+            raise self._error(self._peek(), message)
+        self._advance()
+
     def _synchronize(self) -> None:
         self._advance()
         while not self._isAtEnd():
-            if self._previous().token_type == TokenType.SEMICOLON:
+            if self._previousType() == TokenType.SEMICOLON:
                 return
-            if self._peek().token_type in [
+            if self._peekType() in [
                 TokenType.CLASS,
                 TokenType.FOR,
                 TokenType.FUN,
@@ -133,7 +304,8 @@ class Parser:
             if self._match(TokenType.VAR):
                 return self._variableDeclaration()
             return self._statement()
-        except ParseError:
+        except ParseError as error:
+            self.errors.append(error)
             self._synchronize()
             return
 
@@ -147,88 +319,104 @@ class Parser:
         initializer = None
         if self._match(TokenType.EQUAL):
             initializer = self._expression()
-        self._consume(TokenType.SEMICOLON, "Expected ';' after declaration")
-        return VariableStatement(name, initializer)
+        self._expect(TokenType.SEMICOLON, "Expected ';' after declaration")
+        return statement.Variable(name, initializer)
 
     def _printStatement(self) -> Statement:
         expression = self._expression()
-        self._consume(TokenType.SEMICOLON, "Expected ';' after value")
+        self._expect(TokenType.SEMICOLON, "Expected ';' after value")
         return statement.Print(expression=expression)
 
     def _expressionStatement(self) -> Statement:
         expression = self._expression()
-        self._consume(TokenType.SEMICOLON, "Expected ';' after expression")
+        self._expect(TokenType.SEMICOLON, "Expected ';' after expression")
         return statement.Expression(expression=expression)
 
-    def _expression(self) -> Expression:
-        return self._equality()
-
-    def _equality(self) -> Expression:
-        expression = self._comparison()
-
-        while self._match([TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL]):
-            operator = self._previous()
-            right = self._comparison()
-            expression = Binary(left=expression, operator=operator, right=right)
-        return expression
-
-    def _comparison(self) -> Expression:
-        expression = self._additive()
-
-        while self._match(
-            [
-                TokenType.LESS,
-                TokenType.LESS_EQUAL,
-                TokenType.GREATER,
-                TokenType.GREATER_EQUAL,
-            ]
-        ):
-            operator = self._previous()
-            right = self._additive()
-            expression = Binary(left=expression, operator=operator, right=right)
-        return expression
-
-    def _additive(self) -> Expression:
-        expression = self._multiplicative()
-
-        while self._match([TokenType.PLUS, TokenType.MINUS]):
-            operator = self._previous()
-            right = self._multiplicative()
-            expression = Binary(left=expression, operator=operator, right=right)
-        return expression
-
-    def _multiplicative(self) -> Expression:
+    def _expression(self, precedence: int = EQUALITY) -> Expression:
+        # Pratt parsing: keep folding binary operators into the left operand
+        # for as long as they bind at least as tightly as precedence
         expression = self._unary()
-
-        while self._match([TokenType.SLASH, TokenType.STAR]):
-            operator = self._previous()
-            right = self._unary()
-            expression = Binary(left=expression, operator=operator, right=right)
-        return expression
+        while True:
+            binding = BINARY_PRECEDENCE.get(self._peekType())
+            if binding is None or binding < precedence:
+                return expression
+            operator = self._peek()
+            self._advance()
+            # left associative: the right operand only takes tighter operators
+            right = self._expression(binding + 1)
+            expression = self._nodes.binary(expression, operator, right)
+
+    def _stackExpression(self, precedence: int = EQUALITY) -> Expression:
+        # The same grammar as _expression(), with each call that would recurse
+        # (a prefix operator, a "(" or the right operand of a binary operator)
+        # pushed onto pending instead, together with the precedence to resume.
+        # A group keeps no token.
+        pending: List[Tuple[int, Optional[Token], Optional[Expression], int]] = []
+        while True:
+            token_type = self._peekType()
+            if token_type in UNARY_OPERATORS:
+                pending.append((PENDING_UNARY, self._peek(), None, precedence))
+                self._advance()
+                continue
+            elif token_type == TokenType.LEFT_PAREN:
+                self._advance()
+                pending.append((PENDING_GROUP, None, None, precedence))
+                precedence = EQUALITY
+                continue
+            expression = self._primary()
+
+            while True:
+                if pending and pending[-1][0] == PENDING_UNARY:
+                    # a prefix operator takes only its primary, never a binary
+                    operator = pending.pop()[1]
+                    assert operator is not None
+                    expression = self._nodes.unary(operator, expression)
+                    continue
+                binding = BINARY_PRECEDENCE.get(self._peekType())
+                if binding is not None and binding >= precedence:
+                    operator = self._peek()
+                    self._advance()
+                    pending.append((PENDING_BINARY, operator, expression, precedence))
+                    precedence = binding + 1
+                    break
+                if not pending:
+                    return expression
+                kind, operator, left, precedence = pending.pop()
+                if kind == PENDING_GROUP:
+                    self._expect(TokenType.RIGHT_PAREN, 'Expected ")" after "("')
+                    expression = self._nodes.grouping(expression)
+                else:
+                    assert operator is not None and left is not None
+                    expression = self._nodes.binary(left, operator, expression)
 
     def _unary(self) -> Expression:
-        if self._match([TokenType.BANG, TokenType.MINUS]):
-            operator = self._previous()
-            expression = self._unary()
-            return Unary(operator=operator, expression=expression)
+        if self._peekType() in UNARY_OPERATORS:
+            operator = self._peek()
+            self._advance()
+            return self._nodes.unary(operator, self._unary())
         return self._primary()
 
     def _primary(self) -> Expression:
-        if self._match(TokenType.FALSE):
-            return Literal(value=False)
-        elif self._match(TokenType.TRUE):
-            return Literal(value=True)
-        elif self._match(TokenType.NIL):
-            return Literal(value=None)
-        elif self._match(TokenType.NUMBER):
-            return Literal(value=float(self._previous().literal))
-        elif self._match(TokenType.STRING):
-            return Literal(value=self._previous().literal)
-        elif self._match(TokenType.LEFT_PAREN):
+        token_type = self._peekType()
+        if token_type in LITERALS:
+            self._advance()
+            return self._nodes.literal(LITERALS[token_type])
+        elif token_type == TokenType.NUMBER:
+            literal = self._peek().literal
+            self._advance()
+            return self._nodes.literal(float(literal))
+        elif token_type == TokenType.STRING:
+            literal = self._peek().literal
+            self._advance()
+            return self._nodes.literal(literal)
+        elif token_type == TokenType.LEFT_PAREN:
+            self._advance()
             expression = self._expression()
-            self._consume(TokenType.RIGHT_PAREN, 'Expected ")" after "("')
-            return Grouping(expression=expression)
-        elif self._match(TokenType.IDENTIFIER):
-            return VariableExpression(self._previous())
+            self._expect(TokenType.RIGHT_PAREN, 'Expected ")" after "("')
+            return self._nodes.grouping(expression)
+        elif token_type == TokenType.IDENTIFIER:
+            token = self._peek()
+            self._advance()
+            return self._nodes.variable(token)
 
         raise self._error(self._peek(), 'Expected expression')
@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+
+import argparse
+import os
+
+from bench import deep_size, generate_program, measure, report
+from expression import Binary, Expression, Grouping, Literal, Unary
+from expression import Variable as VariableExpression
+from hashcons import HashCons
+from parser import EQUALITY, Parser, parse_parallel
+from printer import Printer
+from scanner import Scanner
+from tok import TokenType
+
+
+class LegacyParser(Parser):
+    # the method-per-precedence-level expression parser that the Pratt
+    # parser replaced, kept as a baseline
+    def _expression(self, precedence: int = EQUALITY) -> Expression:
+        # each level has its own method, so the precedence goes unused
+        return self._equality()
+
+    def _equality(self) -> Expression:
+        expression = self._comparison()
+
+        while self._match([TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL]):
+            operator = self._previous()
+            right = self._comparison()
+            expression = Binary(left=expression, operator=operator, right=right)
+        return expression
+
+    def _comparison(self) -> Expression:
+        expression = self._additive()
+
+        while self._match(
+            [
+                TokenType.LESS,
+                TokenType.LESS_EQUAL,
+                TokenType.GREATER,
+                TokenType.GREATER_EQUAL,
+            ]
+        ):
+            operator = self._previous()
+            right = self._additive()
+            expression = Binary(left=expression, operator=operator, right=right)
+        return expression
+
+    def _additive(self) -> Expression:
+        expression = self._multiplicative()
+
+        while self._match([TokenType.PLUS, TokenType.MINUS]):
+            operator = self._previous()
+            right = self._multiplicative()
+            expression = Binary(left=expression, operator=operator, right=right)
+        return expression
+
+    def _multiplicative(self) -> Expression:
+        expression = self._unary()
+
+        while self._match([TokenType.SLASH, TokenType.STAR]):
+            operator = self._previous()
+            right = self._unary()
+            expression = Binary(left=expression, operator=operator, right=right)
+        return expression
+
+    def _unary(self) -> Expression:
+        if self._match([TokenType.BANG, TokenType.MINUS]):
+            operator = self._previous()
+            expression = self._unary()
+            return Unary(operator=operator, expression=expression)
+        return self._primary()
+
+    def _primary(self) -> Expression:
+        if self._match(TokenType.FALSE):
+            return Literal(value=False)
+        elif self._match(TokenType.TRUE):
+            return Literal(value=True)
+        elif self._match(TokenType.NIL):
+            return Literal(value=None)
+        elif self._match(TokenType.NUMBER):
+            return Literal(value=float(self._previous().lexeme))
+        elif self._match(TokenType.STRING):
+            return Literal(value=self._previous().lexeme[1:-1])
+        elif self._match(TokenType.LEFT_PAREN):
+            expression = self._expression()
+            self._consume(TokenType.RIGHT_PAREN, 'Expected ")" after "("')
+            return Grouping(expression=expression)
+        elif self._match(TokenType.IDENTIFIER):
+            return VariableExpression(self._previous())
+
+        raise self._error(self._peek(), 'Expected expression')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--statements', type=int, default=20000)
+    parser.add_argument('-d', '--depth', type=int, default=100000)
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    text = generate_program(args.statements, declarations=False)
+    tokens = Scanner(text).tokens()
+    expected = Printer().print(LegacyParser(tokens).parse())
+    assert expected == Printer().print(Parser(tokens).parse())
+    count = len(tokens)
+    print(f'{count:,} tokens, {len(expected):,} statements')
+    for name, cls in [('legacy', LegacyParser), ('pratt', Parser)]:
+        seconds = measure(lambda: cls(tokens).parse())
+        report(name, seconds, count, 'tokens')
+    seconds = measure(lambda: Parser(tokens, explicit_stack=True).parse())
+    report('explicit stack', seconds, count, 'tokens')
+    seconds = measure(lambda: Parser(tokens, nodes=HashCons()).parse())
+    report('hash-consed', seconds, count, 'tokens')
+    parallel = lambda: parse_parallel(text, tokens, args.jobs, minimum_chunk=1)
+    assert expected == Printer().print(parallel()[0])
+    report(f'parallel ({args.jobs} jobs)', measure(parallel, 3), count, 'tokens')
+
+    shared = [text, tokens[0].lines]
+    nodes = HashCons()
+    plain = deep_size(Parser(tokens).parse(), shared)
+    consed = deep_size(Parser(tokens, nodes=nodes).parse(), shared)
+    print(f'{"tree":<24} {plain:14,} bytes')
+    print(f'{"hash-consed tree":<24} {consed:14,} bytes', end='')
+    print(f'  ({len(nodes):,} distinct of {nodes.requests:,} nodes)')
+
+    # time per token should stay flat as nesting deepens
+    for depth in [args.depth // 4, args.depth // 2, args.depth]:
+        tokens = Scanner('1 + (' * depth + '1' + ')' * depth + ';').tokens()
+        seconds = measure(lambda: Parser(tokens, explicit_stack=True).parse(), 3)
+        report(f'nested {depth:,}', seconds, len(tokens), 'tokens')
+
+
+if __name__ == '__main__':
+    main()
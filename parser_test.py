@@ -1,7 +1,13 @@
 import unittest
 
-from expression import Binary, Grouping, Literal, Unary
-from parser import Parser, ParseError
+from typing import Iterator, List
+
+from expression import Binary, Expression, Grouping, Literal, Unary
+from parser import Parser, ParseError, parse_parallel, split_statements
+from printer import Printer
+from scanner import Scanner
+from statement import Statement
+from symbols import SymbolTable
 from tok import Token, TokenType
 
 
@@ -19,6 +25,26 @@ class ParserTest(unittest.TestCase):
         ).parse()
         self.assertEqual([], statements)
 
+    def test_parse_iterator(self):
+        tokens = iter(
+            [
+                Token(TokenType.NUMBER, '5', 5, 1),
+                Token(TokenType.SEMICOLON, ';', None, 1),
+                Token(TokenType.EOF, '', None, 1),
+            ]
+        )
+        self.assertEqual(Literal(value=5), Parser(tokens).parse()[0].expression)
+
+    def test_parse_stream_without_eof(self):
+        tokens = (
+            token
+            for token in [
+                Token(TokenType.NUMBER, '5', 5, 1),
+                Token(TokenType.SEMICOLON, ';', None, 1),
+            ]
+        )
+        self.assertEqual(Literal(value=5), Parser(tokens).parse()[0].expression)
+
     #             _
     #  _ __  _ __(_)_ __ ___   __ _ _ __ _   _
     # | '_ \| '__| | '_ ` _ \ / _` | '__| | | |
@@ -330,5 +356,176 @@ class ParserTest(unittest.TestCase):
         pass
 
     def test_variable(self):
-        # TODO test a variable statement
-        pass
+        tokens = Scanner('var a = 1 + b;\nvar c;').iter_tokens()
+        initialized, uninitialized = Parser(tokens).parse()
+        self.assertEqual('a', initialized.name.lexeme)
+        self.assertEqual(['(+ 1.0 b)'], Printer().print([initialized.initializer]))
+        self.assertEqual('c', uninitialized.name.lexeme)
+        self.assertIsNone(uninitialized.initializer)
+
+    def test_variable_errors(self):
+        tokens = Scanner('var 1 = 2;\nvar a = 3\nprint a;').iter_tokens()
+        statements, errors = Parser(tokens).parse_with_errors()
+        self.assertEqual([], statements)
+        self.assertEqual(
+            ['1 Expected a variable name', "3 Expected ';' after declaration"],
+            [str(e) for e in errors],
+        )
+
+    def test_parse_iter_yields_before_reading_on(self):
+        read: List[Token] = []
+
+        def tokens() -> Iterator[Token]:
+            for token in Scanner('print 1;\nprint 2;').iter_tokens():
+                read.append(token)
+                yield token
+
+        statements = Parser(tokens()).parse_iter()
+        next(statements)
+        self.assertEqual(TokenType.SEMICOLON, read[-1].token_type)
+        self.assertEqual(3, len(read))
+        next(statements)
+        self.assertEqual(6, len(read))
+        self.assertIsNone(next(statements, None))
+
+    def test_error_position(self):
+        # _declaration() swallows errors, so parse an expression directly
+        parser = Parser(Scanner('\n  (2;').iter_tokens())
+        with self.assertRaises(ParseError) as context:
+            parser._expression()
+        self.assertEqual('2 Expected ")" after "("', str(context.exception))
+        self.assertEqual(2, context.exception.line)
+        self.assertEqual(5, context.exception.column)
+
+    def test_precedence(self):
+        text = '-1 + 2 * 3 == !4 < 5 - 6 / (7 - 8);'
+        statements = Parser(Scanner(text).iter_tokens()).parse()
+        self.assertEqual(
+            ['(== (+ (- 1.0) (* 2.0 3.0)) (< (! 4.0) (- 5.0 (/ 6.0 (group (- 7.0 8.0))))))'],
+            Printer().print(statements),
+        )
+
+    def test_left_associative(self):
+        text = '1 - 2 - 3 == 4 != 5;'
+        statements = Parser(Scanner(text).iter_tokens()).parse()
+        self.assertEqual(
+            ['(!= (== (- (- 1.0 2.0) 3.0) 4.0) 5.0)'], Printer().print(statements)
+        )
+
+    def test_parse_with_errors(self):
+        text = 'print (1;\nprint 2;\nprint 3 +;\nprint 4;'
+        statements, errors = Parser(Scanner(text).iter_tokens()).parse_with_errors()
+        self.assertEqual(['2.0', '4.0'], Printer().print(statements))
+        self.assertEqual([(1, 9), (3, 10)], [(e.line, e.column) for e in errors])
+
+
+class ExplicitStackParserTest(unittest.TestCase):
+    DEPTH = 100000
+
+    def parse(self, text: str, explicit_stack: bool) -> List[Statement]:
+        return Parser(Scanner(text).iter_tokens(), explicit_stack).parse()
+
+    def depth(self, expression: Expression) -> int:
+        # walked with a loop: the trees here are too deep for recursion
+        depth = 0
+        while True:
+            depth += 1
+            if isinstance(expression, Binary):
+                expression = expression.right
+            elif isinstance(expression, (Grouping, Unary)):
+                expression = expression.expression
+            else:
+                return depth
+
+    def test_same_ast(self):
+        for text in [
+            '-1 + 2 * 3 == !4 < 5 - 6 / (7 - 8);',
+            '1 - 2 - 3 == 4 != 5;',
+            '!!-(-a) * -(b + c) >= "s" == nil;\nprint (((1)));',
+            'print -!true / (false - (nil));',
+        ]:
+            with self.subTest(text=text):
+                self.assertEqual(self.parse(text, False), self.parse(text, True))
+
+    def test_same_errors(self):
+        for text in ['(1 + 2;', '1 + ;', '-(;', '((1) 2);', '1 * (2 + 3));']:
+            with self.subTest(text=text):
+                recursive = Parser(Scanner(text).iter_tokens())
+                stack = Parser(Scanner(text).iter_tokens(), explicit_stack=True)
+                recursive.parse()
+                stack.parse()
+                self.assertEqual(
+                    [(str(e), e.column) for e in recursive.errors],
+                    [(str(e), e.column) for e in stack.errors],
+                )
+
+    def test_deep_groups(self):
+        text = '(' * self.DEPTH + '1' + ')' * self.DEPTH + ';'
+        [statement] = self.parse(text, True)
+        self.assertEqual(self.DEPTH + 1, self.depth(statement.expression))
+
+    def test_deep_unary(self):
+        text = '-!' * (self.DEPTH // 2) + 'a;'
+        [statement] = self.parse(text, True)
+        self.assertEqual(self.DEPTH + 1, self.depth(statement.expression))
+
+    def test_deep_right_operands(self):
+        text = '1 + (' * self.DEPTH + '1' + ')' * self.DEPTH + ';'
+        [statement] = self.parse(text, True)
+        self.assertEqual(2 * self.DEPTH + 1, self.depth(statement.expression))
+
+
+class ParallelParserTest(unittest.TestCase):
+    TEXT = (
+        'print 1; print 2;\n'
+        '// a comment; with a semicolon\n'
+        'print (3 +\n4);\n'
+        '\n'
+        'print (5;\n'
+        '  print "six\n;";\n'
+        'print 7 + ;\n'
+        'print -8;'
+    )
+
+    def test_split_statements(self):
+        tokens = Scanner(self.TEXT).tokens()
+        points = split_statements(self.TEXT, tokens, len(tokens))
+        # nothing after the unclosed "(" on line 6 counts as outside brackets
+        self.assertEqual(['print', 'print'], [tokens[p].lexeme for p in points])
+        self.assertEqual([3, 6], [tokens[p].line for p in points])
+
+    def test_split_statements_inside_brackets(self):
+        text = 'print (1;\n2);\nprint 3;\n'
+        tokens = Scanner(text).tokens()
+        self.assertEqual([7], split_statements(text, tokens, len(tokens)))
+
+    def test_same_as_serial(self):
+        errors_everywhere = 'print 1 +;\nprint 2;\nprint * 3;\nprint 4\n;print 5;'
+        for text in [self.TEXT, errors_everywhere]:
+            for source in [text, text.encode()]:
+                with self.subTest(source=source):
+                    self.assertSameAsSerial(source)
+
+    def assertSameAsSerial(self, source):
+        tokens = Scanner(source).tokens()
+        serial, serial_errors = Parser(tokens).parse_with_errors()
+        statements, errors = parse_parallel(source, tokens, 4, minimum_chunk=1)
+        self.assertEqual(serial, statements)
+        self.assertEqual(
+            [(str(e), e.line, e.column) for e in serial_errors],
+            [(str(e), e.line, e.column) for e in errors],
+        )
+        self.assertTrue(serial_errors)
+
+    def test_operator_positions(self):
+        tokens = Scanner(self.TEXT).tokens()
+        statements, _ = parse_parallel(self.TEXT, tokens, 4, minimum_chunk=1)
+        unary = statements[-1].expression
+        self.assertEqual((10, 7), (unary.operator.line, unary.operator.column))
+
+    def test_symbols(self):
+        text = 'a + b;\nb + a;\n'
+        symbols = SymbolTable()
+        tokens = Scanner(text, symbols).tokens()
+        statements, _ = parse_parallel(text, tokens, 2, symbols, minimum_chunk=1)
+        self.assertEqual(1, statements[1].expression.left.name.symbol)
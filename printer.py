@@ -1,6 +1,16 @@
 from typing import List, Sequence
 
-from expression import Binary, Expression, Grouping, Literal, Unary
+import statement
+from expression import (
+    Binary,
+    Common,
+    Expression,
+    Grouping,
+    Literal,
+    Reuse,
+    Unary,
+    Variable,
+)
 from statement import Print, Statement
 from statement import Expression as ExpressionStatement
 
@@ -34,8 +44,21 @@ class Printer:
     def visit_literal(self, literal: Literal) -> str:
         return str(literal.value)
 
+    def visit_variable_expression(self, variable: Variable) -> str:
+        return variable.name.lexeme
+
+    def visit_common(self, common: Common) -> str:
+        return self._parenthesize(f'${common.slot} =', [common.expression])
+
+    def visit_reuse(self, reuse: Reuse) -> str:
+        return f'${reuse.slot}'
+
     def visit_expression_statement(self, statement: ExpressionStatement) -> str:
         return statement.expression.accept(self)
 
     def visit_print_statement(self, statement: Print) -> str:
         return statement.expression.accept(self)
+
+    def visit_variable_statement(self, s: statement.Variable) -> str:
+        initializer = [] if s.initializer is None else [s.initializer]
+        return self._parenthesize(f'var {s.name.lexeme}', initializer)
@@ -1,8 +1,9 @@
 import unittest
 
-from expression import Binary, Grouping, Literal, Unary
+from expression import Binary, Common, Grouping, Literal, Reuse, Unary, Variable
 from printer import Printer
 from statement import Print
+from statement import Variable as VariableStatement
 from tok import Token, TokenType
 
 
@@ -36,8 +37,33 @@ class PrinterTest(unittest.TestCase):
         printer = Printer()
         self.assertEqual(['(* (- 123) (group 45.67))'], printer.print([expression]))
 
+    def test_print_variable(self):
+        expression = Variable(name=Token(TokenType.IDENTIFIER, 'alpha', 'alpha', 1))
+        printer = Printer()
+        self.assertEqual(['alpha'], printer.print([expression]))
+
+    def test_print_common_subexpression(self):
+        operator = Token(TokenType.MINUS, '-', None, 1)
+        negated = Unary(operator=operator, expression=Literal(value=1))
+        expression = Binary(
+            left=Common(expression=negated, slot=0),
+            operator=Token(TokenType.STAR, '*', None, 1),
+            right=Reuse(expression=negated, slot=0),
+        )
+        printer = Printer()
+        self.assertEqual(['(* ($0 = (- 1)) $0)'], printer.print([expression]))
+
     def test_print_statement(self):
         message = 'hello'
         statement = Print(Literal(value=message))
         printer = Printer()
         self.assertEqual([message], printer.print([statement]))
+
+    def test_print_variable_statement(self):
+        name = Token(TokenType.IDENTIFIER, 'alpha', 'alpha', 1)
+        statements = [
+            VariableStatement(name, Literal(value=1)),
+            VariableStatement(name, None),
+        ]
+        printer = Printer()
+        self.assertEqual(['(var alpha 1)', '(var alpha)'], printer.print(statements))
@@ -0,0 +1,73 @@
+from typing import Dict, Iterable, List
+
+import statement
+from expression import Binary, Common, Grouping, Literal, Reuse, Unary
+from expression import Variable as VariableExpression
+from statement import Statement
+from tok import Token
+
+
+class Resolver:
+    # Gives every variable name a slot in the interpreter's frame, numbered
+    # in order of first appearance, so a read is one list index rather than
+    # a lookup by name. Every statement of a program (or of a prompt
+    # session) must go through the same Resolver before it runs. A name read
+    # before it is declared still gets a slot, and the read fails at runtime
+    # like any other undefined variable.
+    #
+    # Nodes are frozen so that they can be shared, but a slot plays no part
+    # in their equality or hash and a name has the same slot wherever it
+    # appears, so slots are filled in place: rebuilding every tree that
+    # mentions a variable costs several times as much as the walk.
+    def __init__(self):
+        self.slots: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def resolve(self, s: Statement) -> Statement:
+        s.accept(self)
+        return s
+
+    def run(self, statements: Iterable[Statement]) -> List[Statement]:
+        return [self.resolve(s) for s in statements]
+
+    def _slot(self, name: Token) -> int:
+        slot = self.slots.get(name.lexeme)
+        if slot is None:
+            slot = self.slots[name.lexeme] = len(self.slots)
+        return slot
+
+    def visit_unary(self, unary: Unary) -> None:
+        unary.expression.accept(self)
+
+    def visit_binary(self, binary: Binary) -> None:
+        binary.left.accept(self)
+        binary.right.accept(self)
+
+    def visit_grouping(self, grouping: Grouping) -> None:
+        grouping.expression.accept(self)
+
+    def visit_literal(self, literal: Literal) -> None:
+        pass
+
+    def visit_variable_expression(self, variable: VariableExpression) -> None:
+        object.__setattr__(variable, 'slot', self._slot(variable.name))
+
+    def visit_common(self, common: Common) -> None:
+        common.expression.accept(self)
+
+    def visit_reuse(self, reuse: Reuse) -> None:
+        # the same subtree as its Common, resolved there
+        pass
+
+    def visit_expression_statement(self, s: statement.Expression) -> None:
+        s.expression.accept(self)
+
+    def visit_print_statement(self, s: statement.Print) -> None:
+        s.expression.accept(self)
+
+    def visit_variable_statement(self, s: statement.Variable) -> None:
+        if s.initializer is not None:
+            s.initializer.accept(self)
+        s.slot = self._slot(s.name)
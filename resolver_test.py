@@ -0,0 +1,64 @@
+import unittest
+
+from hashcons import HashCons
+from interpreter import Interpreter, InterpretError
+from output import TestOutputter
+from resolver import Resolver
+from statement import Print
+from testing import parse
+
+
+class ResolverTest(unittest.TestCase):
+    def test_slots_in_order_of_appearance(self):
+        resolver = Resolver()
+        first, second = resolver.run(parse('var b = 1;\nvar a = b + c;'))
+        self.assertEqual(0, first.slot)
+        self.assertEqual(0, second.initializer.left.slot)
+        self.assertEqual(1, second.initializer.right.slot)
+        self.assertEqual(2, second.slot)
+        self.assertEqual({'b': 0, 'c': 1, 'a': 2}, resolver.slots)
+        self.assertEqual(3, len(resolver))
+
+    def test_redeclaration_keeps_its_slot(self):
+        first, second = Resolver().run(parse('var a = 1;\nvar a = a;'))
+        self.assertEqual((0, 0), (first.slot, second.slot))
+        self.assertEqual(0, second.initializer.slot)
+
+    def test_slots_carry_across_runs(self):
+        # as at the prompt, one line at a time
+        resolver = Resolver()
+        resolver.run(parse('var a = 1;'))
+        [statement] = resolver.run(parse('print b + a;'))
+        expression = statement.expression
+        self.assertEqual((1, 0), (expression.left.slot, expression.right.slot))
+
+    def test_resolved_tree_is_equal(self):
+        statements = parse('var a = 1;\nprint -a * (a + 2);')
+        self.assertEqual(statements, Resolver().run(statements))
+
+    def test_resolves_in_place(self):
+        resolver = Resolver()
+        for statement in parse('var a = -1;\nprint a;'):
+            self.assertIs(statement, resolver.resolve(statement))
+
+    def test_shared_names(self):
+        nodes = HashCons()
+        [first] = parse('print a;', nodes)
+        # the same name again, as a pass rebuilding the tree would ask for it
+        second = Print(nodes.variable(first.expression.name))
+        Resolver().run([first, second])
+        self.assertIs(first.expression, second.expression)
+        self.assertEqual(0, second.expression.slot)
+
+    def test_runs(self):
+        outputter = TestOutputter()
+        text = 'var a = 2;\nvar b;\nvar a = a * 3;\nprint a == 6;\nprint b;'
+        Interpreter(outputter).interpret(Resolver().run(parse(text)))
+        self.assertEqual(('True', 'None'), (outputter.previous, outputter.message))
+
+    def test_undefined(self):
+        statements = Resolver().run(parse('var a = 1;\nprint a +\n  b;\nvar b = 2;'))
+        with self.assertRaises(InterpretError) as context:
+            Interpreter(TestOutputter()).interpret(statements)
+        self.assertEqual('line 3 Undefined variable "b"', str(context.exception))
+        self.assertEqual(3, context.exception.column)
@@ -1,6 +1,17 @@
+import bisect
+import concurrent.futures
+import itertools
+import re
+
+from array import array
+
+from error import LoxError
+from source import LineMap, Source
+from symbols import SymbolTable
 from tok import Token, TokenType
+from tokenbuffer import TOKEN_TYPES, TokenBuffer
 
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Pattern, Sequence, Tuple, Union
 
 RESERVED_WORDS = {
     'and': TokenType.AND,
@@ -21,163 +32,372 @@ RESERVED_WORDS = {
     'while': TokenType.WHILE,
 }
 
+PUNCTUATION = {
+    '(': TokenType.LEFT_PAREN,
+    ')': TokenType.RIGHT_PAREN,
+    '{': TokenType.LEFT_BRACE,
+    '}': TokenType.RIGHT_BRACE,
+    ',': TokenType.COMMA,
+    '.': TokenType.DOT,
+    '-': TokenType.MINUS,
+    '+': TokenType.PLUS,
+    ';': TokenType.SEMICOLON,
+    '/': TokenType.SLASH,
+    '*': TokenType.STAR,
+    '!': TokenType.BANG,
+    '!=': TokenType.BANG_EQUAL,
+    '=': TokenType.EQUAL,
+    '==': TokenType.EQUAL_EQUAL,
+    '<': TokenType.LESS,
+    '<=': TokenType.LESS_EQUAL,
+    '>': TokenType.GREATER,
+    '>=': TokenType.GREATER_EQUAL,
+}
+
+# One group per lexical class, tried in order at each position. The last
+# alternative matches any single character, so finditer() never skips input
+# and every unexpected character surfaces as an ERROR match. Newlines are
+# plain whitespace: tokens record offsets, and lines come from a LineMap.
+WHITESPACE, COMMENT, IDENTIFIER, NUMBER, OPERATOR, STRING, ERROR = range(1, 8)
+LEXICAL_PATTERN = (
+    r'([ \r\t\n]+)'
+    r'|(//[^\n]*)'
+    r'|([A-Za-z][A-Za-z0-9_]*)'
+    r'|([0-9]+(?:\.[0-9]+)?)'
+    r'|([!=<>]=?|[(){},.\-+;*/])'
+    r'|("[^"]*")'
+)
+# The patterns and tables here are typed Any: the scanner picks the str or
+# the bytes one to match its source, which a type checker cannot follow.
+TOKEN_PATTERN: Pattern[Any] = re.compile(LEXICAL_PATTERN + r'|(.)', re.DOTALL)
+# the same pattern over raw ASCII/UTF-8 bytes, e.g. an mmap of the source
+# file; every delimiter is ASCII, so lines agree with the text. A character
+# outside ASCII is one UTF-8 sequence, and one error, however many bytes.
+BYTES_TOKEN_PATTERN: Pattern[Any] = re.compile(
+    LEXICAL_PATTERN.encode() + rb'|([\xc0-\xff][\x80-\xbf]*|.)', re.DOTALL
+)
+
+OPERATORS: Dict[Any, Tuple[TokenType, str]] = {
+    lexeme: (t, lexeme) for lexeme, t in PUNCTUATION.items()
+}
+BYTES_OPERATORS: Dict[Any, Tuple[TokenType, str]] = {
+    lexeme.encode(): (t, lexeme) for lexeme, t in PUNCTUATION.items()
+}
+BYTES_RESERVED_WORDS = {word.encode(): t for word, t in RESERVED_WORDS.items()}
+QUOTES = ('"', b'"')
+
+# Only string literals can span lines, and only comments can hide a quote, so
+# this is all it takes to tell whether a newline is inside a string. An
+# unterminated string runs to the end of the input, like in the scanner.
+STRUCTURE_PATTERN: Pattern[Any] = re.compile(r'("[^"]*"?)|//[^\n]*')
+BYTES_STRUCTURE_PATTERN: Pattern[Any] = re.compile(STRUCTURE_PATTERN.pattern.encode())
 
-class ScanError(Exception):
+# parallel scanning does not split sources into chunks smaller than this
+MINIMUM_CHUNK = 1 << 20
+
+
+class ScanError(LoxError):
     pass
 
 
+def split_points(text: Source, chunks: int) -> List[int]:
+    # offsets just past a newline that is outside any string literal, dividing
+    # text into at most the given number of roughly equal chunks
+    binary = not isinstance(text, str)
+    pattern = BYTES_STRUCTURE_PATTERN if binary else STRUCTURE_PATTERN
+    newline: Any = b'\n' if binary else '\n'
+    starts = []
+    ends = []
+    for match in pattern.finditer(text):
+        if match.lastindex == 1:
+            starts.append(match.start())
+            ends.append(match.end())
+
+    points: List[int] = []
+    size = len(text)
+    for chunk in range(1, chunks):
+        position = max(size * chunk // chunks, points[-1] if points else 0)
+        while True:
+            position = text.find(newline, position)
+            if position < 0:
+                break
+            index = bisect.bisect_right(starts, position) - 1
+            if index < 0 or ends[index] <= position:
+                break
+            # the newline belongs to a string literal; look past its end
+            position = ends[index]
+        if position < 0 or position + 1 >= size:
+            break
+        if not points or position + 1 > points[-1]:
+            points.append(position + 1)
+    return points
+
+
+def _scanChunk(
+    arguments: Tuple[Source, int, bool]
+) -> Tuple[bytes, List[str], List[object], array, List[ScanError]]:
+    # Tokens go back to the parent as columns: a few flat containers pickle
+    # far faster than hundreds of thousands of Token objects. Offsets are
+    # relative to the chunk; the chunk's first line matters only for errors.
+    text, line, last = arguments
+    errors: List[ScanError] = []
+    tokens = Scanner(text, line=line, errors=errors).tokens()
+    if not last:
+        tokens.pop()
+    return (
+        bytes([token.token_type.value for token in tokens]),
+        [token.lexeme for token in tokens],
+        [token.literal for token in tokens],
+        array('q', [token.offset for token in tokens]),
+        errors,
+    )
+
+
 class Scanner:
-    def __init__(self, text: str):
+    def __init__(
+        self,
+        text: Source,
+        symbols: Optional[SymbolTable] = None,
+        line: int = 1,
+        errors: Optional[List[ScanError]] = None,
+    ):
         self._text = text
-        self._tokens: List[Token] = []
-        self._start = 0
+        self._symbols = symbols
+        # with a list to collect errors in, scanning goes on past them
+        self._errors = errors
+        self._binary = not isinstance(text, str)
         self._current = 0
-        self._line = 1
+        self._lines = LineMap(text, line)
 
     def tokens(self) -> List[Token]:
-        while not self.isAtEnd():
-            self._start = self._current
-            self._scanToken()
-        self._tokens.append(Token(TokenType.EOF, '', None, self._line))
-        return self._tokens
-
-    def _error(self, message: str) -> ScanError:
-        return ScanError(f'{self._line} {message}')
-
-    def _scanToken(self) -> None:
-        def match(expected: str) -> bool:
-            if self.isAtEnd():
-                return False
-            elif self._text[self._current] != expected:
-                return False
-            self._current += 1
-            return True
-
-        def peek() -> str:
-            if self.isAtEnd():
-                return '\0'
-            return self._text[self._current]
-
-        def peekNext() -> str:
-            if self._current + 1 >= len(self._text):
-                return '\0'
-            return self._text[self._current + 1]
-
-        def string() -> None:
-            while peek() != '"' and not self.isAtEnd():
-                if peek() == '\n':
-                    self._line += 1
-                self.advance()
-
-            if self.isAtEnd():
-                raise self._error('Unterminated string')
-
-            # skip past the closing "
-            self.advance()
-            value = self._text[self._start + 1 : self._current - 1]
-            self.addToken(TokenType.STRING, value)
-
-        def isDigit(c: str) -> bool:
-            return '0' <= c <= '9'
-
-        def number() -> None:
-            while isDigit(peek()):
-                self.advance()
-
-            if peek() == '.' and isDigit(peekNext()):
-                self.advance()
-
-            while isDigit(peek()):
-                self.advance()
-
-            value = float(self._text[self._start : self._current])
-            self.addToken(TokenType.NUMBER, value)
-
-        def isAlpha(c: str) -> bool:
-            return 'a' <= c <= 'z' or 'A' <= c <= 'Z'
-
-        def isIdentifierCharacter(c: str) -> bool:
-            return isDigit(c) or isAlpha(c) or c in ['_']
-
-        def identifier() -> None:
-            while isIdentifierCharacter(peek()):
-                self.advance()
-            text = self._text[self._start : self._current]
-            token_type = RESERVED_WORDS.get(text, TokenType.IDENTIFIER)
-            self.addToken(token_type, text)
-
-        c = self.advance()
-        assert c is not None
-        if c == '(':
-            self.addToken(TokenType.LEFT_PAREN)
-        elif c == ')':
-            self.addToken(TokenType.RIGHT_PAREN)
-        elif c == '{':
-            self.addToken(TokenType.LEFT_BRACE)
-        elif c == '}':
-            self.addToken(TokenType.RIGHT_BRACE)
-        elif c == ',':
-            self.addToken(TokenType.COMMA)
-        elif c == '.':
-            self.addToken(TokenType.DOT)
-        elif c == '-':
-            self.addToken(TokenType.MINUS)
-        elif c == '+':
-            self.addToken(TokenType.PLUS)
-        elif c == ';':
-            self.addToken(TokenType.SEMICOLON)
-        elif c == '*':
-            self.addToken(TokenType.STAR)
-        elif c == '!':
-            if match('='):
-                self.addToken(TokenType.BANG_EQUAL)
-            else:
-                self.addToken(TokenType.BANG)
-        elif c == '=':
-            if match('='):
-                self.addToken(TokenType.EQUAL_EQUAL)
-            else:
-                self.addToken(TokenType.EQUAL)
-        elif c == '<':
-            if match('='):
-                self.addToken(TokenType.LESS_EQUAL)
-            else:
-                self.addToken(TokenType.LESS)
-        elif c == '>':
-            if match('='):
-                self.addToken(TokenType.GREATER_EQUAL)
-            else:
-                self.addToken(TokenType.GREATER)
-        elif c == '/':
-            if match('/'):
-                # a comment to end of line
-                while not self.isAtEnd() and peek() != '\n':
-                    self.advance()
+        return list(self.iter_tokens())
+
+    def parallel_tokens(
+        self, jobs: int, minimum_chunk: int = MINIMUM_CHUNK
+    ) -> List[Token]:
+        return list(self.iter_parallel_tokens(jobs, minimum_chunk))
+
+    def iter_parallel_tokens(
+        self, jobs: int, minimum_chunk: int = MINIMUM_CHUNK
+    ) -> Iterator[Token]:
+        # Scans newline-separated chunks in worker processes. Offsets are
+        # shifted back by each chunk's start, so the concatenated result is
+        # the same as iter_tokens(). Tokens of the first chunks are yielded
+        # while later chunks are still being scanned.
+        text = self._text
+        chunks = min(jobs, len(text) // max(minimum_chunk, 1))
+        if chunks <= 1:
+            yield from self.iter_tokens()
+            return
+        bounds = [0] + split_points(text, chunks) + [len(text)]
+        newline: Any = b'\n' if self._binary else '\n'
+        work = []
+        line = self._lines.first_line
+        for index, (start, end) in enumerate(zip(bounds, bounds[1:])):
+            chunk = text[start:end]
+            work.append((chunk, line, index == len(bounds) - 2))
+            line += chunk.count(newline)
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            # every chunk is scanned past its errors; they are reported in
+            # order, each chunk's before its tokens, so without a list to
+            # collect them in the first one stops the scan as it would a
+            # serial one
+            columns = executor.map(_scanChunk, work)
+            for start, (kinds, lexemes, literals, offsets, errors) in zip(
+                bounds, columns
+            ):
+                for error in errors:
+                    self._report(error)
+                tokens = list(
+                    map(
+                        Token,
+                        map(TOKEN_TYPES.__getitem__, kinds),
+                        lexemes,
+                        literals,
+                        itertools.repeat(None),
+                        itertools.repeat(None),
+                        map(start.__add__, offsets),
+                        itertools.repeat(self._lines),
+                    )
+                )
+                if self._symbols is not None:
+                    self._intern(tokens)
+                yield from tokens
+        self._current = len(text)
+
+    def _intern(self, tokens: Sequence[Token]) -> None:
+        # ids are assigned in token order, as a serial scan would have
+        symbols = self._symbols
+        assert symbols is not None
+        for token in tokens:
+            if token.token_type == TokenType.IDENTIFIER:
+                token.symbol = symbols.intern(token.lexeme)
+                token.lexeme = token.literal = symbols.names[token.symbol]
+            elif token.token_type == TokenType.STRING:
+                token.symbol = symbols.intern(token.lexeme[1:-1])
+                token.literal = symbols.names[token.symbol]
+
+    def iter_tokens(self) -> Iterator[Token]:
+        text = self._text
+        binary = self._binary
+        lines = self._lines
+        if binary:
+            pattern = BYTES_TOKEN_PATTERN
+            operators = BYTES_OPERATORS
+        else:
+            pattern = TOKEN_PATTERN
+            operators = OPERATORS
+        symbols = self._symbols
+        # identifiers and numbers are decoded once per distinct lexeme, not
+        # once per occurrence; so are string literals when there is a symbol
+        # table to intern them into
+        numbers: Dict[Union[str, bytes], Tuple[str, float]] = {}
+        strings: Dict[Union[str, bytes], Tuple[str, str, int]] = {}
+        words: Dict[Union[str, bytes], Tuple[TokenType, str, Optional[int]]] = {
+            (word.encode() if binary else word): (t, word, None)
+            for word, t in RESERVED_WORDS.items()
+        }
+        for match in pattern.finditer(text, self._current):
+            kind = match.lastindex
+            if kind == WHITESPACE or kind == COMMENT:
+                continue
+            elif kind == IDENTIFIER:
+                raw = match.group()
+                word = words.get(raw)
+                if word is None:
+                    lexeme = raw.decode('ascii') if binary else raw
+                    symbol = None
+                    if symbols is not None:
+                        symbol = symbols.intern(lexeme)
+                        lexeme = symbols.names[symbol]
+                    word = words[raw] = (TokenType.IDENTIFIER, lexeme, symbol)
+                yield Token(
+                    word[0], word[1], word[1], None, word[2], match.start(), lines
+                )
+            elif kind == NUMBER:
+                raw = match.group()
+                number = numbers.get(raw)
+                if number is None:
+                    lexeme = raw.decode('ascii') if binary else raw
+                    number = numbers[raw] = (lexeme, float(raw))
+                yield Token(
+                    TokenType.NUMBER,
+                    number[0],
+                    number[1],
+                    None,
+                    None,
+                    match.start(),
+                    lines,
+                )
+            elif kind == OPERATOR:
+                token_type, lexeme = operators[match.group()]
+                yield Token(token_type, lexeme, None, None, None, match.start(), lines)
+            elif kind == STRING:
+                raw = match.group()
+                if symbols is None:
+                    lexeme = raw.decode('utf-8') if binary else raw
+                    yield Token(
+                        TokenType.STRING,
+                        lexeme,
+                        lexeme[1:-1],
+                        None,
+                        None,
+                        match.start(),
+                        lines,
+                    )
+                    continue
+                string = strings.get(raw)
+                if string is None:
+                    lexeme = raw.decode('utf-8') if binary else raw
+                    symbol = symbols.intern(lexeme[1:-1])
+                    string = strings[raw] = (lexeme, symbols.names[symbol], symbol)
+                yield Token(
+                    TokenType.STRING,
+                    string[0],
+                    string[1],
+                    None,
+                    string[2],
+                    match.start(),
+                    lines,
+                )
             else:
-                self.addToken(TokenType.SLASH)
-        elif c in [' ', '\r', '\t']:
-            pass
-        elif c == '\n':
-            self._line += 1
-        elif c == '"':
-            string()
-        elif isDigit(c):
-            number()
-        elif isAlpha(c):
-            identifier()
+                self._report(self._errorAt(match.start()))
+                if match.group() in QUOTES:
+                    # an unterminated string swallows the rest of the source
+                    break
+        self._current = len(text)
+        yield Token(TokenType.EOF, '', None, None, None, len(text), lines)
+
+    def buffer(self) -> TokenBuffer:
+        text = self._text
+        buffer = TokenBuffer(text, self._symbols, self._lines)
+        append = buffer.append
+        words: Dict[Any, TokenType]
+        if self._binary:
+            pattern = BYTES_TOKEN_PATTERN
+            operators = BYTES_OPERATORS
+            words = dict(BYTES_RESERVED_WORDS)
         else:
-            raise self._error(f'Unexpected character "{c}"')
+            pattern = TOKEN_PATTERN
+            operators = OPERATORS
+            words = dict(RESERVED_WORDS)
+        for match in pattern.finditer(text, self._current):
+            kind = match.lastindex
+            if kind == WHITESPACE or kind == COMMENT:
+                continue
+            start, end = match.span()
+            if kind == IDENTIFIER:
+                token_type = words.get(match.group(), TokenType.IDENTIFIER)
+                append(token_type, start, end - start)
+            elif kind == NUMBER:
+                append(TokenType.NUMBER, start, end - start)
+            elif kind == OPERATOR:
+                append(operators[match.group()][0], start, end - start)
+            elif kind == STRING:
+                append(TokenType.STRING, start, end - start)
+            else:
+                self._report(self._errorAt(start))
+                if match.group() in QUOTES:
+                    break
+        self._current = len(text)
+        append(TokenType.EOF, len(text), 0)
+        return buffer
+
+    def _report(self, error: ScanError) -> None:
+        if self._errors is None:
+            raise error
+        self._errors.append(error)
+
+    def _errorAt(self, position: int) -> ScanError:
+        self._current = position
+        c = self._character(position)
+        if c == '"':
+            # an unterminated string runs to the end of the input, and is
+            # reported on its last line, at the column of its opening quote
+            line = self._lines.line(len(self._text))
+            column = self._lines.column(position)
+            return ScanError('Unterminated string', line, column)
+        return self._error(position, f'Unexpected character "{c}"')
+
+    def _error(self, position: int, message: str) -> ScanError:
+        line = self._lines.line(position)
+        column = self._lines.column(position)
+        return ScanError(message, line, column)
+
+    def _character(self, position: int) -> str:
+        text = self._text
+        if isinstance(text, str):
+            return text[position]
+        # decode the whole UTF-8 sequence that starts at position
+        return text[position : position + 4].decode('utf-8', errors='replace')[0]
 
     def advance(self) -> Optional[str]:
         if self._current < len(self._text):
-            c = self._text[self._current]
-            self._current += 1
+            c = self._character(self._current)
+            self._current += len(c.encode()) if self._binary else 1
             return c
         return None
 
-    def addToken(self, tokenType: TokenType, literal: object = None) -> None:
-        text = self._text[self._start : self._current]
-        self._tokens.append(Token(tokenType, text, literal, self._line))
-
     def isAtEnd(self) -> bool:
         return self._current >= len(self._text)
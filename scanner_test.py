@@ -1,15 +1,28 @@
 import unittest
 
-from scanner import Scanner, ScanError
+from typing import List, Tuple
+
+from scanner import Scanner, ScanError, split_points
+from symbols import SymbolTable
 from tok import Token, TokenType
 
 
+def describe(token: Token) -> Tuple[TokenType, str, object, int]:
+    return (token.token_type, token.lexeme, token.literal, token.line)
+
+
+def same(expected: Token, actual: Token) -> bool:
+    # tokens made in a test have no source, and so no offset to compare with
+    # a scanned token's; they match one on its line instead
+    return describe(expected) == describe(actual)
+
+
 class ScannerTest(unittest.TestCase):
     def test_scan_empty_file(self):
         scanner = Scanner('')
         expected = [Token(TokenType.EOF, '', None, 1)]
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_isAtEnd_empty(self):
         scanner = Scanner('')
@@ -43,7 +56,7 @@ class ScannerTest(unittest.TestCase):
         scanner = Scanner(text)
         actual = scanner.tokens()
 
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_bang_operators(self):
         text = '!=!'
@@ -53,7 +66,7 @@ class ScannerTest(unittest.TestCase):
         ]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_equal_operators(self):
         text = '==='
@@ -63,7 +76,7 @@ class ScannerTest(unittest.TestCase):
         ]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_lt_operators(self):
         text = '<<='
@@ -73,7 +86,7 @@ class ScannerTest(unittest.TestCase):
         ]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_gt_operators(self):
         text = '>>='
@@ -83,35 +96,35 @@ class ScannerTest(unittest.TestCase):
         ]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_slash(self):
         text = '/'
         expected = [Token(TokenType.SLASH, '/', None, 1)]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_comment(self):
         text = '///'
         expected = [Token(TokenType.EOF, '', None, 1)]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_whitespace(self):
         text = ' \r\t'
         expected = [Token(TokenType.EOF, '', None, 1)]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_newline(self):
         text = '\n'
         expected = [Token(TokenType.EOF, '', None, 2)]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_operators_whitespace_comments(self):
         text = '// this is a comment\n(( )){} //grouping stuff\n!*+-/=<> <= == // operators'
@@ -135,7 +148,7 @@ class ScannerTest(unittest.TestCase):
         ]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_string_literal(self):
         text = '"literal"'
@@ -145,7 +158,7 @@ class ScannerTest(unittest.TestCase):
         ]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_unterminated_string(self):
         with self.assertRaisesRegex(ScanError, 'Unterminated string'):
@@ -160,7 +173,7 @@ class ScannerTest(unittest.TestCase):
         ]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_identifier(self):
         text = 'orchid with_underscore withCaps withNumber0'
@@ -173,7 +186,7 @@ class ScannerTest(unittest.TestCase):
         ]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_reserved_words(self):
         text = 'and class else false for fun if nil or print return super this true var while'
@@ -197,7 +210,7 @@ class ScannerTest(unittest.TestCase):
         ]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_reserved_words_and_identifiers(self):
         text = 'and andalite class classy else else0 false false_or_true'
@@ -213,8 +226,161 @@ class ScannerTest(unittest.TestCase):
         ]
         scanner = Scanner(text)
         actual = scanner.tokens()
-        self.assertTrue(all(map(lambda x, y: x == y, expected, actual)))
+        self.assertTrue(all(map(same, expected, actual)))
 
     def test_scan_unexpected_character(self):
         with self.assertRaisesRegex(ScanError, 'Unexpected character "\^"'):
             scanner = Scanner(text='^').tokens()
+
+    def test_scan_multiline_string_line(self):
+        text = '"one\ntwo"\n+'
+        expected = [
+            Token(TokenType.STRING, '"one\ntwo"', 'one\ntwo', 2),
+            Token(TokenType.PLUS, '+', None, 3),
+            Token(TokenType.EOF, '', None, 3),
+        ]
+        actual = Scanner(text).tokens()
+        self.assertEqual(list(map(describe, expected)), list(map(describe, actual)))
+
+    def test_scan_number_followed_by_dot(self):
+        expected = [
+            Token(TokenType.NUMBER, '5', 5, 1),
+            Token(TokenType.DOT, '.', None, 1),
+            Token(TokenType.EOF, '', None, 1),
+        ]
+        actual = Scanner('5.').tokens()
+        self.assertEqual(list(map(describe, expected)), list(map(describe, actual)))
+
+    def test_scan_leading_underscore(self):
+        with self.assertRaisesRegex(ScanError, 'Unexpected character "_"'):
+            Scanner('_name').tokens()
+
+    def test_scan_error_lines(self):
+        with self.assertRaisesRegex(ScanError, '^3 Unexpected character'):
+            Scanner('a\n\n  ^').tokens()
+        with self.assertRaisesRegex(ScanError, '^4 Unterminated string'):
+            Scanner('a\n"b\nc\n').tokens()
+
+    def test_scan_error_column(self):
+        with self.assertRaises(ScanError) as context:
+            Scanner('a\n\n  ^').tokens()
+        self.assertEqual(3, context.exception.line)
+        self.assertEqual(3, context.exception.column)
+
+    def test_scan_collects_errors(self):
+        errors: List[ScanError] = []
+        tokens = Scanner('print 1 ^ 2;\n  @', errors=errors).tokens()
+        self.assertEqual(['print', '1', '2', ';', ''], [t.lexeme for t in tokens])
+        self.assertEqual([(1, 9), (2, 3)], [(e.line, e.column) for e in errors])
+
+    def test_scan_collects_unterminated_string(self):
+        errors: List[ScanError] = []
+        tokens = Scanner('print ^;\n"abc', errors=errors).tokens()
+        self.assertEqual(TokenType.EOF, tokens[-1].token_type)
+        self.assertEqual(
+            ['Unexpected character "^"', 'Unterminated string'],
+            [e.message for e in errors],
+        )
+
+    def test_token_positions(self):
+        tokens = Scanner('print\n  "a\nb" +\n\n1;').tokens()
+        self.assertEqual([1, 3, 3, 5, 5, 5], [t.line for t in tokens])
+        self.assertEqual([1, 3, 4, 1, 2, 3], [t.column for t in tokens])
+        self.assertEqual([0, 8, 14, 17, 18, 19], [t.offset for t in tokens])
+
+    def test_iter_tokens_matches_tokens(self):
+        text = 'var a = "b";\nprint a + 5.5; // done'
+        self.assertEqual(Scanner(text).tokens(), list(Scanner(text).iter_tokens()))
+
+    def test_iter_tokens_is_lazy(self):
+        tokens = Scanner('print 5; ^').iter_tokens()
+        self.assertEqual((TokenType.PRINT, 'print', 'print', 1), describe(next(tokens)))
+        self.assertEqual((TokenType.NUMBER, '5', 5, 1), describe(next(tokens)))
+        self.assertEqual((TokenType.SEMICOLON, ';', None, 1), describe(next(tokens)))
+        with self.assertRaisesRegex(ScanError, 'Unexpected character'):
+            next(tokens)
+
+    def test_scan_bytes_matches_text(self):
+        text = 'var a = "café\nb";\nprint a == 5.5; // é'
+        # offsets count bytes in one and characters in the other; columns
+        # count characters in both
+        tokens, encoded = Scanner(text).tokens(), Scanner(text.encode()).tokens()
+        self.assertEqual(list(map(describe, tokens)), list(map(describe, encoded)))
+        self.assertEqual([t.column for t in tokens], [t.column for t in encoded])
+
+    def test_scan_bytes_unexpected_character(self):
+        with self.assertRaisesRegex(ScanError, '2 Unexpected character "é"'):
+            Scanner('\né'.encode()).tokens()
+
+    def test_scan_bytes_collects_one_error_per_character(self):
+        text = 'print é;\n  "€" ü;'
+        expected: List[ScanError] = []
+        Scanner(text, errors=expected).tokens()
+        errors: List[ScanError] = []
+        Scanner(text.encode(), errors=errors).tokens()
+        self.assertEqual(
+            ['Unexpected character "é"', 'Unexpected character "ü"'],
+            [e.message for e in errors],
+        )
+        self.assertEqual([(1, 7), (2, 7)], [(e.line, e.column) for e in errors])
+        self.assertEqual([str(e) for e in expected], [str(e) for e in errors])
+
+    def test_scan_interns_identifiers_and_strings(self):
+        symbols = SymbolTable()
+        text = 'alpha "key" beta alpha "key" print'
+        tokens = Scanner(text, symbols).tokens()
+        self.assertEqual([0, 1, 2, 0, 1, None, None], [t.symbol for t in tokens])
+        self.assertIs(tokens[0].lexeme, tokens[3].lexeme)
+        self.assertIs(tokens[1].literal, tokens[4].literal)
+        self.assertEqual(['alpha', 'key', 'beta'], symbols.names)
+
+    def test_scan_shares_symbol_table(self):
+        symbols = SymbolTable()
+        Scanner('alpha', symbols).tokens()
+        self.assertEqual(0, Scanner(b'beta alpha', symbols).tokens()[1].symbol)
+
+
+class ParallelScannerTest(unittest.TestCase):
+    TEXT = (
+        'var a = "one\ntwo";\n'
+        '// a "quote in a comment\n'
+        'print a;\n'
+        'print "//not a comment\n";\n'
+        'print 1 + 2;\n'
+    )
+
+    def test_split_points(self):
+        points = split_points(self.TEXT, len(self.TEXT))
+        self.assertEqual([19, 44, 53, 79], points)
+        for point in points:
+            self.assertEqual('\n', self.TEXT[point - 1])
+
+    def test_split_points_bytes(self):
+        text = self.TEXT.encode()
+        self.assertEqual(split_points(self.TEXT, 3), split_points(text, 3))
+
+    def test_parallel_tokens(self):
+        expected = Scanner(self.TEXT).tokens()
+        for jobs in [1, 2, 4]:
+            actual = Scanner(self.TEXT).parallel_tokens(jobs, minimum_chunk=1)
+            self.assertEqual(expected, actual)
+
+    def test_parallel_tokens_symbols(self):
+        expected = Scanner(self.TEXT, SymbolTable()).tokens()
+        actual = Scanner(self.TEXT, SymbolTable()).parallel_tokens(3, minimum_chunk=1)
+        self.assertEqual(expected, actual)
+        self.assertEqual([t.symbol for t in expected], [t.symbol for t in actual])
+
+    def test_parallel_error_line(self):
+        with self.assertRaisesRegex(ScanError, '^8 Unexpected character'):
+            Scanner(self.TEXT + '^').parallel_tokens(4, minimum_chunk=1)
+
+    def test_parallel_collects_errors(self):
+        text = '^' + self.TEXT + '@'
+        expected: List[ScanError] = []
+        tokens = Scanner(text, errors=expected).tokens()
+        errors: List[ScanError] = []
+        actual = Scanner(text, errors=errors).parallel_tokens(4, minimum_chunk=1)
+        self.assertEqual(tokens, actual)
+        self.assertEqual([(1, 1), (8, 1)], [(e.line, e.column) for e in errors])
+        self.assertEqual([str(e) for e in expected], [str(e) for e in errors])
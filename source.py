@@ -0,0 +1,58 @@
+import bisect
+import mmap
+import os
+import re
+
+from array import array
+from typing import Optional, Union
+
+Source = Union[str, bytes, mmap.mmap]
+
+NEWLINE = re.compile('\n')
+BYTES_NEWLINE = re.compile(b'\n')
+
+
+def load_source(filename: str, use_mmap: bool = False) -> Source:
+    if not use_mmap:
+        with open(filename) as f:
+            return f.read()
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap refuses to map an empty file
+            return b''
+        # the mapping outlives the file object and is unmapped when the last
+        # reference to it (usually a scanner) goes away
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class LineMap:
+    # Offsets of every newline in a source, found the first time a line or
+    # column is asked for. Tokens only record where they start; scanning
+    # never counts lines.
+    def __init__(self, source: Source, first_line: int = 1):
+        self._source = source
+        self.first_line = first_line
+        self._newlines: Optional[array] = None
+
+    def _offsets(self) -> array:
+        if self._newlines is None:
+            source = self._source
+            if isinstance(source, str):
+                offsets = [match.start() for match in NEWLINE.finditer(source)]
+            else:
+                offsets = [match.start() for match in BYTES_NEWLINE.finditer(source)]
+            self._newlines = array('q', offsets)
+        return self._newlines
+
+    def line(self, offset: int) -> int:
+        return self.first_line + bisect.bisect_left(self._offsets(), offset)
+
+    def column(self, offset: int) -> int:
+        newlines = self._offsets()
+        index = bisect.bisect_left(newlines, offset)
+        start = newlines[index - 1] + 1 if index else 0
+        source = self._source
+        if isinstance(source, str):
+            return offset - start + 1
+        # counted in characters, as in the decoded text, not in UTF-8 bytes
+        return len(source[start:offset].decode('utf-8', errors='replace')) + 1
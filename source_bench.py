@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+
+import argparse
+import collections
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench import generate_program
+from scanner import Scanner
+from source import load_source
+
+
+def scan(filename: str, use_mmap: bool) -> None:
+    # runs in a fresh interpreter so that peak RSS belongs to one mode only
+    start = time.perf_counter()
+    source = load_source(filename, use_mmap)
+    tokens = collections.deque(Scanner(source).iter_tokens(), maxlen=1)
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'{seconds} {peak} {tokens[0].line}')
+
+
+def write_program(filename: str, megabytes: int) -> None:
+    chunk = generate_program(5000)
+    with open(filename, 'w') as f:
+        for _ in range(megabytes * 2 ** 20 // len(chunk) + 1):
+            f.write(chunk)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-m', '--megabytes', type=int, default=100)
+    parser.add_argument('--scan', help=argparse.SUPPRESS)
+    parser.add_argument('--mmap', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scan:
+        scan(args.scan, args.mmap)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'bench.lox')
+        write_program(filename, args.megabytes)
+        print(f'{os.path.getsize(filename):,} bytes')
+        for name, flags in [('text', []), ('mmap', ['--mmap'])]:
+            output = subprocess.run(
+                [sys.executable, __file__, '--scan', filename] + flags,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            seconds, peak, lines = output.split()
+            print(
+                f'{name:<8} {float(seconds):8.2f} s'
+                f' {int(peak) / 1024:10.1f} MiB peak RSS  ({int(lines):,} lines)'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional, Union
 from typing_extensions import Protocol
 
 import expression
+from tok import Token
 from visitor import Visitor
 
 
@@ -10,6 +12,10 @@ class Statement(Protocol):
         ...
 
 
+# what an engine runs: statements, or one expression to evaluate
+Node = Union[expression.Expression, Statement]
+
+
 @dataclass
 class Expression:
     expression: expression.Expression
@@ -28,8 +34,10 @@ class Print:
 
 @dataclass
 class Variable:
-    name: str
-    initializer: expression.Expression
+    name: Token
+    initializer: Optional[expression.Expression]
+    # the frame slot the resolver gave name (see resolver.py)
+    slot: Optional[int] = field(default=None, compare=False)
 
     def accept(self, visitor: Visitor):
         return visitor.visit_variable_statement(self)
@@ -0,0 +1,26 @@
+from typing import Dict, List
+
+
+class SymbolTable:
+    # Interns identifier names and string literal values for one program.
+    # Every distinct spelling is stored once and numbered in order of first
+    # appearance, so equal names share one str and one small integer id.
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def intern(self, name: str) -> int:
+        symbol = self._ids.get(name)
+        if symbol is None:
+            symbol = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol
+
+    def name(self, symbol: int) -> str:
+        return self.names[symbol]
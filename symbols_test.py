@@ -0,0 +1,27 @@
+import unittest
+
+from symbols import SymbolTable
+
+
+class SymbolTableTest(unittest.TestCase):
+    def test_ids_in_order_of_first_appearance(self):
+        symbols = SymbolTable()
+        self.assertEqual(0, symbols.intern('alpha'))
+        self.assertEqual(1, symbols.intern('beta'))
+        self.assertEqual(0, symbols.intern('alpha'))
+        self.assertEqual(2, len(symbols))
+
+    def test_name(self):
+        symbols = SymbolTable()
+        symbol = symbols.intern('alpha')
+        self.assertEqual('alpha', symbols.name(symbol))
+        self.assertIn('alpha', symbols)
+        self.assertNotIn('beta', symbols)
+
+    def test_names_are_shared(self):
+        symbols = SymbolTable()
+        first = ''.join(['al', 'pha'])
+        second = ''.join(['alp', 'ha'])
+        self.assertIsNot(first, second)
+        symbols.intern(first)
+        self.assertIs(first, symbols.name(symbols.intern(second)))
@@ -0,0 +1,20 @@
+from typing import List, Optional
+
+from hashcons import NodeFactory
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+from statement import Statement
+
+
+# helpers for the tests of what runs on parsed programs
+
+
+def parse(
+    text: str, nodes: Optional[NodeFactory] = None, explicit_stack: bool = False
+) -> List[Statement]:
+    return Parser(Scanner(text).iter_tokens(), explicit_stack, nodes).parse()
+
+
+def resolved(text: str) -> List[Statement]:
+    return Resolver().run(parse(text))
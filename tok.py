@@ -1,5 +1,9 @@
 import enum
 
+from typing import Optional
+
+from source import LineMap
+
 
 class TokenType(enum.Enum):
     LEFT_PAREN = enum.auto()
@@ -49,11 +53,48 @@ class TokenType(enum.Enum):
 
 
 class Token:
-    def __init__(self, token_type: TokenType, lexeme: str, literal: object, line: int):
+    __slots__ = ('token_type', 'lexeme', 'literal', 'symbol', 'offset', 'lines')
+
+    def __init__(
+        self,
+        token_type: TokenType,
+        lexeme: str,
+        literal: object,
+        line: Optional[int],
+        symbol: Optional[int] = None,
+        offset: int = -1,
+        lines: Optional[LineMap] = None,
+    ):
         self.token_type = token_type
         self.lexeme = lexeme
         self.literal = literal
-        self.line = line
+        # SymbolTable id of an identifier's name or a string literal's value
+        self.symbol = symbol
+        # Scanned tokens leave line as None and find it from their offset in
+        # lines only when asked. A token made without a source has no offset,
+        # and keeps ~line there instead, as the arena does.
+        self.offset = offset if line is None else ~line
+        self.lines = lines if line is None else None
+
+    @property
+    def line(self) -> int:
+        if self.lines is None:
+            return ~self.offset
+        # a string spanning lines is on the line where it ends
+        return self.lines.line(self.offset) + self.lexeme.count('\n')
+
+    @property
+    def column(self) -> Optional[int]:
+        if self.lines is None:
+            return None
+        return self.lines.column(self.offset)
+
+    def __reduce__(self):
+        # pin the position instead of shipping the whole source along
+        return (
+            self.__class__,
+            (self.token_type, self.lexeme, self.literal, self.line, self.symbol),
+        )
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, Token):
@@ -63,8 +104,11 @@ class Token:
             and self.token_type == other.token_type
             and self.lexeme == other.lexeme
             and self.literal == other.literal
-            and self.line == other.line
+            and self.offset == other.offset
         )
 
+    def __hash__(self) -> int:
+        return hash((self.token_type, self.lexeme, self.offset))
+
     def __str__(self) -> str:
         return f'{self.__class__.__name__}(type={self.token_type}, lexeme="{self.lexeme}", literal={self.literal}, line={self.line})'
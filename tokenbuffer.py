@@ -0,0 +1,86 @@
+from array import array
+from typing import Iterator, Optional, Union
+
+from source import LineMap, Source
+from symbols import SymbolTable
+from tok import Token, TokenType
+
+TOKEN_TYPES = {t.value: t for t in TokenType}
+# identifiers and reserved words carry their own name as a literal
+NAMED_TYPES = {TokenType.IDENTIFIER} | {
+    t for t in TokenType if TokenType.AND.value <= t.value <= TokenType.WHILE.value
+}
+
+
+class TokenBuffer:
+    # Struct-of-arrays storage for a scanned source: one small integer per
+    # column per token instead of one Token object per token. Lexemes and
+    # literals are recovered from the source on demand.
+    def __init__(
+        self,
+        source: Source,
+        symbols: Optional[SymbolTable] = None,
+        lines: Optional[LineMap] = None,
+    ):
+        self.source = source
+        self.symbols = symbols
+        self.lines = lines if lines is not None else LineMap(source)
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.lengths = array('I')
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index: int) -> Token:
+        token_type = TOKEN_TYPES[self.kinds[index]]
+        lexeme = self.lexeme(index)
+        literal = self._literal(token_type, lexeme)
+        symbol = None
+        if self.symbols is not None and (
+            token_type == TokenType.IDENTIFIER or token_type == TokenType.STRING
+        ):
+            # interned as the token is materialized
+            name = lexeme[1:-1] if token_type == TokenType.STRING else lexeme
+            symbol = self.symbols.intern(name)
+            literal = self.symbols.names[symbol]
+            if token_type == TokenType.IDENTIFIER:
+                lexeme = literal
+        start = self.starts[index]
+        return Token(token_type, lexeme, literal, None, symbol, start, self.lines)
+
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self.kinds)):
+            yield self[index]
+
+    def append(self, token_type: TokenType, start: int, length: int) -> None:
+        self.kinds.append(token_type.value)
+        self.starts.append(start)
+        self.lengths.append(length)
+
+    def token_type(self, index: int) -> TokenType:
+        return TOKEN_TYPES[self.kinds[index]]
+
+    def view(self, index: int) -> Union[str, memoryview]:
+        # binary sources hand out a zero-copy window onto the source bytes
+        start = self.starts[index]
+        end = start + self.lengths[index]
+        source = self.source
+        if isinstance(source, str):
+            return source[start:end]
+        return memoryview(source)[start:end]
+
+    def lexeme(self, index: int) -> str:
+        view = self.view(index)
+        if isinstance(view, memoryview):
+            return str(view, 'utf-8')
+        return view
+
+    def _literal(self, token_type: TokenType, lexeme: str) -> object:
+        if token_type == TokenType.NUMBER:
+            return float(lexeme)
+        elif token_type == TokenType.STRING:
+            return lexeme[1:-1]
+        elif token_type in NAMED_TYPES:
+            return lexeme
+        return None
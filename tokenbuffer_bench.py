@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+
+import argparse
+
+from bench import deep_size, generate_program, measure, report
+from parser import Parser
+from scanner import Scanner
+from tok import TokenType
+
+
+class DictToken:
+    # Token as it was before it gained __slots__
+    def __init__(self, token_type: TokenType, lexeme: str, literal: object, line: int):
+        self.token_type = token_type
+        self.lexeme = lexeme
+        self.literal = literal
+        self.line = line
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--statements', type=int, default=20000)
+    args = parser.parse_args()
+
+    text = generate_program(args.statements)
+    tokens = Scanner(text).tokens()
+    buffer = Scanner(text).buffer()
+    count = len(tokens)
+    assert count == len(buffer)
+    dict_tokens = [
+        DictToken(t.token_type, t.lexeme, t.literal, t.line) for t in tokens
+    ]
+
+    print(f'{count:,} tokens')
+    for name, form in [
+        ('Token (__dict__)', dict_tokens),
+        ('Token (__slots__)', tokens),
+        ('TokenBuffer', buffer),
+    ]:
+        size = deep_size(form, shared=[text])
+        print(f'{name:<24} {size / count:10.1f} bytes/token')
+
+    seconds = measure(lambda: Scanner(text).tokens())
+    report('scan to Token list', seconds, count, 'tokens')
+    seconds = measure(lambda: Scanner(text).buffer())
+    report('scan to TokenBuffer', seconds, count, 'tokens')
+    seconds = measure(lambda: Parser(Scanner(text).iter_tokens()).parse())
+    report('parse Token stream', seconds, count, 'tokens')
+    seconds = measure(lambda: Parser(Scanner(text).buffer()).parse())
+    report('parse TokenBuffer', seconds, count, 'tokens')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import unittest
+
+from unittest import mock
+
+from expression import Binary, Literal
+from parser import Parser
+from scanner import Scanner, ScanError
+from symbols import SymbolTable
+from tok import Token, TokenType
+from tokenbuffer import TokenBuffer
+
+TEXT = 'var name = "multi\nline";\n// comment\nprint name != 5.5 and true;'
+
+
+class TokenBufferTest(unittest.TestCase):
+    def test_matches_tokens(self):
+        self.assertEqual(Scanner(TEXT).tokens(), list(Scanner(TEXT).buffer()))
+
+    def test_matches_tokens_for_bytes(self):
+        expected = Scanner(TEXT).tokens()
+        self.assertEqual(expected, list(Scanner(TEXT.encode()).buffer()))
+
+    def test_columns(self):
+        buffer = Scanner('print "é";').buffer()
+        self.assertEqual(4, len(buffer))
+        self.assertEqual(TokenType.STRING, buffer.token_type(1))
+        self.assertEqual(6, buffer.starts[1])
+        self.assertEqual(3, buffer.lengths[1])
+        semicolon = Token(TokenType.SEMICOLON, ';', None, None, None, 9)
+        self.assertEqual(semicolon, buffer[2])
+
+    def test_view_is_zero_copy_for_bytes(self):
+        source = b'print alpha;'
+        buffer = Scanner(source).buffer()
+        view = buffer.view(1)
+        self.assertIsInstance(view, memoryview)
+        self.assertEqual(b'alpha', view.tobytes())
+        self.assertIs(source, view.obj)
+
+    def test_errors(self):
+        with self.assertRaisesRegex(ScanError, '2 Unexpected character "\\^"'):
+            Scanner('1;\n^').buffer()
+
+    def test_parse(self):
+        statements = Parser(Scanner('1 + 2;').buffer()).parse()
+        expected = Binary(
+            left=Literal(value=1.0),
+            operator=Token(TokenType.PLUS, '+', None, None, None, 2),
+            right=Literal(value=2.0),
+        )
+        self.assertEqual(expected, statements[0].expression)
+
+    def test_parse_builds_only_kept_tokens(self):
+        buffer = Scanner('var a = -(1 + b);').buffer()
+        built = []
+        original = TokenBuffer.__getitem__
+
+        def getitem(self, index: int) -> Token:
+            built.append(index)
+            return original(self, index)
+
+        with mock.patch.object(TokenBuffer, '__getitem__', getitem):
+            expected = Parser(Scanner('var a = -(1 + b);').tokens()).parse()
+            self.assertEqual(expected, Parser(buffer).parse())
+        # a, -, 1, + and b; never var, =, the brackets, ; or EOF
+        self.assertEqual([1, 3, 5, 6, 7], sorted(set(built)))
+
+    def test_interns_on_access(self):
+        symbols = SymbolTable()
+        buffer = Scanner('alpha "key" alpha', symbols).buffer()
+        self.assertEqual(0, len(symbols))
+        expected = Scanner('alpha "key" alpha', SymbolTable()).tokens()
+        self.assertEqual(expected, list(buffer))
+        self.assertEqual([0, 1, 0, None], [t.symbol for t in buffer])
@@ -0,0 +1,312 @@
+import math
+import sys
+
+from types import CodeType, TracebackType
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+import statement
+from cache import TOKEN_TYPES, SourceCache
+from expression import (
+    Binary,
+    Common,
+    Expression,
+    Grouping,
+    Literal,
+    Reuse,
+    Unary,
+    Value,
+)
+from expression import Variable as VariableExpression
+from interpreter import UNDEFINED, Interpreter, InterpretError
+from source import Source
+from statement import Node, Statement
+from symbols import SymbolTable
+from tok import Token, TokenType
+
+# bump whenever the Python generated for a tree changes
+VERSION = 1
+FILENAME = '<lox>'
+
+# where an operation or name was in the Lox source: its token type's value,
+# lexeme, line and column (0 for none), all a failure needs to report it
+Position = Tuple[int, str, int, int]
+
+# operators whose operands must both be numbers, as Python spells them
+NUMBER_OPERATORS = {
+    TokenType.MINUS: '-',
+    TokenType.STAR: '*',
+    TokenType.SLASH: '/',
+    TokenType.LESS: '<',
+    TokenType.LESS_EQUAL: '<=',
+    TokenType.GREATER: '>',
+    TokenType.GREATER_EQUAL: '>=',
+}
+
+# the types + takes, as long as both operands have the same one; every module
+# defines it too, for its guards
+ADDABLE = (float, str)
+PRELUDE = 'ADDABLE = (float, str)'
+
+
+class Transpiler:
+    # Translates statements into the source of a Python module defining
+    #
+    #   def run(F, U, out, fail): ...
+    #
+    # which runs them with F the frame of variables, U what an undeclared
+    # slot holds, out the outputter's out() and fail() a function raising
+    # the error for the operation on the line it is called from. Each
+    # expression becomes straight-line code, one operation to a line, with
+    # each intermediate value in a local t0, t1, ... (renumbered for every
+    # statement) and the checks the tree walker makes inlined as guards in
+    # front of it. Operations whose operands were proven to have the right
+    # type are left unguarded; Python raises ZeroDivisionError for a proven
+    # division by zero, from the line of the division.
+    #
+    # positions maps the lines that can fail to where they were in the Lox
+    # source. It is kept beside the module rather than in it, since CPython
+    # would take about as long again to compile it as a literal.
+    def __init__(self):
+        self.lines = [PRELUDE, 'def run(F, U, out, fail):']
+        self.positions: Dict[int, Position] = {}
+        # slots in the frame the code uses
+        self.size = 0
+        self._temporaries = 0
+        # slots stored to earlier in the program, which with no control flow
+        # are certain to be defined when read
+        self._defined: Set[int] = set()
+        # the type of each literal by its text, so that guards on it can be
+        # settled here
+        self._kinds: Dict[str, type] = {}
+
+    def transpile(self, nodes: Iterable[Node], value: bool = False) -> str:
+        # with value set, run returns the value of the last node, an expression
+        result = 'None'
+        for node in nodes:
+            self._temporaries = 0
+            result = node.accept(self)
+        self._line(f'return {result}' if value else 'pass')
+        return '\n'.join(self.lines) + '\n'
+
+    def _line(self, text: str, token: Optional[Token] = None) -> None:
+        self.lines.append('    ' + text)
+        if token is not None:
+            self.positions[len(self.lines)] = _position(token)
+
+    def _temporary(self) -> str:
+        name = f't{self._temporaries}'
+        self._temporaries += 1
+        return name
+
+    def _assign(self, text: str, token: Optional[Token] = None) -> str:
+        name = self._temporary()
+        self._line(f'{name} = {text}', token)
+        return name
+
+    def _guard(self, condition: str, token: Token, *operands: str) -> None:
+        if condition:
+            self._line(f'if {condition}: fail({", ".join(operands)})', token)
+
+    def visit_literal(self, literal: Literal) -> str:
+        value = literal.value
+        if type(value) is int:
+            value = float(value)
+        text = repr(value)
+        if type(value) is float and not math.isfinite(value):
+            text = f'float({str(value)!r})'
+        self._kinds[text] = type(value)
+        return text
+
+    def visit_grouping(self, grouping: Grouping) -> str:
+        return grouping.expression.accept(self)
+
+    def visit_unary(self, unary: Unary) -> str:
+        operand = unary.expression.accept(self)
+        operator = unary.operator
+        if operator.token_type == TokenType.BANG:
+            # not to_bool(operand)
+            return self._assign(f'{operand} == None or {operand} == False')
+        elif operator.token_type != TokenType.MINUS:
+            self._guard('True', operator, operand)
+            return 'None'
+        elif unary.operands is None:
+            self._guard(self._not_float(operand), operator, operand)
+        return self._assign(f'-{operand}')
+
+    def visit_binary(self, binary: Binary) -> str:
+        left = binary.left.accept(self)
+        right = binary.right.accept(self)
+        operator = binary.operator
+        token_type = operator.token_type
+        if token_type == TokenType.EQUAL_EQUAL:
+            return self._assign(f'{left} == {right}')
+        elif token_type == TokenType.BANG_EQUAL:
+            return self._assign(f'{left} != {right}')
+        elif token_type == TokenType.PLUS:
+            symbol = '+'
+            guard = self._not_addable(left, right)
+        elif token_type in NUMBER_OPERATORS:
+            symbol = NUMBER_OPERATORS[token_type]
+            guards = (self._not_float(left), self._not_float(right))
+            guard = ' or '.join(filter(None, guards))
+        else:
+            self._guard('True', operator, left, right)
+            return 'None'
+        if binary.operands is not None:
+            # proven: only a division can fail, and Python raises for it
+            if token_type == TokenType.SLASH:
+                return self._assign(f'{left} / {right}', operator)
+            guard = ''
+        elif token_type == TokenType.SLASH and not self._nonzero(right):
+            guard = f'{guard} or {right} == 0' if guard else f'{right} == 0'
+        self._guard(guard, operator, left, right)
+        return self._assign(f'{left} {symbol} {right}')
+
+    def _not_float(self, operand: str) -> str:
+        if self._kinds.get(operand) is float:
+            return ''
+        return f'type({operand}) is not float'
+
+    def _nonzero(self, operand: str) -> bool:
+        return self._kinds.get(operand) is float and operand not in ('0.0', '-0.0')
+
+    def _not_addable(self, left: str, right: str) -> str:
+        kinds = (self._kinds.get(left), self._kinds.get(right))
+        if kinds in ((float, float), (str, str)):
+            return ''
+        elif kinds[0] in ADDABLE:
+            return f'type({right}) is not {kinds[0].__name__}'
+        elif kinds[1] in ADDABLE:
+            return f'type({left}) is not {kinds[1].__name__}'
+        return f'type({left}) is not type({right}) or type({left}) not in ADDABLE'
+
+    def visit_variable_expression(self, variable: VariableExpression) -> str:
+        slot = variable.slot
+        assert slot is not None
+        self.size = max(self.size, slot + 1)
+        name = self._assign(f'F[{slot}]')
+        if slot not in self._defined:
+            self._guard(f'{name} is U', variable.name)
+        return name
+
+    def visit_common(self, common: Common) -> str:
+        value = common.expression.accept(self)
+        self._line(f'c{common.slot} = {value}')
+        return f'c{common.slot}'
+
+    def visit_reuse(self, reuse: Reuse) -> str:
+        return f'c{reuse.slot}'
+
+    def visit_expression_statement(self, s: statement.Expression) -> str:
+        return s.expression.accept(self)
+
+    def visit_print_statement(self, s: statement.Print) -> str:
+        self._line(f'out(str({s.expression.accept(self)}))')
+        return 'None'
+
+    def visit_variable_statement(self, s: statement.Variable) -> str:
+        value = 'None'
+        if s.initializer is not None:
+            value = s.initializer.accept(self)
+        slot = s.slot
+        assert slot is not None
+        self.size = max(self.size, slot + 1)
+        self._line(f'F[{slot}] = {value}')
+        self._defined.add(slot)
+        return 'None'
+
+
+def _position(token: Token) -> Position:
+    return (token.token_type.value, token.lexeme, token.line, token.column or 0)
+
+
+class Program:
+    # A transpiled module, compiled once, with what it needs to run and to
+    # report an error: calling run() in the namespace it defines runs it
+    def __init__(self, code: CodeType, positions: Dict[int, Position], size: int):
+        self.code = code
+        self.positions = positions
+        self.size = size
+        self.namespace: Dict[str, Any] = {}
+        exec(code, self.namespace)
+
+    def position(self, traceback: Optional[TracebackType]) -> Optional[Position]:
+        # the Lox position of the innermost line of the module in a traceback
+        position = None
+        while traceback is not None:
+            if traceback.tb_frame.f_code.co_filename == FILENAME:
+                position = self.positions.get(traceback.tb_lineno, position)
+            traceback = traceback.tb_next
+        return position
+
+
+def compile_program(nodes: Iterable[Node], value: bool = False) -> Program:
+    transpiler = Transpiler()
+    source = transpiler.transpile(nodes, value)
+    code = compile(source, FILENAME, 'exec')
+    return Program(code, transpiler.positions, transpiler.size)
+
+
+class PythonInterpreter(Interpreter):
+    # Runs statements translated to Python (see Transpiler) and compiled by
+    # CPython, so that each operation costs a few bytecodes rather than a
+    # visit. It shares its frame with the tree walker, and every failure
+    # goes to the tree walker's checked operation, with the token it came
+    # from rebuilt from its position, so output and errors are the same.
+    def interpret(self, statements: Iterable[Statement]) -> None:
+        self.run(compile_program(statements))
+
+    def evaluate(self, expression: Expression) -> Value:
+        return self.run(compile_program([expression], value=True))
+
+    def run(self, program: Program) -> Value:
+        frame = self._frame
+        if len(frame) < program.size:
+            frame.extend([UNDEFINED] * (program.size - len(frame)))
+
+        def fail(*operands: Value) -> None:
+            # called only from a guard in the module, on its own line
+            self._fail(program.positions[sys._getframe(1).f_lineno], *operands)
+
+        try:
+            return program.namespace['run'](
+                frame, UNDEFINED, self.outputter.out, fail
+            )
+        except ZeroDivisionError as error:
+            position = program.position(error.__traceback__)
+            if position is None:
+                raise
+        # a proven division by zero, raised by Python from the line at this
+        # position; only the divisor matters to the error
+        self._fail(position, 0.0, 0.0)
+        return None
+
+    def _fail(self, position: Position, *operands: Value) -> None:
+        token_type, lexeme, line, column = position
+        token = Token(TOKEN_TYPES[token_type], lexeme, None, line)
+        try:
+            if not operands:
+                raise self._error(token, f'Undefined variable "{lexeme}"')
+            elif len(operands) == 1:
+                self._unary(token, *operands)
+            else:
+                self._binary(token, *operands)
+        except InterpretError as error:
+            error.column = column or None
+            raise
+
+
+class ModuleCache(SourceCache[Program]):
+    # Compiled programs on disk, kept like parsed trees and beside them
+    suffix = '.lox.pyc'
+
+    def _encode(self, program: Program) -> Any:
+        return (VERSION, program.code, program.positions, program.size)
+
+    def _decode(
+        self, payload: Any, source: Source, symbols: Optional[SymbolTable]
+    ) -> Program:
+        version, code, positions, size = payload
+        if version != VERSION or not isinstance(code, CodeType):
+            raise ValueError('Stale cache entry')
+        return Program(code, positions, size)
@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+
+import argparse
+import random
+import tempfile
+
+from bench import generate_arithmetic, measure, report
+from interpreter import Interpreter
+from optimizer import TypeAnnotator
+from output import TestOutputter
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+from transpiler import (
+    FILENAME,
+    ModuleCache,
+    PythonInterpreter,
+    Transpiler,
+    compile_program,
+)
+from variables_bench import generate_script
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--statements', type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    arithmetic = ''.join(
+        f'print {generate_arithmetic(rng, 5)};\n' for _ in range(args.statements)
+    )
+    # left unfolded, as if the operands were not constants, so that every
+    # operation runs
+    checked = Parser(Scanner(arithmetic).iter_tokens()).parse()
+    variables = generate_script(args.statements)
+    scripts = [
+        ('checked', arithmetic, checked),
+        ('proven types', arithmetic, TypeAnnotator().run(checked)),
+        (
+            'variables',
+            variables,
+            Resolver().run(Parser(Scanner(variables).iter_tokens()).parse()),
+        ),
+    ]
+    print(f'{len(checked):,} statements per script')
+
+    for name, text, statements in scripts:
+        count = len(statements)
+        tree = Interpreter(TestOutputter())
+        seconds = measure(lambda: tree.interpret(statements))
+        report(f'{name}, tree', seconds, count, 'statements')
+        source = Transpiler().transpile(statements)
+        seconds = measure(lambda: Transpiler().transpile(statements), repeat=3)
+        report(f'{name}, transpile', seconds, count, 'statements')
+        seconds = measure(lambda: compile(source, FILENAME, 'exec'), repeat=3)
+        report(f'{name}, compile', seconds, count, 'statements')
+        # what a repeated run pays instead of the two above
+        program = compile_program(statements)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ModuleCache(directory)
+            cache.store(text, program)
+            seconds = measure(lambda: cache.load(text))
+        report(f'{name}, cached', seconds, count, 'statements')
+        python = PythonInterpreter(TestOutputter())
+        seconds = measure(lambda: python.run(program))
+        report(f'{name}, run', seconds, count, 'statements')
+
+
+if __name__ == '__main__':
+    main()
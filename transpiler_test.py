@@ -0,0 +1,137 @@
+import os
+import tempfile
+import unittest
+
+from interpreter import InterpretError
+from main import Application as Main
+from optimizer import TypeAnnotator
+from output import TestOutputter
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+from testing import resolved
+from tok import TokenType
+from transpiler import (
+    ModuleCache,
+    Program,
+    PythonInterpreter,
+    Transpiler,
+    compile_program,
+)
+
+
+def body(text: str, proven: bool = False, start: int = 0):
+    # transpiles the statements from start on, as if those before ran earlier
+    statements = resolved(text)[start:]
+    if proven:
+        statements = TypeAnnotator().run(statements)
+    lines = Transpiler().transpile(statements).splitlines()
+    # without the prelude, the def and the closing pass
+    return [line.strip() for line in lines[2:-1]]
+
+
+class TranspilerTest(unittest.TestCase):
+    def test_guards(self):
+        self.assertEqual(
+            [
+                't0 = F[0]',
+                'if t0 is U: fail()',
+                'if type(t0) is not float: fail(t0, 2.0)',
+                't1 = t0 - 2.0',
+                'out(str(t1))',
+            ],
+            body('var a; print a - 2;', start=1),
+        )
+
+    def test_variables_stored_earlier_are_defined(self):
+        self.assertEqual(['F[0] = 1.0', 't0 = F[0]'], body('var a = 1; a;'))
+
+    def test_literals_need_no_guards(self):
+        self.assertEqual(['t0 = 1.0 + 2.0', 'out(str(t0))'], body('print 1 + 2;'))
+        self.assertEqual(["t0 = 'a' + 'b'", 'out(str(t0))'], body('print "a" + "b";'))
+
+    def test_addition_guard(self):
+        self.assertEqual(
+            'if type(t0) is not str: fail(t0, \'b\')',
+            body('var a; print a + "b";', start=1)[2],
+        )
+        self.assertEqual(
+            'if type(t0) is not type(t1) or type(t0) not in ADDABLE: fail(t0, t1)',
+            body('var a; var b; print a + b;', start=2)[4],
+        )
+
+    def test_division_guards_its_divisor(self):
+        self.assertEqual('if 0.0 == 0: fail(1.0, 0.0)', body('print 1 / 0;')[0])
+        self.assertEqual(['t0 = 1.0 / 2.0', 'out(str(t0))'], body('print 1 / 2;'))
+
+    def test_proven_operations_are_unguarded(self):
+        self.assertEqual(
+            ['t0 = -1.0', 't1 = t0 / 0.0', 'out(str(t1))'],
+            body('print -1 / 0;', proven=True),
+        )
+
+    def test_positions(self):
+        transpiler = Transpiler()
+        transpiler.transpile(resolved('print 1 +\n  -"a";'))
+        minus, plus = TokenType.MINUS.value, TokenType.PLUS.value
+        self.assertEqual(
+            [(minus, '-', 2, 3), (plus, '+', 1, 9)],
+            list(transpiler.positions.values()),
+        )
+
+
+class PythonInterpreterTest(unittest.TestCase):
+    def test_statements_share_the_frame(self):
+        outputter = TestOutputter()
+        interpreter = PythonInterpreter(outputter)
+        resolver = Resolver()
+        for text in ['var a = 2;', 'print a * a;']:
+            tokens = Scanner(text).iter_tokens()
+            interpreter.interpret(resolver.run(Parser(tokens).parse()))
+        self.assertEqual('4.0', outputter.message)
+
+    def test_proven_division_by_zero(self):
+        statements = TypeAnnotator().run(resolved('print 1;\nprint 2 - 2 /\n  0;'))
+        with self.assertRaises(InterpretError) as raised:
+            PythonInterpreter(TestOutputter()).interpret(statements)
+        error = raised.exception
+        self.assertEqual(
+            ('Division by zero', 2, 13), (error.message, error.line, error.column)
+        )
+
+    def test_undefined_variable(self):
+        statements = resolved('var a = 1;\nprint a;')
+        with self.assertRaisesRegex(InterpretError, 'line 2 Undefined variable "a"'):
+            PythonInterpreter().interpret(statements[1:])
+
+
+class ModuleCacheTest(unittest.TestCase):
+    def test_round_trip(self):
+        text = 'print 1 / 0;'
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ModuleCache(directory)
+            cache.store(text, compile_program(resolved(text)))
+            self.assertEqual(['.lox.pyc'], [n[-8:] for n in os.listdir(directory)])
+            program = cache.load(text)
+        self.assertIsInstance(program, Program)
+        with self.assertRaisesRegex(InterpretError, 'line 1 Division by zero'):
+            PythonInterpreter().run(program)
+
+    def test_second_run_hits(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'script.lox')
+            with open(filename, 'w') as f:
+                f.write('var a = 1;\nprint a + 2;\nprint -a;')
+            outputs = []
+            for _ in range(2):
+                outputter = TestOutputter()
+                main = Main(
+                    do_printing=False,
+                    outputter=outputter,
+                    cache_directory='',
+                    engine='python',
+                )
+                status = main.run_file(filename)
+                outputs.append((status, outputter.previous, outputter.message))
+            self.assertEqual((1, 0), (main.cache.hits, main.cache.misses))
+        self.assertEqual([(0, '3.0', '-1.0')] * 2, outputs)
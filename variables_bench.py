@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+
+import argparse
+import random
+
+from typing import Dict, List
+
+from bench import measure, report
+from expression import Value
+from expression import Variable as VariableExpression
+from interpreter import Interpreter, InterpretError
+from output import TestOutputter
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+from statement import Variable as VariableStatement
+
+NAMES = [f'v{i}' for i in range(64)]
+
+
+def generate_script(statements: int, seed: int = 0) -> str:
+    # every operand a variable: declarations built from earlier ones, and
+    # prints that read several at once
+    rng = random.Random(seed)
+    lines = [f'var {name} = {rng.randint(1, 9)};' for name in NAMES]
+    for i in range(statements):
+        operands = [rng.choice(NAMES) for _ in range(6)]
+        operators = [rng.choice(['+', '-', '*']) for _ in range(5)]
+        expression = operands[0]
+        for operator, operand in zip(operators, operands[1:]):
+            expression += f' {operator} {operand}'
+        if i % 2:
+            lines.append(f'print {expression};')
+        else:
+            # kept small so values stay finite
+            lines.append(f'var {rng.choice(NAMES)} = ({expression}) / 1000;')
+    return '\n'.join(lines) + '\n'
+
+
+class DictInterpreter(Interpreter):
+    # the name-keyed environment that slots replace, for comparison
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[str, Value] = {}
+
+    def visit_variable_expression(self, variable: VariableExpression) -> Value:
+        try:
+            return self.values[variable.name.lexeme]
+        except KeyError:
+            raise self._error(
+                variable.name, f'Undefined variable "{variable.name.lexeme}"'
+            )
+
+    def visit_variable_statement(self, statement: VariableStatement) -> None:
+        value = None
+        if statement.initializer is not None:
+            value = self.evaluate(statement.initializer)
+        self.values[statement.name.lexeme] = value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--statements', type=int, default=20000)
+    args = parser.parse_args()
+
+    text = generate_script(args.statements)
+    parsed = Parser(Scanner(text).iter_tokens()).parse()
+    resolved: List = []
+
+    def resolve() -> None:
+        resolved[:] = Resolver().run(parsed)
+
+    reads = text.count('v') - len(NAMES)
+    print(f'{len(text):,} characters, {len(parsed):,} statements, {reads:,} reads')
+    report('resolve', measure(resolve), len(parsed), 'statements')
+    for name, interpreter in [
+        ('name dict', DictInterpreter(TestOutputter())),
+        ('frame slots', Interpreter(TestOutputter())),
+    ]:
+        seconds = measure(lambda: interpreter.interpret(resolved))
+        report(name, seconds, len(parsed), 'statements')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,11 @@
 from __future__ import annotations
+from typing import TYPE_CHECKING
 from typing_extensions import Protocol
 
+if TYPE_CHECKING:
+    import statement
+    from expression import Binary, Common, Grouping, Literal, Reuse, Unary, Variable
+
 
 class Visitor(Protocol):
     def visit_unary(self, unary: Unary):
@@ -15,8 +20,20 @@ class Visitor(Protocol):
     def visit_literal(self, literal: Literal):
         ...
 
-    def visit_expression_statement(self, statement: Expression):
+    def visit_common(self, common: Common):
+        ...
+
+    def visit_reuse(self, reuse: Reuse):
+        ...
+
+    def visit_variable_expression(self, variable: Variable):
+        ...
+
+    def visit_expression_statement(self, statement: statement.Expression):
+        ...
+
+    def visit_print_statement(self, statement: statement.Print):
         ...
 
-    def visit_print_statement(self, statement: Print):
+    def visit_variable_statement(self, statement: statement.Variable):
         ...
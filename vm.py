@@ -0,0 +1,186 @@
+from typing import Any, Iterable, List
+
+from bytecode import (
+    ADD,
+    CONSTANT,
+    DIVIDE,
+    EQUAL,
+    EXTENDED_ARG,
+    GET_COMMON,
+    GREATER,
+    GREATER_EQUAL,
+    ILLEGAL_BINARY,
+    ILLEGAL_UNARY,
+    LESS,
+    LESS_EQUAL,
+    LOAD,
+    MULTIPLY,
+    NEGATE,
+    NOT,
+    NOT_EQUAL,
+    OPCODE_TOKEN_TYPES,
+    OPERATOR_LEXEMES,
+    POP,
+    PRINT,
+    SET_COMMON,
+    STORE,
+    SUBTRACT,
+    Chunk,
+    compile_chunk,
+)
+from expression import Expression, Value
+from interpreter import UNDEFINED, Interpreter, InterpretError, to_bool
+from statement import Statement
+from tok import Token, TokenType
+
+
+class VirtualMachine(Interpreter):
+    # Runs statements compiled to bytecode (see bytecode.py) in a loop over
+    # the instructions, with its own operand stack in place of the Python
+    # call stack. The frame of variables and the values of common
+    # subexpressions are the tree walker's, and an operation that fails goes
+    # to the tree walker's checked operation with the token it came from
+    # rebuilt from the line table, so output and errors are the same.
+    def interpret(self, statements: Iterable[Statement]) -> None:
+        self.run(compile_chunk(statements))
+
+    def evaluate(self, expression: Expression) -> Value:
+        return self.run(compile_chunk([expression]))
+
+    def _token(self, chunk: Chunk, index: int, token_type: TokenType) -> Token:
+        lexeme = chunk.lexemes.get(index)
+        if lexeme is None:
+            lexeme = OPERATOR_LEXEMES[token_type]
+        return Token(token_type, lexeme, None, chunk.lines[index])
+
+    def _fail(self, chunk: Chunk, ip: int, operands: List[Value]) -> Value:
+        # the instruction at ip could not run on these operands: the checked
+        # operation raises the error the tree walker would have, at the
+        # position the line table has for it
+        index = ip // 2
+        opcode = chunk.code[ip]
+        try:
+            # an illegal operator's own type is not kept; any type that is
+            # not an operation's gets the same error
+            token_type = OPCODE_TOKEN_TYPES.get(opcode, TokenType.EOF)
+            token = self._token(chunk, index, token_type)
+            if opcode == NEGATE or opcode == ILLEGAL_UNARY:
+                return self._unary(token, *operands)
+            return self._binary(token, *operands)
+        except InterpretError as error:
+            error.column = chunk.position(index)[1]
+            raise
+
+    def _undefined(self, chunk: Chunk, ip: int, slot: int) -> InterpretError:
+        line, column = chunk.position(ip // 2)
+        name = chunk.names[slot]
+        return InterpretError(f'Undefined variable "{name}"', line, column)
+
+    def run(self, chunk: Chunk) -> Value:
+        # returns what is left on the stack, the value of a chunk compiled
+        # from an expression
+        code = chunk.code
+        constants = chunk.constants
+        frame = self._frame
+        common = self._common
+        # operands are checked by their type as each instruction needs
+        stack: List[Any] = []
+        push = stack.append
+        pop = stack.pop
+        ip = 0
+        end = len(code)
+        while ip < end:
+            opcode = code[ip]
+            argument = code[ip + 1]
+            while opcode == EXTENDED_ARG:
+                ip += 2
+                opcode = code[ip]
+                argument = argument << 8 | code[ip + 1]
+            if opcode == CONSTANT:
+                push(constants[argument])
+            elif opcode == LOAD:
+                value = frame[argument] if argument < len(frame) else UNDEFINED
+                if value is UNDEFINED:
+                    raise self._undefined(chunk, ip, argument)
+                push(value)
+            elif ADD <= opcode <= GREATER_EQUAL:
+                b = pop()
+                a = stack[-1]
+                if argument:
+                    # operands proven to be of the right type
+                    if opcode == ADD:
+                        stack[-1] = a + b
+                    elif opcode == SUBTRACT:
+                        stack[-1] = a - b
+                    elif opcode == MULTIPLY:
+                        stack[-1] = a * b
+                    elif opcode == DIVIDE and b != 0:
+                        stack[-1] = a / b
+                    elif opcode == LESS:
+                        stack[-1] = a < b
+                    elif opcode == LESS_EQUAL:
+                        stack[-1] = a <= b
+                    elif opcode == GREATER:
+                        stack[-1] = a > b
+                    elif opcode == GREATER_EQUAL:
+                        stack[-1] = a >= b
+                    else:
+                        stack[-1] = self._fail(chunk, ip, [a, b])
+                elif type(a) is not float or type(b) is not float:
+                    if opcode == ADD and type(a) is str and type(b) is str:
+                        stack[-1] = a + b
+                    else:
+                        stack[-1] = self._fail(chunk, ip, [a, b])
+                elif opcode == ADD:
+                    stack[-1] = a + b
+                elif opcode == SUBTRACT:
+                    stack[-1] = a - b
+                elif opcode == MULTIPLY:
+                    stack[-1] = a * b
+                elif opcode == DIVIDE:
+                    if b == 0:
+                        self._fail(chunk, ip, [a, b])
+                    stack[-1] = a / b
+                elif opcode == LESS:
+                    stack[-1] = a < b
+                elif opcode == LESS_EQUAL:
+                    stack[-1] = a <= b
+                elif opcode == GREATER:
+                    stack[-1] = a > b
+                else:
+                    stack[-1] = a >= b
+            elif opcode == PRINT:
+                self.outputter.out(str(pop()))
+            elif opcode == NEGATE:
+                a = stack[-1]
+                if argument or type(a) is float:
+                    stack[-1] = -a
+                else:
+                    self._fail(chunk, ip, [a])
+            elif opcode == EQUAL:
+                b = pop()
+                stack[-1] = stack[-1] == b
+            elif opcode == NOT_EQUAL:
+                b = pop()
+                stack[-1] = stack[-1] != b
+            elif opcode == NOT:
+                stack[-1] = not to_bool(stack[-1])
+            elif opcode == STORE:
+                if argument >= len(frame):
+                    frame.extend([UNDEFINED] * (argument + 1 - len(frame)))
+                frame[argument] = pop()
+            elif opcode == SET_COMMON:
+                common[argument] = stack[-1]
+            elif opcode == GET_COMMON:
+                push(common[argument])
+            elif opcode == POP:
+                pop()
+            elif opcode == ILLEGAL_UNARY:
+                self._fail(chunk, ip, [pop()])
+            elif opcode == ILLEGAL_BINARY:
+                b = pop()
+                self._fail(chunk, ip, [pop(), b])
+            else:
+                raise ValueError(f'Unknown opcode {opcode!r}')
+            ip += 2
+        return stack[-1] if stack else None
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+
+import argparse
+import random
+
+from bench import generate_arithmetic, measure, report
+from bytecode import compile_chunk
+from interpreter import Interpreter
+from optimizer import TypeAnnotator
+from output import TestOutputter
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+from variables_bench import generate_script
+from vm import VirtualMachine
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--statements', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    arithmetic = ''.join(
+        f'print {generate_arithmetic(rng, 5)};\n' for _ in range(args.statements)
+    )
+    # left unfolded, as if the operands were not constants, so that every
+    # operation runs
+    checked = Parser(Scanner(arithmetic).iter_tokens()).parse()
+    variables = generate_script(args.statements)
+    scripts = [
+        ('checked', checked),
+        ('proven types', TypeAnnotator().run(checked)),
+        ('variables', Resolver().run(Parser(Scanner(variables).iter_tokens()).parse())),
+    ]
+    print(f'{len(checked):,} statements per script')
+
+    for name, statements in scripts:
+        tree = Interpreter(TestOutputter())
+        seconds = measure(lambda: tree.interpret(statements))
+        report(f'{name}, tree', seconds, len(statements), 'statements')
+        # compiled and run one statement at a time, as main.py does
+        machine = VirtualMachine(TestOutputter())
+
+        def interpret_each() -> None:
+            for s in statements:
+                machine.interpret([s])
+
+        seconds = measure(interpret_each)
+        report(f'{name}, vm', seconds, len(statements), 'statements')
+        seconds = measure(lambda: compile_chunk(statements))
+        report(f'{name}, compile', seconds, len(statements), 'statements')
+        # what code run many times over (a loop body) pays per run
+        chunk = compile_chunk(statements)
+        seconds = measure(lambda: machine.run(chunk))
+        report(f'{name}, compiled', seconds, len(statements), 'statements')
+
+
+if __name__ == '__main__':
+    main()